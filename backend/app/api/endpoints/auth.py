@@ -1,28 +1,32 @@
+import logging
 from datetime import timedelta
 from typing import Any
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.security import (
     create_access_token,
-    verify_password,
-    get_password_hash,
+    hash_password,
+    verify_and_update_password,
     JWT_ACCESS_TOKEN_EXPIRE_MINUTES
 )
 from app.core.deps import get_db, get_current_active_user
 from app.database.models import User
-from app.schemas.user import UserCreate, User as UserSchema, Token
+from app.schemas.user import UserCreate, User as UserSchema, UserPrincipal, Token
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 @router.post("/register", response_model=UserSchema)
-def register(
+async def register(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user_in: UserCreate,
 ) -> Any:
-    user = db.query(User).filter(User.email == user_in.email).first()
+    user = await db.scalar(select(User).where(User.email == user_in.email))
     if user:
         raise HTTPException(
             status_code=400,
@@ -30,39 +34,43 @@ def register(
         )
     user = User(
         email=user_in.email,
-        hashed_password=get_password_hash(user_in.password),
+        hashed_password=await hash_password(user_in.password),
         is_active=True,
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
 @router.post("/login", response_model=Token)
-def login(
-    db: Session = Depends(get_db),
+async def login(
+    db: AsyncSession = Depends(get_db),
     form_data: OAuth2PasswordRequestForm = Depends()
 ) -> Any:
-    user = db.query(User).filter(User.email == form_data.username).first()
-    
-    print(f"Login attempt for user: {form_data.username}")
-    print(f"User found: {user is not None}")
+    user = await db.scalar(select(User).where(User.email == form_data.username))
     
     if not user:
+        logger.info("Login failed for %s: unknown user", form_data.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    if not verify_password(form_data.password, user.hashed_password):
-        print("Password verification failed")
+    verified, new_hash = await verify_and_update_password(form_data.password, user.hashed_password)
+    if not verified:
+        logger.info("Login failed for user %s: incorrect password", user.id)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    if new_hash:
+        # Stored hash uses an outdated cost or scheme; upgrade it transparently
+        user.hashed_password = new_hash
+        await db.commit()
+    
     access_token_expires = timedelta(minutes=JWT_ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": str(user.id)}, expires_delta=access_token_expires
@@ -74,7 +82,7 @@ def login(
     }
 
 @router.get("/me", response_model=UserSchema)
-def read_users_me(
-    current_user: User = Depends(get_current_active_user),
+async def read_users_me(
+    current_user: UserPrincipal = Depends(get_current_active_user),
 ) -> Any:
     return current_user 
\ No newline at end of file
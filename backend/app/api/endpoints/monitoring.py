@@ -0,0 +1,31 @@
+from typing import Any
+from fastapi import APIRouter
+
+from app.core.cache import user_cache
+from app.core.events import note_events
+from app.core.public_cache import public_note_cache
+from app.database.session import engine, async_engine, pool_status
+
+router = APIRouter()
+
+@router.get("/pool", response_model=dict)
+async def read_pool_status() -> Any:
+    status = {"sync": pool_status(engine)}
+    if async_engine is not None:
+        status["async"] = pool_status(async_engine.sync_engine)
+    return status
+
+@router.get("/cache", response_model=dict)
+async def read_cache_status() -> Any:
+    return {
+        "user": user_cache.stats.as_dict(),
+        "public_notes": {
+            **public_note_cache.stats.as_dict(),
+            "entries": len(public_note_cache),
+            "bytes": public_note_cache.size,
+        },
+    }
+
+@router.get("/events", response_model=dict)
+async def read_event_status() -> Any:
+    return note_events.stats()
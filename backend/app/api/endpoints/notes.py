@@ -1,30 +1,65 @@
-from typing import List, Any
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from typing import List, Any, Optional, Tuple, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import exists, insert, select, union, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 import logging
 from datetime import datetime, UTC
 import secrets
 
+from app.core.compression import encoded_etag, negotiate
+from app.core.config import settings
+from app.core.delta import unified_diff
 from app.core.deps import get_db, get_current_active_user
-from app.database.models import User, Note, VisibilityStatus
-from app.schemas.note import NoteCreate, NoteUpdate, Note as NoteSchema, NoteShare
+from app.core.events import TooManySubscriptions, event_stream, note_event, note_events
+from app.core.http_cache import (
+    cache_headers, if_match_fails, is_not_modified, list_etag, not_modified, note_etag
+)
+from app.core.pagination import keyset_page, InvalidCursor
+from app.core.patch import PatchConflict, PatchError, patch_text
+from app.core.public_cache import markdown_available, public_note_cache
+from app.core.search import filter_notes, index_notes, is_postgres, search_notes
+from app.core.serialization import NOTE_COLUMNS, note_projection, note_to_dict, rows_to_dicts
+from app.database.bulk import apply_bulk_operations
+from app.database.changes import (
+    InvalidChangeToken, allocate_change_seqs, clear_share_tombstones, decode_change_token,
+    deleted_note_values, encode_change_token, read_changes, remove_share
+)
+from app.database.export import export_ndjson, export_zip
+from app.database.importer import NoteImporter, import_ndjson, import_zip
+from app.database.models import User, Note, NoteRevision, VisibilityStatus, note_sharing
+from app.database.revisions import (
+    NoteEdit, first_revision, latest_revision_number, list_revisions, load_revision, record_revisions
+)
+from app.schemas.user import UserPrincipal
+from app.schemas.note import (
+    NoteCreate, NoteUpdate, NotePatch, Note as NoteSchema, NoteShare, NotePage, NoteSearchResult,
+    NoteSummary, NoteSummaryPage, NoteImportReport, NoteChanges,
+    NoteRevisionSummary, NoteRevision as NoteRevisionSchema, NoteRevisionDiff,
+    NoteBulkRequest, NoteBulkResponse
+)
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Latest revision number of a note, returned by writes: the base_revision
+# of a later PATCH
+REVISION_HEADER = "X-Note-Revision"
+
+def shared_with(note_id, user_id):
+    # Served by the (note_id, user_id) primary key of note_sharing
+    return exists().where(note_sharing.c.note_id == note_id, note_sharing.c.user_id == user_id)
+
 @router.post("/", response_model=NoteSchema)
-def create_note(
+async def create_note(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     note_in: NoteCreate,
-    current_user: User = Depends(get_current_active_user)
+    current_user: UserPrincipal = Depends(get_current_active_user)
 ) -> Any:
     try:
-        logger.info(f"Creating note with data: {note_in.dict()}")
-        logger.info(f"Current user ID: {current_user.id}")
-        
         visibility = VisibilityStatus(note_in.visibility)
         
         note = Note(
@@ -33,135 +68,461 @@ def create_note(
             visibility=visibility,
             owner_id=current_user.id,
             created_at=datetime.now(UTC),
-            updated_at=datetime.now(UTC)
+            updated_at=datetime.now(UTC),
         )
         
         db.add(note)
-        db.commit()
-        db.refresh(note)
-        
-        logger.info(f"Note created with ID: {note.id}, Owner ID: {note.owner_id}")
-        
-        note_dict = {
-            **note.__dict__,
-            'visibility': note.visibility.value
-        }
+        await db.flush()
+        await db.execute(
+            insert(NoteRevision).values(
+                first_revision(note.id, note.title, note.content, current_user.id, note.created_at)
+            )
+        )
+        await index_notes(db, [(note.id, note.title, note.content)])
+        # Last, see allocate_change_seqs. updated_at is set explicitly so its
+        # onupdate does not overwrite the value just inserted.
+        await db.execute(
+            update(Note)
+            .where(Note.id == note.id)
+            .values(change_seq=await allocate_change_seqs(db), updated_at=note.updated_at)
+        )
+        await db.commit()
+        await db.refresh(note)
+        await note_events.publish([note_event("note_created", note.id, note.owner_id, note.change_seq)])
         
-        logger.info(f"Note created successfully with ID: {note.id}")
-        return note_dict
+        logger.info("Note %s created for user %s", note.id, note.owner_id)
+        return ORJSONResponse(note_to_dict(note), headers={REVISION_HEADER: "1"})
         
     except ValueError as e:
-        logger.error(f"Invalid visibility value: {note_in.visibility}")
+        logger.error("Invalid visibility value: %s", note_in.visibility)
         raise HTTPException(
             status_code=400,
             detail=f"Invalid visibility value. Must be one of: {[v.value for v in VisibilityStatus]}"
         )
     except Exception as e:
-        logger.error(f"Error creating note: {str(e)}")
-        db.rollback()
+        logger.error("Error creating note: %s", e)
+        await db.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Error creating note: {str(e)}"
         )
 
-@router.get("/", response_model=List[NoteSchema])
-def read_notes(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
-    skip: int = 0,
-    limit: int = 100,
+@router.post("/bulk", response_model=NoteBulkResponse)
+async def bulk_notes(
+    *,
+    db: AsyncSession = Depends(get_db),
+    bulk_in: NoteBulkRequest,
+    current_user: UserPrincipal = Depends(get_current_active_user)
+) -> Any:
+    if len(bulk_in.operations) > settings.BULK_MAX_OPERATIONS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many operations. At most {settings.BULK_MAX_OPERATIONS} per request"
+        )
+    try:
+        applied, results = await apply_bulk_operations(
+            db, current_user.id, bulk_in.operations, bulk_in.atomic
+        )
+        logger.info("Bulk request applied %s/%s operations for user %s", applied, len(results), current_user.id)
+        return {"applied": applied, "results": results}
+    except Exception as e:
+        logger.error("Error applying bulk operations: %s", e)
+        await db.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error applying bulk operations: {str(e)}"
+        )
+
+async def filter_query(db: AsyncSession, query, owner_ids, search: Optional[str], status: Optional[str]):
+    if search:
+        query = await filter_notes(db, query, owner_ids, search)
+        logger.debug("Searching for notes matching: %s", search)
+    if status:
+        try:
+            visibility = VisibilityStatus(status)
+            query = query.where(Note.visibility == visibility)
+            logger.debug("Filtering notes by status: %s", status)
+        except ValueError:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid status value. Must be one of: {[v.value for v in VisibilityStatus]}"
+            )
+    return query
+
+async def search_owner_ids(db: AsyncSession, user_id: int, search: Optional[str], include_own: bool) -> List[int]:
+    """
+    Owners of the notes shared with ``user_id``, plus the user when
+    ``include_own``: the owners filter_notes searches. Only the in-process
+    index searches per owner, so on Postgres there is nothing to look up.
+    """
+    owner_ids = [user_id] if include_own else []
+    if search and not is_postgres(db):
+        owner_ids += (
+            await db.scalars(select(Note.owner_id).where(Note.id.in_(shared_note_ids(user_id))).distinct())
+        ).all()
+    return owner_ids
+
+def projection(view: Optional[str], fields: Optional[str]):
+    try:
+        return note_projection(view, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def fetch_note_page(db: AsyncSession, query, cursor: Optional[str], limit: int):
+    try:
+        return await keyset_page(db, query, Note.updated_at, Note.id, cursor, limit)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def list_validators(request: Request, notes, *extra) -> Tuple[dict, bool]:
+    """The list's caching headers, and whether the client's copy is current."""
+    # ETag only: the newest updated_at of a page does not change when a note
+    # leaves it (deleted, unshared), so Last-Modified would revalidate stale lists
+    etag = list_etag(((note.id, note.updated_at) for note in notes), *extra)
+    return cache_headers(etag), is_not_modified(request, etag)
+
+async def read_note_page(
+    db: AsyncSession, request: Request, query, cursor: Optional[str], limit: int, *extra
+) -> Response:
+    notes, next_cursor = await fetch_note_page(db, query, cursor, limit)
+    # ``extra`` names the projection: each is its own representation with its own ETag
+    headers, unchanged = list_validators(request, notes, next_cursor, *extra)
+    if unchanged:
+        return not_modified(headers)
+    return ORJSONResponse({"items": rows_to_dicts(notes), "next_cursor": next_cursor}, headers=headers)
+
+# Deleted notes are kept as tombstones for the changes feed; every other
+# read leaves them out
+live = Note.deleted_at.is_(None)
+
+def shared_note_ids(user_id: int):
+    # Index-only scan of ix_note_sharing_user_note
+    return select(note_sharing.c.note_id).where(note_sharing.c.user_id == user_id)
+
+@router.get("/", response_model=Union[List[NoteSchema], NotePage, List[NoteSummary], NoteSummaryPage])
+async def read_notes(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
     search: str = None,
-    status: str = None
+    status: str = None,
+    view: Optional[str] = None,
+    fields: Optional[str] = None
 ) -> Any:
     try:
-        logger.info(f"Reading notes for user ID: {current_user.id}")
-        query = db.query(Note).filter(Note.owner_id == current_user.id)
-        if search:
-            search_term = f"%{search}%"
-            query = query.filter(Note.title.ilike(search_term))
-            logger.info(f"Searching for notes with title containing: {search}")
-        if status:
-            try:
-                visibility = VisibilityStatus(status)
-                query = query.filter(Note.visibility == visibility)
-                logger.info(f"Filtering notes by status: {status}")
-            except ValueError:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Invalid status value. Must be one of: {[v.value for v in VisibilityStatus]}"
-                )
-        notes = query.offset(skip).limit(limit).all()
+        logger.debug("Reading notes for user ID: %s", current_user.id)
+        query = select(*projection(view, fields)).where(Note.owner_id == current_user.id, live)
+        query = await filter_query(db, query, [current_user.id], search, status)
+        if cursor is not None:
+            return await read_note_page(db, request, query, cursor, limit, view, fields)
+        notes = (
+            await db.execute(
+                query.order_by(Note.updated_at.desc(), Note.id.desc()).offset(skip).limit(limit)
+            )
+        ).all()
+        headers, unchanged = list_validators(request, notes, view, fields)
+        if unchanged:
+            return not_modified(headers)
         
-        logger.info(f"Notes found for user: {len(notes)}")
-        for note in notes:
-            logger.info(f"Note ID: {note.id}, Title: {note.title}, Owner ID: {note.owner_id}")
-        notes_list = []
-        for note in notes:
-            note_dict = {
-                **note.__dict__,
-                'visibility': note.visibility.value
-            }
-            notes_list.append(note_dict)
-        
-        return notes_list
+        logger.debug("Notes found for user: %s", len(notes))
+        return ORJSONResponse(rows_to_dicts(notes), headers=headers)
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error retrieving notes: {str(e)}")
+        logger.error("Error retrieving notes: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Error retrieving notes: {str(e)}"
         )
 
+@router.get("/shared", response_model=Union[NotePage, NoteSummaryPage])
+async def read_shared_notes(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    search: str = None,
+    status: str = None,
+    view: Optional[str] = None,
+    fields: Optional[str] = None
+) -> Any:
+    try:
+        query = (
+            select(*projection(view, fields))
+            .join(note_sharing, note_sharing.c.note_id == Note.id)
+            .where(note_sharing.c.user_id == current_user.id, live)
+        )
+        owner_ids = await search_owner_ids(db, current_user.id, search, include_own=False)
+        query = await filter_query(db, query, owner_ids, search, status)
+        return await read_note_page(db, request, query, cursor, limit, view, fields)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error retrieving shared notes: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error retrieving shared notes: {str(e)}"
+        )
+
+@router.get("/accessible", response_model=Union[NotePage, NoteSummaryPage])
+async def read_accessible_notes(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    search: str = None,
+    status: str = None,
+    view: Optional[str] = None,
+    fields: Optional[str] = None
+) -> Any:
+    try:
+        # Owned notes plus shared ones. IN over a UNION keeps both branches
+        # on their own index, where an OR across them would not.
+        accessible_ids = union(
+            select(Note.id).where(Note.owner_id == current_user.id),
+            shared_note_ids(current_user.id)
+        )
+        query = select(*projection(view, fields)).where(Note.id.in_(accessible_ids), live)
+        owner_ids = await search_owner_ids(db, current_user.id, search, include_own=True)
+        query = await filter_query(db, query, owner_ids, search, status)
+        return await read_note_page(db, request, query, cursor, limit, view, fields)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error retrieving accessible notes: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error retrieving accessible notes: {str(e)}"
+        )
+
+@router.get("/export")
+async def export_notes(
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    format: str = Query("ndjson", pattern="^(ndjson|zip)$")
+) -> Any:
+    logger.info("Exporting notes for user ID: %s as %s", current_user.id, format)
+    if format == "zip":
+        return StreamingResponse(
+            export_zip(current_user.id),
+            media_type="application/zip",
+            headers={"Content-Disposition": 'attachment; filename="notes.zip"'}
+        )
+    return StreamingResponse(
+        export_ndjson(current_user.id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="notes.ndjson"'}
+    )
+
+@router.post("/import", response_model=NoteImportReport)
+async def import_notes(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    format: Optional[str] = Query(None, pattern="^(ndjson|zip)$")
+) -> Any:
+    """
+    Import the request body, NDJSON (one NoteCreate per line, as written by
+    the export) or a zip of Markdown files. Valid records are committed in
+    batches; invalid ones are reported by line or file name.
+    """
+    if format is None:
+        format = "zip" if request.headers.get("content-type", "").startswith("application/zip") else "ndjson"
+    importer = NoteImporter(db, current_user.id)
+    try:
+        if format == "zip":
+            await import_zip(importer, request.stream())
+        else:
+            await import_ndjson(importer, request.stream())
+        logger.info(
+            "Imported %s notes for user %s, %s records rejected", importer.imported, current_user.id, importer.failed
+        )
+        return importer.report()
+    except Exception as e:
+        logger.error("Error importing notes after %s notes: %s", importer.imported, e)
+        await db.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error importing notes after {importer.imported} notes: {str(e)}"
+        )
+
+@router.get("/search", response_model=List[NoteSearchResult])
+async def search_user_notes(
+    db: AsyncSession = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100)
+) -> Any:
+    try:
+        results = await search_notes(db, current_user.id, q, limit)
+        return ORJSONResponse([
+            {**note_to_dict(note), 'rank': rank, 'snippet': snippet}
+            for note, rank, snippet in results
+        ])
+    except Exception as e:
+        logger.error("Error searching notes: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error searching notes: {str(e)}"
+        )
+
+@router.get("/changes", response_model=NoteChanges)
+async def read_changes_since(
+    db: AsyncSession = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    since: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=5000)
+) -> Any:
+    """
+    Notes and shares changed since ``since``, the ``next_token`` of a
+    previous call. Without it, the current notes and shares are returned
+    as an initial sync. Keep following ``next_token`` while ``has_more``.
+    """
+    try:
+        seq = decode_change_token(since) if since is not None else 0
+        changes, next_seq, has_more = await read_changes(db, current_user.id, seq, limit)
+        return ORJSONResponse({
+            "changes": changes,
+            "next_token": encode_change_token(next_seq),
+            "has_more": has_more
+        })
+    except InvalidChangeToken:
+        raise HTTPException(status_code=400, detail="Invalid change token")
+    except Exception as e:
+        logger.error("Error retrieving changes: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error retrieving changes: {str(e)}"
+        )
+
+@router.get("/events")
+async def subscribe_note_events(
+    db: AsyncSession = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_active_user)
+) -> Any:
+    """
+    Server-sent events for the caller's notes and the notes shared with
+    them: note_created, note_updated, note_deleted, share_added and
+    share_removed. Events carry ids, not content. Each event id is a
+    ``since`` token for /changes, which is also how to catch up after a
+    reconnect or a ``resync`` event.
+    """
+    try:
+        subscription = await note_events.subscribe(current_user.id)
+    except TooManySubscriptions:
+        raise HTTPException(status_code=503, detail="Too many event subscriptions", headers={"Retry-After": "30"})
+    try:
+        # After subscribing, so a share made meanwhile is not missed
+        note_events.watch(subscription, (await db.scalars(shared_note_ids(current_user.id))).all())
+    except Exception as e:
+        note_events.unsubscribe(subscription)
+        logger.error("Error subscribing to note events: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error subscribing to note events: {str(e)}"
+        )
+    return StreamingResponse(
+        event_stream(note_events, subscription, settings.EVENT_HEARTBEAT_SECONDS),
+        media_type="text/event-stream",
+        # Proxies must pass events through as they come
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/{note_id}", response_model=NoteSchema)
-def read_note(
+async def read_note(
     *,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_db),
     note_id: int,
-    current_user: User = Depends(get_current_active_user)
+    current_user: UserPrincipal = Depends(get_current_active_user)
 ) -> Any:
     try:
-        note = db.query(Note).filter(Note.id == note_id).first()
-        if not note:
+        row = (
+            await db.execute(
+                select(*NOTE_COLUMNS, shared_with(Note.id, current_user.id).label("is_shared"))
+                .where(Note.id == note_id, live)
+            )
+        ).first()
+        if not row:
             raise HTTPException(status_code=404, detail="Note not found")
-        if note.owner_id != current_user.id and current_user not in note.shared_with:
+        if row.owner_id != current_user.id and not row.is_shared:
             raise HTTPException(status_code=403, detail="Not enough permissions")
-        return note
+        etag = note_etag(row.id, row.updated_at)
+        headers = cache_headers(etag, row.updated_at)
+        if is_not_modified(request, etag, row.updated_at):
+            return not_modified(headers)
+        return ORJSONResponse(note_to_dict(row), headers=headers)
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error retrieving note: {str(e)}")
+        logger.error("Error retrieving note: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Error retrieving note: {str(e)}"
         )
 
+async def lock_note_for_edit(db: AsyncSession, request: Request, note_id: int, user_id: int) -> Note:
+    # Held until commit: If-Match cannot go stale, and revision deltas are
+    # taken against the content actually stored
+    note = await db.scalar(select(Note).where(Note.id == note_id, live).with_for_update())
+    if not note:
+        raise HTTPException(status_code=404, detail="Note not found")
+    if note.owner_id != user_id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    if if_match_fails(request, note_etag(note.id, note.updated_at)):
+        raise HTTPException(
+            status_code=412,
+            detail="Note has been modified since it was last read",
+            headers={"ETag": note_etag(note.id, note.updated_at)}
+        )
+    return note
+
+def note_edit(note: Note) -> NoteEdit:
+    """Capture the note's state before it is modified; see save_note_edit."""
+    return NoteEdit(note.id, note.title, note.content, note.updated_at, note.title, note.content)
+
+async def save_note_edit(db: AsyncSession, note: Note, edit: NoteEdit, user_id: int) -> Response:
+    now = datetime.now(UTC)
+    edit.title, edit.content = note.title, note.content
+    revisions = await record_revisions(db, [edit], user_id, now)
+    if edit.changed:
+        await index_notes(db, [(note.id, note.title, note.content)])
+    note.updated_at = now
+    note.change_seq = await allocate_change_seqs(db)
+    
+    db.add(note)
+    await db.commit()
+    public_note_cache.invalidate_notes([note.id])
+    await note_events.publish([note_event("note_updated", note.id, note.owner_id, note.change_seq)])
+    await db.refresh(note)
+    headers = cache_headers(note_etag(note.id, note.updated_at), note.updated_at)
+    if note.id in revisions:
+        headers[REVISION_HEADER] = str(revisions[note.id])
+    return ORJSONResponse(note_to_dict(note), headers=headers)
+
 @router.put("/{note_id}", response_model=NoteSchema)
-def update_note(
+async def update_note(
     *,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_db),
     note_id: int,
     note_in: NoteUpdate,
-    current_user: User = Depends(get_current_active_user)
+    current_user: UserPrincipal = Depends(get_current_active_user)
 ) -> Any:
     try:
-        note = db.query(Note).filter(Note.id == note_id).first()
-        if not note:
-            raise HTTPException(status_code=404, detail="Note not found")
-        if note.owner_id != current_user.id:
-            raise HTTPException(status_code=403, detail="Not enough permissions")
-        
+        note = await lock_note_for_edit(db, request, note_id, current_user.id)
         update_data = note_in.dict(exclude_unset=True)
         if "visibility" in update_data:
             update_data["visibility"] = VisibilityStatus(update_data["visibility"])
         
+        edit = note_edit(note)
         for field, value in update_data.items():
             setattr(note, field, value)
-        
-        db.add(note)
-        db.commit()
-        db.refresh(note)
-        return note
+        return await save_note_edit(db, note, edit, current_user.id)
     except ValueError as e:
         raise HTTPException(
             status_code=400,
@@ -170,93 +531,312 @@ def update_note(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error updating note: {str(e)}")
-        db.rollback()
+        logger.error("Error updating note: %s", e)
+        await db.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Error updating note: {str(e)}"
         )
 
+@router.patch("/{note_id}", response_model=NoteSchema)
+async def patch_note(
+    *,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    note_id: int,
+    patch: NotePatch,
+    current_user: UserPrincipal = Depends(get_current_active_user)
+) -> Any:
+    """
+    Edit a note's content with range edits or a unified diff instead of
+    sending it whole. The edits are made against ``base_revision`` (from
+    X-Note-Revision); when the note changed since, they are applied to
+    the current content if they touch none of the changed text, and
+    rejected with 409 and the indexes of the conflicting edits (or diff
+    hunks) otherwise. If-Match is honoured as for PUT.
+    """
+    try:
+        if patch.operations is not None and patch.diff is not None:
+            raise HTTPException(status_code=400, detail="Send either operations or diff, not both")
+        note = await lock_note_for_edit(db, request, note_id, current_user.id)
+        edit = note_edit(note)
+        if patch.title is not None:
+            note.title = patch.title
+        if patch.operations is not None or patch.diff is not None:
+            current = note.content or ""
+            base = current
+            if patch.base_revision is not None:
+                latest = await latest_revision_number(db, note_id)
+                if patch.base_revision != latest:
+                    base = (await fetch_revision(db, note_id, patch.base_revision))["content"]
+            # Diffing and rebasing large notes is CPU work
+            note.content = await run_in_threadpool(patch_text, base, current, patch.operations, patch.diff)
+        return await save_note_edit(db, note, edit, current_user.id)
+    except PatchError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid patch: {str(e)}")
+    except PatchConflict as e:
+        latest = await latest_revision_number(db, note_id)
+        raise HTTPException(
+            status_code=409,
+            detail={"message": str(e), "revision": latest, "conflicts": e.indexes},
+            headers={REVISION_HEADER: str(latest)}
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error patching note: %s", e)
+        await db.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error patching note: {str(e)}"
+        )
+
+async def check_note_readable(db: AsyncSession, note_id: int, user_id: int) -> None:
+    row = (
+        await db.execute(
+            select(Note.owner_id, shared_with(Note.id, user_id).label("is_shared")).where(Note.id == note_id, live)
+        )
+    ).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Note not found")
+    if row.owner_id != user_id and not row.is_shared:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+
+async def fetch_revision(db: AsyncSession, note_id: int, number: int) -> dict:
+    revision = await load_revision(db, note_id, number)
+    if revision is None:
+        raise HTTPException(status_code=404, detail="Revision not found")
+    return revision
+
+@router.get("/{note_id}/revisions", response_model=List[NoteRevisionSummary])
+async def read_note_revisions(
+    *,
+    db: AsyncSession = Depends(get_db),
+    note_id: int,
+    limit: int = Query(50, ge=1, le=500),
+    before: Optional[int] = None,
+    current_user: UserPrincipal = Depends(get_current_active_user)
+) -> Any:
+    """Newest first; pass the last ``number`` as ``before`` for the next page."""
+    try:
+        await check_note_readable(db, note_id, current_user.id)
+        return ORJSONResponse(rows_to_dicts(await list_revisions(db, note_id, limit, before)))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error retrieving revisions: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error retrieving revisions: {str(e)}"
+        )
+
+@router.get("/{note_id}/revisions/{number}", response_model=NoteRevisionSchema)
+async def read_note_revision(
+    *,
+    db: AsyncSession = Depends(get_db),
+    note_id: int,
+    number: int,
+    current_user: UserPrincipal = Depends(get_current_active_user)
+) -> Any:
+    try:
+        await check_note_readable(db, note_id, current_user.id)
+        return ORJSONResponse(await fetch_revision(db, note_id, number))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error retrieving revision: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error retrieving revision: {str(e)}"
+        )
+
+@router.get("/{note_id}/revisions/{number}/diff", response_model=NoteRevisionDiff)
+async def diff_note_revision(
+    *,
+    db: AsyncSession = Depends(get_db),
+    note_id: int,
+    number: int,
+    against: Optional[int] = None,
+    current_user: UserPrincipal = Depends(get_current_active_user)
+) -> Any:
+    """Changes from revision ``against`` (by default the one before) to revision ``number``."""
+    try:
+        await check_note_readable(db, note_id, current_user.id)
+        if against is None:
+            against = number - 1
+        new = await fetch_revision(db, note_id, number)
+        old = await fetch_revision(db, note_id, against) if against >= 1 else {"content": ""}
+        return ORJSONResponse({
+            "note_id": note_id,
+            "from_number": against,
+            "to_number": number,
+            "diff": unified_diff(old["content"], new["content"], f"revision {against}", f"revision {number}")
+        })
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error diffing revisions: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error diffing revisions: {str(e)}"
+        )
+
+@router.post("/{note_id}/revisions/{number}/restore", response_model=NoteSchema)
+async def restore_note_revision(
+    *,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    note_id: int,
+    number: int,
+    current_user: UserPrincipal = Depends(get_current_active_user)
+) -> Any:
+    """Make a revision's title and content current again, as a new revision."""
+    try:
+        note = await lock_note_for_edit(db, request, note_id, current_user.id)
+        revision = await fetch_revision(db, note_id, number)
+        edit = note_edit(note)
+        note.title, note.content = revision["title"], revision["content"]
+        return await save_note_edit(db, note, edit, current_user.id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error restoring revision: %s", e)
+        await db.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error restoring revision: {str(e)}"
+        )
+
 @router.delete("/{note_id}", response_model=NoteSchema)
-def delete_note(
+async def delete_note(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     note_id: int,
-    current_user: User = Depends(get_current_active_user)
+    current_user: UserPrincipal = Depends(get_current_active_user)
 ) -> Any:
     try:
-        note = db.query(Note).filter(Note.id == note_id).first()
+        note = (await db.execute(select(*NOTE_COLUMNS).where(Note.id == note_id, live))).first()
         if not note:
             raise HTTPException(status_code=404, detail="Note not found")
         if note.owner_id != current_user.id:
             raise HTTPException(status_code=403, detail="Not enough permissions")
         
-        db.delete(note)
-        db.commit()
-        return note
+        await index_notes(db, [(note_id, None, None)])
+        seq = await allocate_change_seqs(db)
+        await db.execute(
+            update(Note).where(Note.id == note_id).values(**deleted_note_values(datetime.now(UTC)), change_seq=seq)
+        )
+        await db.commit()
+        public_note_cache.invalidate_notes([note_id])
+        await note_events.publish([note_event("note_deleted", note_id, note.owner_id, seq)])
+        return ORJSONResponse(note_to_dict(note))
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error deleting note: {str(e)}")
-        db.rollback()
+        logger.error("Error deleting note: %s", e)
+        await db.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Error deleting note: {str(e)}"
         )
 
 @router.post("/{note_id}/share", response_model=NoteSchema)
-def share_note(
+async def share_note(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     note_id: int,
     share_data: NoteShare,
-    current_user: User = Depends(get_current_active_user)
+    current_user: UserPrincipal = Depends(get_current_active_user)
 ) -> Any:
     try:
-        note = db.query(Note).filter(Note.id == note_id).first()
+        note = (await db.execute(select(*NOTE_COLUMNS).where(Note.id == note_id, live))).first()
         if not note:
             raise HTTPException(status_code=404, detail="Note not found")
         if note.owner_id != current_user.id:
             raise HTTPException(status_code=403, detail="Only the owner can share notes")
         
-        user_to_share = db.query(User).filter(User.email == share_data.email).first()
+        user_to_share = (
+            await db.execute(
+                select(User.id, User.email, shared_with(note_id, User.id).label("is_shared"))
+                .where(User.email == share_data.email)
+            )
+        ).first()
         if not user_to_share:
             raise HTTPException(status_code=404, detail="User not found")
         
-        if user_to_share in note.shared_with:
+        if user_to_share.is_shared:
             raise HTTPException(status_code=400, detail="Note already shared with this user")
         
-        note.shared_with.append(user_to_share)
-        db.commit()
-        db.refresh(note)
+        await clear_share_tombstones(db, [(note_id, user_to_share.id)])
+        seq = await allocate_change_seqs(db)
+        await db.execute(insert(note_sharing).values(note_id=note_id, user_id=user_to_share.id, change_seq=seq))
+        await db.commit()
+        await note_events.publish([note_event("share_added", note_id, note.owner_id, seq, user_to_share.id)])
         
-        logger.info(f"Note {note_id} shared with user {user_to_share.email}")
+        logger.info("Note %s shared with user %s", note_id, user_to_share.email)
         
-        note_dict = {
-            **note.__dict__,
-            'visibility': note.visibility.value
-        }
-        return note_dict
+        return ORJSONResponse(note._asdict())
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error sharing note: {str(e)}")
-        db.rollback()
+        logger.error("Error sharing note: %s", e)
+        await db.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Error sharing note: {str(e)}"
         )
 
+@router.delete("/{note_id}/share", response_model=NoteSchema)
+async def unshare_note(
+    *,
+    db: AsyncSession = Depends(get_db),
+    note_id: int,
+    email: str,
+    current_user: UserPrincipal = Depends(get_current_active_user)
+) -> Any:
+    try:
+        note = (await db.execute(select(*NOTE_COLUMNS).where(Note.id == note_id, live))).first()
+        if not note:
+            raise HTTPException(status_code=404, detail="Note not found")
+        if note.owner_id != current_user.id:
+            raise HTTPException(status_code=403, detail="Only the owner can unshare notes")
+        
+        shared_user = (
+            await db.execute(
+                select(User.id, shared_with(note_id, User.id).label("is_shared")).where(User.email == email)
+            )
+        ).first()
+        if not shared_user or not shared_user.is_shared:
+            raise HTTPException(status_code=404, detail="Note is not shared with this user")
+        
+        seq = await remove_share(db, note_id, shared_user.id)
+        await db.commit()
+        await note_events.publish([note_event("share_removed", note_id, note.owner_id, seq, shared_user.id)])
+        
+        logger.info("Note %s no longer shared with user %s", note_id, email)
+        
+        return ORJSONResponse(note._asdict())
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error unsharing note: %s", e)
+        await db.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error unsharing note: {str(e)}"
+        )
+
 @router.post("/{note_id}/public-link", response_model=dict)
-def generate_public_link(
+async def generate_public_link(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     note_id: int,
-    current_user: User = Depends(get_current_active_user)
+    current_user: UserPrincipal = Depends(get_current_active_user)
 ) -> Any:
     try:
-        note = db.query(Note).filter(Note.id == note_id).first()
+        note = await db.scalar(select(Note).where(Note.id == note_id, live))
         if not note:
             raise HTTPException(status_code=404, detail="Note not found")
         if note.owner_id != current_user.id:
@@ -265,11 +845,15 @@ def generate_public_link(
         public_token = secrets.token_urlsafe(32)
         note.public_token = public_token
         note.visibility = VisibilityStatus.PUBLIC
-        db.commit()
+        note.change_seq = await allocate_change_seqs(db)
+        await db.commit()
+        # The previous token, if any, stops working
+        public_note_cache.invalidate_notes([note_id])
+        await note_events.publish([note_event("note_updated", note_id, note.owner_id, note.change_seq)])
         
         public_url = f"http://127.0.0.1:8000/api/notes/public/{public_token}"
         
-        logger.info(f"Generated public link for note {note_id}")
+        logger.info("Generated public link for note %s", note_id)
         
         return {
             "public_url": public_url,
@@ -279,37 +863,61 @@ def generate_public_link(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error generating public link: {str(e)}")
-        db.rollback()
+        logger.error("Error generating public link: %s", e)
+        await db.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Error generating public link: {str(e)}"
         )
 
 @router.get("/public/{token}", response_model=NoteSchema)
-def read_public_note(
+async def read_public_note(
     *,
-    db: Session = Depends(get_db),
-    token: str
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    token: str,
+    format: str = Query("json", pattern="^(json|html)$")
 ) -> Any:
     try:
-        note = db.query(Note).filter(Note.public_token == token).first()
-        if not note:
-            raise HTTPException(status_code=404, detail="Note not found")
-        if note.visibility != VisibilityStatus.PUBLIC:
-            raise HTTPException(status_code=403, detail="Note is not public")
+        if format == "html" and not (settings.PUBLIC_NOTE_HTML and markdown_available()):
+            raise HTTPException(status_code=406, detail="HTML rendering is not available")
         
-        note_dict = {
-            **note.__dict__,
-            'visibility': note.visibility.value
-        }
-        return note_dict
+        entry = public_note_cache.get(token)
+        if entry is None:
+            generation = public_note_cache.generation
+            note = await db.scalar(select(Note).where(Note.public_token == token))
+            if not note:
+                raise HTTPException(status_code=404, detail="Note not found")
+            if note.visibility != VisibilityStatus.PUBLIC:
+                raise HTTPException(status_code=403, detail="Note is not public")
+            entry = public_note_cache.put(token, note, generation)
+        
+        if format == "html":
+            # A different representation needs its own strong validator
+            body, media_type, etag = entry.html, "text/html; charset=utf-8", entry.etag[:-1] + '-html"'
+        else:
+            body, media_type, etag = entry.body, "application/json", entry.etag
+        headers = cache_headers(
+            etag, entry.updated_at, f"public, max-age={settings.PUBLIC_NOTE_MAX_AGE}"
+        )
+        if is_not_modified(request, etag, entry.updated_at):
+            return not_modified(headers)
+
+        # Compressed here from the cache rather than by CompressionMiddleware,
+        # which passes encoded responses through
+        headers["Vary"] = "Accept-Encoding"
+        if len(body) >= settings.COMPRESSION_MIN_SIZE:
+            encoding = negotiate(request.headers.get("accept-encoding", ""))
+            if encoding:
+                body = public_note_cache.encoded(token, entry, format, encoding)
+                headers.update({"Content-Encoding": encoding, "ETag": encoded_etag(etag, encoding)})
+        return Response(content=body, media_type=media_type, headers=headers)
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error retrieving public note: {str(e)}")
+        logger.error("Error retrieving public note: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Error retrieving public note: {str(e)}"
-        ) 
\ No newline at end of file
+        )
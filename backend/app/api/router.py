@@ -1,7 +1,10 @@
 from fastapi import APIRouter
-from app.api.endpoints import auth, notes
+from app.api.endpoints import auth, notes, monitoring
+from app.core.config import settings
 
 api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
 api_router.include_router(notes.router, prefix="/notes", tags=["notes"])
+if settings.MONITORING_ENABLED:
+    api_router.include_router(monitoring.router, prefix="/monitoring", tags=["monitoring"])
  
\ No newline at end of file
@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+import anyio
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+from app.database.models import User
+from app.schemas.user import UserPrincipal
+
+logger = logging.getLogger(__name__)
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def as_dict(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class TTLCache:
+    """Size-bounded in-process LRU whose entries expire after ``ttl`` seconds."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # Invalidation can arrive from threadpool workers
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisCache:
+    """Cache backend over any client speaking the redis.asyncio get/set/delete API."""
+
+    def __init__(self, client, ttl: float, dumps: Callable[[Any], str], loads: Callable[[bytes], Any]):
+        self.client = client
+        self.ttl = ttl
+        self.dumps = dumps
+        self.loads = loads
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self.client.get(key)
+        return None if raw is None else self.loads(raw)
+
+    async def set(self, key: str, value: Any) -> None:
+        await self.client.set(key, self.dumps(value), ex=max(1, int(self.ttl)))
+
+    async def delete(self, key: str) -> None:
+        await self.client.delete(key)
+
+
+class UserCache:
+    """Caches the authenticated principal by user id to skip the per-request user query."""
+
+    key_prefix = "user-principal:"
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.stats = CacheStats()
+        self._pending = set()
+
+    def _key(self, user_id: int) -> str:
+        return f"{self.key_prefix}{user_id}"
+
+    async def get(self, user_id: int) -> Optional[UserPrincipal]:
+        if self.backend is None:
+            return None
+        principal = await self.backend.get(self._key(user_id))
+        if principal is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return principal
+
+    async def set(self, principal: UserPrincipal) -> None:
+        if self.backend is not None:
+            await self.backend.set(self._key(principal.id), principal)
+
+    async def invalidate(self, user_id: int) -> None:
+        if self.backend is not None:
+            self.stats.invalidations += 1
+            await self.backend.delete(self._key(user_id))
+
+    def invalidate_from_sync(self, user_id: int) -> None:
+        """Invalidate from sync code (ORM events) running on the loop or in a worker thread."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None:
+            task = loop.create_task(self.invalidate(user_id))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+            return
+        try:
+            anyio.from_thread.run(self.invalidate, user_id)
+        except RuntimeError:
+            # Not inside the app (scripts, shell): no event loop to hop to
+            asyncio.run(self.invalidate(user_id))
+
+
+def create_user_cache() -> UserCache:
+    backend = settings.USER_CACHE_BACKEND
+    if backend == "memory":
+        return UserCache(TTLCache(settings.USER_CACHE_MAX_ENTRIES, settings.USER_CACHE_TTL))
+    if backend == "redis":
+        return UserCache(
+            RedisCache(
+                get_redis(),
+                settings.USER_CACHE_TTL,
+                dumps=lambda principal: principal.model_dump_json(),
+                loads=UserPrincipal.model_validate_json,
+            )
+        )
+    if backend != "none":
+        logger.warning("Unknown USER_CACHE_BACKEND %r, user cache disabled", backend)
+    return UserCache()
+
+
+user_cache = create_user_cache()
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _mark_user_stale(mapper, connection, target) -> None:
+    # Covers is_active toggles and any other change to the row; bulk UPDATE
+    # statements bypass this and rely on the TTL
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("stale_user_ids", set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_stale_users(session) -> None:
+    # Only after commit, so a concurrent request cannot re-cache the old row
+    for user_id in session.info.pop("stale_user_ids", ()):
+        user_cache.invalidate_from_sync(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_stale_users(session) -> None:
+    session.info.pop("stale_user_ids", None)
@@ -0,0 +1,121 @@
+"""
+Content-coding negotiation and the encoders behind CompressionMiddleware
+(app.core.middleware) and precompressed cache entries.
+
+gzip is always available; br needs the brotli package and zstd the
+zstandard package. COMPRESSION_ENCODINGS lists the codings to offer, in
+the server's order of preference for clients that accept several equally.
+"""
+import re
+import zlib
+from typing import Optional, Tuple
+
+from app.core.config import settings
+
+try:
+    import brotli
+except ImportError:  # optional: br is not offered
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional: zstd is not offered
+    zstandard = None
+
+GZIP_LEVEL = 6
+# Brotli's higher qualities are far too slow for responses built per request
+BROTLI_QUALITY = 4
+ZSTD_LEVEL = 3
+
+AVAILABLE = {"gzip": True, "br": brotli is not None, "zstd": zstandard is not None}
+
+# Compressed responses get their own strong validator, "<etag>-<coding>"
+_ETAG_SUFFIX_RE = re.compile(r'-(?:gzip|br|zstd)"')
+
+
+def offered_encodings() -> Tuple[str, ...]:
+    names = (name.strip().lower() for name in settings.COMPRESSION_ENCODINGS.split(","))
+    return tuple(name for name in names if AVAILABLE.get(name))
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """The offered coding the client prefers, by q-value then by our order, or None."""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        q = 1.0
+        match = re.search(r"q\s*=\s*([0-9.]+)", params)
+        if match:
+            try:
+                q = float(match[1])
+            except ValueError:
+                q = 0.0
+        if name:
+            weights[name] = q
+    best, best_q = None, 0.0
+    for name in offered_encodings():
+        q = weights.get(name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    raise ValueError(f"Unsupported content coding {encoding}")
+
+
+class StreamCompressor:
+    """
+    Compresses a response body chunk by chunk. Every chunk is flushed, so
+    what the application has sent reaches the client without waiting for
+    the next one.
+    """
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        elif encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        elif encoding == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+        else:
+            raise ValueError(f"Unsupported content coding {encoding}")
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self.encoding == "gzip":
+            return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        if self.encoding == "br":
+            return self._compressor.process(chunk) + self._compressor.flush()
+        return self._compressor.compress(chunk) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    return f'{etag[:-1]}-{encoding}"' if etag.endswith('"') else etag
+
+
+def strip_encoded_etags(header: str) -> Tuple[str, Optional[str]]:
+    """
+    Validators sent back by clients, with the coding suffixes of
+    encoded_etag() removed so handlers compare them to their own ETags,
+    and the last suffix removed (without the dash), if any.
+    """
+    suffixes = _ETAG_SUFFIX_RE.findall(header)
+    if not suffixes:
+        return header, None
+    return _ETAG_SUFFIX_RE.sub('"', header), suffixes[-1][1:-1]
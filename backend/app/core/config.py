@@ -5,10 +5,94 @@ from pathlib import Path
 env_path = Path(__file__).parent.parent.parent / '.env'
 load_dotenv(dotenv_path=env_path)
 
+def _getenv_bool(name: str, default: str = "false") -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
 class Settings:
     PROJECT_NAME: str = "Note management API"
 
     DATABASE_URL: str = os.getenv("DATABASE_URL")
+    # Serve requests through AsyncSession instead of a threaded sync Session
+    DATABASE_ASYNC: bool = _getenv_bool("DATABASE_ASYNC")
+
+    # Connection pool (ignored for SQLite)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING: bool = _getenv_bool("DB_POOL_PRE_PING", "true")
+    DB_STATEMENT_TIMEOUT_MS: int = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+    # Behind PgBouncer in transaction mode: no app-side pool, no prepared statements
+    DB_PGBOUNCER: bool = _getenv_bool("DB_PGBOUNCER")
+
+    REDIS_URL: str = os.getenv("REDIS_URL")
+
+    # Authenticated user cache: "memory", "redis" or "none"
+    USER_CACHE_BACKEND: str = os.getenv("USER_CACHE_BACKEND", "memory").lower()
+    USER_CACHE_TTL: float = float(os.getenv("USER_CACHE_TTL", "60"))
+    USER_CACHE_MAX_ENTRIES: int = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+
+    # Rate limiting: RATE_LIMIT requests per RATE_LIMIT_WINDOW seconds per
+    # user (or IP when anonymous), plus optional per-route rules such as
+    # "POST /api/auth/login=5/60; /api/notes/bulk=10/60"
+    RATE_LIMIT: int = int(os.getenv("RATE_LIMIT", "100"))
+    RATE_LIMIT_WINDOW: int = int(os.getenv("RATE_LIMIT_WINDOW", "60"))
+    RATE_LIMIT_RULES: str = os.getenv("RATE_LIMIT_RULES", "")
+    # "memory" (per process) or "redis" (shared by all workers via REDIS_URL)
+    RATE_LIMIT_BACKEND: str = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+    RATE_LIMIT_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+    # Maximum number of operations accepted by POST /api/notes/bulk
+    BULK_MAX_OPERATIONS: int = int(os.getenv("BULK_MAX_OPERATIONS", "10000"))
+    # Rows fetched per round trip by streaming exports
+    EXPORT_BATCH_SIZE: int = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+    IMPORT_BATCH_SIZE: int = int(os.getenv("IMPORT_BATCH_SIZE", "2000"))
+    IMPORT_MAX_ERRORS: int = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+    IMPORT_MAX_RECORD_BYTES: int = int(os.getenv("IMPORT_MAX_RECORD_BYTES", str(10 * 1024 * 1024)))
+    PUBLIC_NOTE_MAX_AGE: int = int(os.getenv("PUBLIC_NOTE_MAX_AGE", "60"))
+    PUBLIC_NOTE_CACHE_TTL: float = float(os.getenv("PUBLIC_NOTE_CACHE_TTL", "30"))
+    PUBLIC_NOTE_CACHE_MAX_BYTES: int = int(os.getenv("PUBLIC_NOTE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    # Serve ?format=html for public notes (needs markdown-it-py)
+    PUBLIC_NOTE_HTML: bool = _getenv_bool("PUBLIC_NOTE_HTML", "true")
+
+    # Note content of CONTENT_COMPRESSION_MIN_BYTES or more is stored
+    # compressed: "zstd" (needs the zstandard package, else zlib is used),
+    # "zlib" or "none". Rows are readable whatever the current setting.
+    CONTENT_COMPRESSION: str = os.getenv("CONTENT_COMPRESSION", "zstd").lower()
+    CONTENT_COMPRESSION_MIN_BYTES: int = int(os.getenv("CONTENT_COMPRESSION_MIN_BYTES", "2048"))
+
+    # Response compression: the codings offered, by preference ("br" needs
+    # brotli, "zstd" zstandard; missing ones are skipped), and the smallest
+    # body worth compressing. Streamed bodies are compressed whatever their size.
+    COMPRESSION_ENCODINGS: str = os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip")
+    COMPRESSION_MIN_SIZE: int = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+
+    # Every Nth revision of a note is stored whole, bounding how many
+    # deltas rebuilding a revision has to apply
+    REVISION_KEYFRAME_INTERVAL: int = int(os.getenv("REVISION_KEYFRAME_INTERVAL", "50"))
+    # Pushed note events (GET /api/notes/events): "memory" (this process
+    # only) or "postgres" (LISTEN/NOTIFY, shared by all workers)
+    EVENT_BACKEND: str = os.getenv("EVENT_BACKEND", "memory").lower()
+    # Events buffered per connection before the client is told to resync
+    EVENT_BUFFER_SIZE: int = int(os.getenv("EVENT_BUFFER_SIZE", "256"))
+    EVENT_MAX_SUBSCRIPTIONS: int = int(os.getenv("EVENT_MAX_SUBSCRIPTIONS", "10000"))
+    EVENT_HEARTBEAT_SECONDS: float = float(os.getenv("EVENT_HEARTBEAT_SECONDS", "15"))
+
+    # GET /metrics (Prometheus text format): request, query, pool and
+    # bcrypt metrics of this worker. Unauthenticated like the monitoring
+    # endpoints below, so off by default too.
+    METRICS_ENABLED: bool = _getenv_bool("METRICS_ENABLED")
+    # /api/monitoring/* (pool, cache and event stream state). Unauthenticated,
+    # so off unless the API is only reachable from a trusted network.
+    MONITORING_ENABLED: bool = _getenv_bool("MONITORING_ENABLED")
+
+    # Logging: records are written by a background thread. LOG_FORMAT is
+    # "json" or "text"; DEBUG records are kept for LOG_DEBUG_SAMPLE_RATE of
+    # requests; past LOG_QUEUE_SIZE pending records, new ones are dropped.
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json").lower()
+    LOG_DEBUG_SAMPLE_RATE: float = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
 
     JWT_SECRET: str = os.getenv("JWT_SECRET")
     JWT_ALGORITHM: str = os.getenv("JWT_ALGORITHM")
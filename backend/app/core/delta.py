@@ -0,0 +1,103 @@
+"""
+Text deltas for note revisions. A delta is a list of operations that
+rebuild the new text from the old one: an ``[start, end]`` pair copies
+``old[start:end]``, a string is inserted as is. Lines are matched first,
+and runs of replaced lines are refined character by character when short.
+Deltas and full texts are stored zlib-compressed.
+"""
+import difflib
+import zlib
+from typing import List, Union
+
+import orjson
+
+# Replaced runs longer than this are stored whole rather than diffed by character
+CHAR_DIFF_MAX = 4096
+# Copies shorter than this cost more to encode than the text itself
+MIN_COPY = 8
+COMPRESSION_LEVEL = 6
+NO_NEWLINE_MARKER = "\\ No newline at end of file"
+
+Op = Union[List[int], str]
+
+
+def _copy(ops: List[Op], old: str, start: int, end: int) -> None:
+    if end - start < MIN_COPY:
+        _insert(ops, old[start:end])
+    elif ops and isinstance(ops[-1], list) and ops[-1][1] == start:
+        ops[-1][1] = end
+    else:
+        ops.append([start, end])
+
+
+def _insert(ops: List[Op], text: str) -> None:
+    if not text:
+        return
+    if ops and isinstance(ops[-1], str):
+        ops[-1] += text
+    else:
+        ops.append(text)
+
+
+def diff_ops(old: str, new: str) -> List[Op]:
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    offsets = [0]
+    for line in old_lines:
+        offsets.append(offsets[-1] + len(line))
+
+    ops: List[Op] = []
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            _copy(ops, old, offsets[i1], offsets[i2])
+        elif tag == "insert":
+            _insert(ops, "".join(new_lines[j1:j2]))
+        elif tag == "replace":
+            old_text, new_text = old[offsets[i1]:offsets[i2]], "".join(new_lines[j1:j2])
+            if len(old_text) > CHAR_DIFF_MAX or len(new_text) > CHAR_DIFF_MAX:
+                _insert(ops, new_text)
+                continue
+            chars = difflib.SequenceMatcher(None, old_text, new_text, autojunk=False)
+            for char_tag, a1, a2, b1, b2 in chars.get_opcodes():
+                if char_tag == "equal":
+                    _copy(ops, old, offsets[i1] + a1, offsets[i1] + a2)
+                elif char_tag != "delete":
+                    _insert(ops, new_text[b1:b2])
+    return ops
+
+
+def apply_ops(old: str, ops: List[Op]) -> str:
+    return "".join(old[op[0]:op[1]] if isinstance(op, list) else op for op in ops)
+
+
+def make_delta(old: str, new: str) -> bytes:
+    return zlib.compress(orjson.dumps(diff_ops(old, new)), COMPRESSION_LEVEL)
+
+
+def apply_delta(old: str, delta: bytes) -> str:
+    return apply_ops(old, orjson.loads(zlib.decompress(delta)))
+
+
+def pack_text(text: str) -> bytes:
+    return zlib.compress(text.encode(), COMPRESSION_LEVEL)
+
+
+def unpack_text(data: bytes) -> str:
+    return zlib.decompress(data).decode()
+
+
+def split_lines(text: str) -> List[str]:
+    # Lines end at "\n" only, as in diff tools; str.splitlines() also breaks on \r, \x0b, \u2028...
+    lines = [line + "\n" for line in text.split("\n")]
+    lines[-1] = lines[-1][:-1]
+    return lines if lines[-1] else lines[:-1]
+
+
+def unified_diff(old: str, new: str, old_name: str, new_name: str) -> str:
+    # difflib leaves a last line without its newline as is, which would run
+    # into the next diff line; diff tools mark it instead
+    return "".join(
+        line if line.endswith("\n") else f"{line}\n{NO_NEWLINE_MARKER}\n"
+        for line in difflib.unified_diff(split_lines(old), split_lines(new), fromfile=old_name, tofile=new_name)
+    )
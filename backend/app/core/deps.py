@@ -1,26 +1,45 @@
-from typing import Generator, Optional
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, AsyncIterator, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import jwt
 
-from app.database.session import SessionLocal
+from app.core.cache import user_cache
+from app.core.config import settings
+from app.database.session import SessionLocal, AsyncSessionLocal, ThreadedSession
 from app.database.models import User
 from app.core.security import JWT_SECRET, JWT_ALGORITHM
+from app.schemas.user import UserPrincipal
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-def get_db() -> Generator:
+@asynccontextmanager
+async def open_session() -> AsyncIterator:
+    """
+    A session outside dependency injection, e.g. for streaming responses
+    that keep reading after the request's own session has been closed.
+    """
+    if settings.DATABASE_ASYNC:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+
+    db = ThreadedSession(SessionLocal())
     try:
-        db = SessionLocal()
         yield db
     finally:
-        db.close()
+        await db.close()
+
+async def get_db() -> AsyncGenerator:
+    async with open_session() as db:
+        yield db
 
 async def get_current_user(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     token: str = Depends(oauth2_scheme)
-) -> User:
+) -> UserPrincipal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -31,17 +50,25 @@ async def get_current_user(
         user_id: Optional[int] = payload.get("sub")
         if user_id is None:
             raise credentials_exception
-    except jwt.JWTError:
+        # asyncpg does not coerce the string "sub" claim to an integer
+        user_id = int(user_id)
+    except (jwt.JWTError, ValueError):
         raise credentials_exception
     
-    user = db.query(User).filter(User.id == user_id).first()
+    principal = await user_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    user = await db.scalar(select(User).where(User.id == user_id))
     if user is None:
         raise credentials_exception
-    return user
+    principal = UserPrincipal.model_validate(user)
+    await user_cache.set(principal)
+    return principal
 
 async def get_current_active_user(
-    current_user: User = Depends(get_current_user),
-) -> User:
+    current_user: UserPrincipal = Depends(get_current_user),
+) -> UserPrincipal:
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user 
\ No newline at end of file
+    return current_user
@@ -0,0 +1,333 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+import orjson
+from sqlalchemy.engine import make_url
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "note_events"
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+NOTIFY_MAX_PAYLOAD = 7900
+RECONNECT_MAX_DELAY = 30
+
+
+class TooManySubscriptions(Exception):
+    pass
+
+
+def note_event(type: str, note_id: int, owner_id: int, seq: int, user_id: Optional[int] = None) -> dict:
+    """
+    Events only say what changed. Clients fetch the notes themselves,
+    which keeps NOTIFY payloads and per-connection buffers small.
+    """
+    event = {"seq": seq, "type": type, "note_id": note_id, "owner_id": owner_id}
+    if user_id is not None:
+        event["user_id"] = user_id
+    return event
+
+
+class Subscription:
+    """
+    One connected client. Events wait in a buffer of at most ``max_size``.
+    A client that falls further behind is marked overflowed, and from then
+    on it has to catch up through the changes feed.
+    """
+
+    __slots__ = ("user_id", "note_ids", "overflowed", "_buffer", "_max_size", "_ready")
+
+    def __init__(self, user_id: int, max_size: int):
+        self.user_id = user_id
+        # Notes shared with the user, whose events reach them too
+        self.note_ids: Set[int] = set()
+        self.overflowed = False
+        self._buffer = deque()
+        self._max_size = max_size
+        self._ready = asyncio.Event()
+
+    def push(self, event: dict) -> None:
+        if self.overflowed:
+            return
+        if len(self._buffer) >= self._max_size:
+            self.overflow()
+            return
+        self._buffer.append(event)
+        self._ready.set()
+
+    def overflow(self) -> None:
+        self.overflowed = True
+        self._buffer.clear()
+        self._ready.set()
+
+    def drain(self) -> List[dict]:
+        events = list(self._buffer)
+        self._buffer.clear()
+        self._ready.clear()
+        return events
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait up to ``timeout`` seconds for events. Returns False on timeout."""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+
+class MemoryEventBackend:
+    """Hands events straight to this process's bus. Suits tests and single-worker deployments."""
+
+    async def start(self, deliver: Callable[[List[dict]], None], lost: Callable[[], None]) -> None:
+        self._deliver = deliver
+
+    async def publish(self, events: List[dict]) -> None:
+        self._deliver(events)
+
+    async def close(self) -> None:
+        pass
+
+
+def pack_payloads(events: Iterable[dict]) -> Iterator[str]:
+    """JSON arrays of events, each small enough for one NOTIFY."""
+    batch, size = [], 2
+    for event in events:
+        encoded = orjson.dumps(event)
+        if batch and size + len(encoded) + 1 > NOTIFY_MAX_PAYLOAD:
+            yield (b"[" + b",".join(batch) + b"]").decode()
+            batch, size = [], 2
+        batch.append(encoded)
+        size += len(encoded) + 1
+    if batch:
+        yield (b"[" + b",".join(batch) + b"]").decode()
+
+
+class PostgresEventBackend:
+    """
+    LISTEN/NOTIFY on a dedicated asyncpg connection. Every worker listens,
+    the publishing one included, so an event reaches every worker's
+    subscribers the same way.
+    """
+
+    def __init__(self, database_url: str):
+        self.dsn = make_url(database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self._connection = None
+        self._lock = asyncio.Lock()
+        self._reconnect_task = None
+
+    async def start(self, deliver: Callable[[List[dict]], None], lost: Callable[[], None]) -> None:
+        self._deliver = deliver
+        self._lost = lost
+        await self._connect()
+
+    async def _connect(self) -> None:
+        import asyncpg
+
+        self._connection = await asyncpg.connect(self.dsn)
+        self._connection.add_termination_listener(self._on_terminate)
+        await self._connection.add_listener(NOTIFY_CHANNEL, self._on_notify)
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        try:
+            events = orjson.loads(payload)
+        except orjson.JSONDecodeError:
+            logger.error("Ignoring malformed note event payload: %r", payload[:200])
+            return
+        self._deliver(events)
+
+    def _on_terminate(self, connection) -> None:
+        logger.error("Note event connection lost, reconnecting")
+        # Events sent while we were away are lost
+        self._lost()
+        self._reconnect_task = asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        delay = 1
+        while True:
+            try:
+                await self._connect()
+                return
+            except Exception as e:
+                logger.error("Error reconnecting note events: %s", e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    async def publish(self, events: List[dict]) -> None:
+        # One connection runs one query at a time
+        async with self._lock:
+            for payload in pack_payloads(events):
+                await self._connection.execute("SELECT pg_notify($1, $2)", NOTIFY_CHANNEL, payload)
+
+    async def close(self) -> None:
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+        if self._connection is not None:
+            self._connection.remove_termination_listener(self._on_terminate)
+            await self._connection.close()
+
+
+class NoteEventBus:
+    """
+    Delivers note events to this process's subscriptions. Events come in
+    through the backend, so with a shared backend (Postgres) every worker
+    sees what the others publish.
+
+    Subscriptions are indexed by user and by watched note. An event costs
+    its recipients, whatever the number of idle connections.
+    """
+
+    def __init__(self, backend, max_subscriptions: int, buffer_size: int):
+        self.backend = backend
+        self.max_subscriptions = max_subscriptions
+        self.buffer_size = buffer_size
+        self.received = 0
+        self.overflows = 0
+        self._by_user: Dict[int, Set[Subscription]] = {}
+        self._by_note: Dict[int, Set[Subscription]] = {}
+        self._count = 0
+        self._started = False
+        self._start_lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    async def start(self) -> None:
+        if self._started:
+            return
+        async with self._start_lock:
+            if not self._started:
+                await self.backend.start(self.dispatch, self.resync_all)
+                self._started = True
+
+    async def close(self) -> None:
+        if self._started:
+            await self.backend.close()
+            self._started = False
+
+    async def publish(self, events: List[dict]) -> None:
+        """Publish after commit. A failure is logged, not raised: the write has happened."""
+        if not events:
+            return
+        try:
+            await self.start()
+            await self.backend.publish(events)
+        except Exception as e:
+            logger.error("Error publishing note events: %s", e)
+
+    async def subscribe(self, user_id: int) -> Subscription:
+        await self.start()
+        if self._count >= self.max_subscriptions:
+            raise TooManySubscriptions()
+        subscription = Subscription(user_id, self.buffer_size)
+        self._by_user.setdefault(user_id, set()).add(subscription)
+        self._count += 1
+        return subscription
+
+    def watch(self, subscription: Subscription, note_ids: Iterable[int]) -> None:
+        for note_id in note_ids:
+            subscription.note_ids.add(note_id)
+            self._by_note.setdefault(note_id, set()).add(subscription)
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._by_user.get(subscription.user_id)
+        if subscribers is None or subscription not in subscribers:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._by_user[subscription.user_id]
+        for note_id in subscription.note_ids:
+            self._unwatch_note(subscription, note_id)
+        subscription.note_ids.clear()
+        self._count -= 1
+
+    def _unwatch_note(self, subscription: Subscription, note_id: int) -> None:
+        watchers = self._by_note.get(note_id)
+        if watchers is not None:
+            watchers.discard(subscription)
+            if not watchers:
+                del self._by_note[note_id]
+
+    def dispatch(self, events: List[dict]) -> None:
+        for event in events:
+            self.received += 1
+            note_id, kind = event["note_id"], event["type"]
+            recipients = set(self._by_user.get(event["owner_id"], ()))
+            recipients.update(self._by_note.get(note_id, ()))
+            if kind in ("share_added", "share_removed"):
+                recipients.update(self._by_user.get(event["user_id"], ()))
+            for subscription in recipients:
+                if not subscription.overflowed:
+                    subscription.push(event)
+                    self.overflows += subscription.overflowed
+
+            if kind == "share_added":
+                for subscription in self._by_user.get(event["user_id"], ()):
+                    self.watch(subscription, [note_id])
+            elif kind == "share_removed":
+                for subscription in self._by_user.get(event["user_id"], ()):
+                    subscription.note_ids.discard(note_id)
+                    self._unwatch_note(subscription, note_id)
+            elif kind == "note_deleted":
+                for subscription in self._by_note.pop(note_id, ()):
+                    subscription.note_ids.discard(note_id)
+
+    def resync_all(self) -> None:
+        """Events may have been missed: every client has to catch up."""
+        for subscribers in self._by_user.values():
+            for subscription in subscribers:
+                subscription.overflow()
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "subscriptions": self._count,
+            "users": len(self._by_user),
+            "watched_notes": len(self._by_note),
+            "received": self.received,
+            "overflows": self.overflows,
+        }
+
+
+def _sse(event: dict) -> bytes:
+    # The id is the change seq: a valid ``since`` token for the changes feed
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (event["seq"], event["type"].encode(), orjson.dumps(event))
+
+
+async def event_stream(bus: NoteEventBus, subscription: Subscription, heartbeat: float):
+    """
+    Server-sent events for ``subscription``, with a comment line every
+    ``heartbeat`` seconds of silence. The stream ends with a ``resync``
+    event if the client fell behind. The subscription is released when the
+    stream ends or the client goes away.
+    """
+    try:
+        yield b"retry: 5000\n\n"
+        while True:
+            if not await subscription.wait(heartbeat):
+                yield b": keepalive\n\n"
+                continue
+            if subscription.overflowed:
+                yield b"event: resync\ndata: {}\n\n"
+                return
+            events = subscription.drain()
+            if events:
+                yield b"".join(_sse(event) for event in events)
+    finally:
+        bus.unsubscribe(subscription)
+
+
+def create_note_event_bus() -> NoteEventBus:
+    backend = settings.EVENT_BACKEND
+    if backend == "postgres":
+        event_backend = PostgresEventBackend(settings.DATABASE_URL)
+    else:
+        if backend != "memory":
+            logger.warning("Unknown EVENT_BACKEND %r, using the in-memory backend", backend)
+        event_backend = MemoryEventBackend()
+    return NoteEventBus(event_backend, settings.EVENT_MAX_SUBSCRIPTIONS, settings.EVENT_BUFFER_SIZE)
+
+
+note_events = create_note_event_bus()
@@ -0,0 +1,86 @@
+import hashlib
+from datetime import datetime, UTC
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Optional, Tuple
+
+from fastapi import Request, Response
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes; everything is stored as UTC
+    return value.replace(tzinfo=UTC) if value.tzinfo is None else value.astimezone(UTC)
+
+
+def _version(note_id: int, updated_at: Optional[datetime]) -> str:
+    return f"{note_id}:{_as_utc(updated_at).isoformat() if updated_at else ''}"
+
+
+def note_etag(note_id: int, updated_at: Optional[datetime]) -> str:
+    """Strong ETag for one note; it changes whenever ``updated_at`` does."""
+    return f'"{hashlib.blake2b(_version(note_id, updated_at).encode(), digest_size=16).hexdigest()}"'
+
+
+def list_etag(versions: Iterable[Tuple[int, Optional[datetime]]], *extra) -> str:
+    """Strong ETag for a list of notes given their ``(id, updated_at)`` in order."""
+    digest = hashlib.blake2b(digest_size=16)
+    for note_id, updated_at in versions:
+        digest.update(_version(note_id, updated_at).encode())
+        digest.update(b";")
+    for value in extra:
+        digest.update(f"|{value}".encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def http_date(value: datetime) -> str:
+    return format_datetime(_as_utc(value).replace(microsecond=0), usegmt=True)
+
+
+def _etags(header: str) -> list:
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def _opaque(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+    Evaluate If-None-Match (weak comparison) or, only when it is absent,
+    If-Modified-Since, as RFC 9110 orders them.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = _etags(if_none_match)
+        return "*" in tags or _opaque(etag) in {_opaque(tag) for tag in tags}
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            return False
+        return _as_utc(last_modified).replace(microsecond=0) <= since
+    return False
+
+
+def if_match_fails(request: Request, etag: str) -> bool:
+    """True when an If-Match header is present and does not match ``etag`` (strong comparison)."""
+    if_match = request.headers.get("if-match")
+    if if_match is None:
+        return False
+    tags = _etags(if_match)
+    return "*" not in tags and etag not in tags
+
+
+def cache_headers(etag: str, last_modified: Optional[datetime] = None, cache_control: str = "private, no-cache") -> dict:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def not_modified(headers: dict) -> Response:
+    # 304s carry the validators and caching headers but never a body
+    return Response(status_code=304, headers=headers)
@@ -0,0 +1,148 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+import re
+import sys
+from contextvars import ContextVar
+from datetime import datetime, UTC
+from typing import Optional
+
+import orjson
+
+from app.core.config import settings
+
+# Set by RequestLoggingMiddleware for the duration of a request
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+# Whether this request's DEBUG records are kept, see LOG_DEBUG_SAMPLE_RATE
+debug_sampled_var: ContextVar[bool] = ContextVar("debug_sampled", default=True)
+
+REDACTED = "[REDACTED]"
+SECRET_KEYS = frozenset({
+    "password", "passwd", "hashed_password", "secret", "token", "access_token", "authorization", "jwt_secret",
+})
+_SECRET_PATTERNS = (
+    # JWTs, bcrypt hashes and bearer credentials wherever they appear
+    (re.compile(r"\beyJ[\w-]+\.[\w-]+\.[\w-]*"), REDACTED),
+    (re.compile(r"\$2[abxy]?\$\d{2}\$[./A-Za-z0-9]{53}"), REDACTED),
+    (re.compile(r"(?i)\b(Bearer\s+)[\w\-.~+/]+=*"), r"\1" + REDACTED),
+    # password=..., 'password': '...', "token": "..."
+    (
+        re.compile(
+            r"""(?i)(["']?\b(?:%s)["']?\s*[:=]\s*)("[^"]*"|'[^']*'|[^\s,;&}]+)""" % "|".join(sorted(SECRET_KEYS))
+        ),
+        r"\1" + REDACTED,
+    ),
+)
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+# Arguments of these types are safe to format later on another thread
+_PLAIN_TYPES = (str, int, float, bool, type(None), bytes)
+
+
+def redact(text: str) -> str:
+    for pattern, replacement in _SECRET_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def _extra_fields(record: logging.LogRecord) -> dict:
+    return {
+        key: REDACTED if key.lower() in SECRET_KEYS else value
+        for key, value in record.__dict__.items()
+        if key not in _RECORD_ATTRS
+    }
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, fields passed with ``extra=`` included."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, UTC).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": redact(record.getMessage()),
+            "request_id": getattr(record, "request_id", None),
+            **_extra_fields(record),
+        }
+        if record.exc_info:
+            entry["exc_info"] = redact(self.formatException(record.exc_info))
+        return orjson.dumps(entry, default=str).decode()
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        return redact(super().format(record))
+
+
+class RequestContextFilter(logging.Filter):
+    """Tags records with the request id and drops DEBUG records of unsampled requests."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return record.levelno > logging.DEBUG or debug_sampled_var.get()
+
+
+class BackgroundQueueHandler(logging.handlers.QueueHandler):
+    """
+    Only enqueues: the message is formatted, redacted and written by the
+    listener thread. When the queue is full, records are dropped and
+    counted rather than blocking the caller.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Objects may change or lazy-load before the listener gets to them
+        if isinstance(record.args, tuple):
+            record.args = tuple(arg if isinstance(arg, _PLAIN_TYPES) else str(arg) for arg in record.args)
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _StdoutHandler(logging.StreamHandler):
+    # Looked up on every write, so a replaced sys.stdout (tests, reloaders) is followed
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+_queue_handler: Optional[BackgroundQueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging() -> None:
+    """Route the root logger through the background writer. Safe to call more than once."""
+    global _queue_handler, _listener
+    if _listener is not None:
+        return
+    output = _StdoutHandler()
+    output.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else TextFormatter())
+
+    _queue_handler = BackgroundQueueHandler(queue.Queue(settings.LOG_QUEUE_SIZE))
+    _queue_handler.addFilter(RequestContextFilter())
+    root = logging.getLogger()
+    root.handlers[:] = [_queue_handler]
+    root.setLevel(settings.LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, output)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def dropped_records() -> int:
+    return _queue_handler.dropped if _queue_handler is not None else 0
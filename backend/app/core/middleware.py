@@ -1,89 +1,303 @@
-from fastapi import Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
 from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import time
 import logging
-from typing import Callable
 import os
+import random
+import re
+import uuid
 from dotenv import load_dotenv
 
+from app.core import metrics
+from app.core.compression import StreamCompressor, compress, encoded_etag, negotiate, strip_encoded_etags
+from app.core.config import settings
+from app.core.logs import debug_sampled_var, request_id_var
+from app.core.ratelimit import RateLimiter, client_identity, create_rate_limiter
+
 load_dotenv()
 
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Client-supplied request ids are kept when they look like ids
+_REQUEST_ID_RE = re.compile(r"^[\w\-.:]{1,64}$")
 
-RATE_LIMIT = int(os.getenv("RATE_LIMIT")) 
-RATE_LIMIT_WINDOW = 60  
+# The middlewares below are plain ASGI callables rather than
+# BaseHTTPMiddleware subclasses: no extra task or body stream per layer, and
+# streaming responses pass through untouched.
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app):
-        super().__init__(app)
-        self.requests = {}
+SECURITY_HEADERS = (
+    (b"x-content-type-options", b"nosniff"),
+    (b"x-frame-options", b"DENY"),
+    (b"x-xss-protection", b"1; mode=block"),
+    (b"strict-transport-security", b"max-age=31536000; includeSubDomains"),
+    (b"content-security-policy", b"default-src 'self'"),
+)
+_SECURITY_HEADER_NAMES = frozenset(name for name, _ in SECURITY_HEADERS)
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-    
-        client_ip = request.client.host
-        
-
-        current_time = time.time()
-        self.requests = {
-            ip: timestamps 
-            for ip, timestamps in self.requests.items()
-            if current_time - timestamps[-1] < RATE_LIMIT_WINDOW
-        }
-        
-        if client_ip in self.requests:
-            timestamps = self.requests[client_ip]
-            if len(timestamps) >= RATE_LIMIT:
-                return JSONResponse(
-                    status_code=429,
-                    content={"detail": "Too many requests"}
-                )
-            timestamps.append(current_time)
-        else:
-            self.requests[client_ip] = [current_time]
-        
-        return await call_next(request)
-
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        response = await call_next(request)
-        
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-        response.headers["Content-Security-Policy"] = "default-src 'self'"
-        
-        return response
-
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        start_time = time.time()
-        logger.info(f"Request started: {request.method} {request.url.path}")
-        
-        response = await call_next(request)
-        
-        process_time = time.time() - start_time
-        logger.info(
-            f"Request completed: {request.method} {request.url.path} "
-            f"Status: {response.status_code} "
-            f"Time: {process_time:.2f}s"
-        )
-        
-        return response
+# Media types worth compressing. Event streams are left alone: proxies and
+# clients must see each event as soon as it is sent.
+_COMPRESSIBLE_RE = re.compile(
+    r"^(text/(?!event-stream)|application/(json|x-ndjson|xml|javascript|[\w.-]+\+(json|xml))|image/svg\+xml)"
+)
+_UNCOMPRESSED_STATUSES = frozenset((204, 206, 304))
+
+_METRIC_METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"))
+
+
+def _header(scope: Scope, name: bytes) -> str:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return ""
+
+
+class RateLimitMiddleware:
+    def __init__(self, app: ASGIApp, limiter: RateLimiter = None):
+        self.app = app
+        self.limiter = limiter or create_rate_limiter()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        client = scope.get("client")
+        identity = client_identity(_header(scope, b"authorization"), client[0] if client else None)
+        result = await self.limiter.check(identity, scope["method"], scope["path"])
+
+        headers = [
+            (b"x-ratelimit-limit", str(result.limit).encode()),
+            (b"x-ratelimit-remaining", str(result.remaining).encode()),
+            (b"x-ratelimit-reset", str(result.reset_after).encode()),
+        ]
+        if not result.allowed:
+            response = JSONResponse(status_code=429, content={"detail": "Too many requests"})
+            response.raw_headers.extend(headers)
+            response.raw_headers.append((b"retry-after", str(result.reset_after).encode()))
+            await response(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), *headers]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+class SecurityHeadersMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    *(header for header in message.get("headers", ()) if header[0] not in _SECURITY_HEADER_NAMES),
+                    *SECURITY_HEADERS,
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+class RequestLoggingMiddleware:
+    """
+    Gives each request an id, from X-Request-ID or a new one, that tags
+    every record logged while it runs and is returned in X-Request-ID.
+    Also decides whether the request's DEBUG records are sampled.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        method, path = scope["method"], scope["path"]
+        request_id = _header(scope, b"x-request-id")
+        if not _REQUEST_ID_RE.match(request_id):
+            request_id = uuid.uuid4().hex
+        request_id_token = request_id_var.set(request_id)
+        sampled_token = debug_sampled_var.set(random.random() < settings.LOG_DEBUG_SAMPLE_RATE)
+        logger.debug("Request started: %s %s", method, path)
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = [*message.get("headers", ()), (b"x-request-id", request_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            process_time = time.perf_counter() - start_time
+            logger.info(
+                "Request completed: %s %s Status: %s Time: %.3fs", method, path, status_code, process_time,
+                extra={
+                    "method": method,
+                    "path": path,
+                    "status": status_code,
+                    "duration_ms": round(process_time * 1000, 2),
+                }
+            )
+            request_id_var.reset(request_id_token)
+            debug_sampled_var.reset(sampled_token)
+
+class CompressionMiddleware:
+    """
+    Compresses responses with the coding negotiated from Accept-Encoding
+    (see app.core.compression). Whole bodies are compressed from
+    COMPRESSION_MIN_SIZE bytes; streamed ones chunk by chunk, each chunk
+    flushed as it is sent. Responses already encoded and media types that
+    do not compress pass through untouched.
+
+    A compressed response is another representation, so it gets its own
+    strong ETag: the identity ETag with "-<coding>" appended. The suffix is
+    removed from If-None-Match and If-Match before handlers see them, and
+    put back on the ETag of 304 responses.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = None):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        revalidated = None
+        request_headers = []
+        for key, value in scope["headers"]:
+            if key in (b"if-none-match", b"if-match"):
+                stripped, coding = strip_encoded_etags(value.decode("latin-1"))
+                if coding:
+                    value = stripped.encode("latin-1")
+                    if key == b"if-none-match":
+                        revalidated = coding
+            request_headers.append((key, value))
+        # Updated in place: outer middlewares read what routing adds to the scope
+        scope["headers"] = request_headers
+
+        # HEAD responses announce the identity body's length; keep them identity
+        encoding = None if scope["method"] == "HEAD" else negotiate(_header(scope, b"accept-encoding"))
+        minimum_size = settings.COMPRESSION_MIN_SIZE if self.minimum_size is None else self.minimum_size
+        held_start = None
+        compressor = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal held_start, compressor
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", ()))
+                headers = MutableHeaders(raw=message["headers"])
+                if message["status"] == 304:
+                    if revalidated and "etag" in headers:
+                        headers["etag"] = encoded_etag(headers["etag"], revalidated)
+                        headers.add_vary_header("Accept-Encoding")
+                elif (
+                    message["status"] not in _UNCOMPRESSED_STATUSES
+                    and "content-encoding" not in headers
+                    and _COMPRESSIBLE_RE.match(headers.get("content-type", ""))
+                ):
+                    headers.add_vary_header("Accept-Encoding")
+                    length = headers.get("content-length")
+                    if encoding and not (length and int(length) < minimum_size):
+                        # Whether to compress depends on the body
+                        held_start = message
+                        return
+                await send(message)
+                return
+
+            if message["type"] != "http.response.body" or (held_start is None and compressor is None):
+                await send(message)
+                return
+
+            body, more_body = message.get("body", b""), message.get("more_body", False)
+            if held_start is not None:
+                start, held_start = held_start, None
+                if not more_body and len(body) < minimum_size:
+                    await send(start)
+                    await send(message)
+                    return
+                headers = MutableHeaders(raw=start["headers"])
+                headers["content-encoding"] = encoding
+                if "etag" in headers:
+                    headers["etag"] = encoded_etag(headers["etag"], encoding)
+                if not more_body:
+                    body = compress(body, encoding)
+                    headers["content-length"] = str(len(body))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                del headers["content-length"]
+                compressor = StreamCompressor(encoding)
+                await send(start)
+
+            chunk = compressor.compress(body)
+            if not more_body:
+                chunk += compressor.finish()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+class MetricsMiddleware:
+    """
+    Counts and times requests per route template (/api/notes/{note_id}, not
+    one series per note), read from the scope once routing has run. Paths
+    that match no route share the "unmatched" series. Durations include
+    streamed bodies, so long-lived routes like the event stream stand apart.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"] if scope["method"] in _METRIC_METHODS else "OTHER"
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        metrics.REQUESTS_IN_PROGRESS.inc(method)
+        start_time = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - start_time
+            metrics.REQUESTS_IN_PROGRESS.dec(method)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            metrics.REQUESTS.inc(method, route, str(status_code))
+            metrics.REQUEST_DURATION.observe(duration, method, route)
 
 def setup_middleware(app):
+    app.add_middleware(CompressionMiddleware)
     app.add_middleware(
         CORSMiddleware,
         allow_origins=os.getenv("ALLOWED_ORIGINS", "*").split(","),
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        # Lets browser clients read the validators they send back
+        expose_headers=["ETag", "Last-Modified", "X-Request-ID", "X-Note-Revision"],
     )
     
     app.add_middleware(
@@ -93,4 +307,7 @@ def setup_middleware(app):
 
     app.add_middleware(SecurityHeadersMiddleware)
     app.add_middleware(RequestLoggingMiddleware)
-    app.add_middleware(RateLimitMiddleware) 
\ No newline at end of file
+    app.add_middleware(RateLimitMiddleware)
+    if settings.METRICS_ENABLED:
+        # Outermost, so rate-limited requests are counted and timed too
+        app.add_middleware(MetricsMiddleware)
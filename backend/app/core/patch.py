@@ -0,0 +1,176 @@
+"""
+Text patches for PATCH /api/notes/{id}: range edits (by character or by
+line) or a unified diff, made against a base version of the content.
+
+Both forms are resolved into edits ``(start, end, text)`` that replace
+``base[start:end]``, in order and without overlap. When the note changed
+since the base, each edit is moved onto the current content if the text
+it touches was kept as is; edits touching changed text conflict.
+"""
+import bisect
+import re
+from typing import List, Optional, Sequence, Tuple
+
+from app.core.delta import NO_NEWLINE_MARKER, diff_ops, split_lines
+
+Edit = Tuple[int, int, str]
+
+_HUNK_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class PatchError(ValueError):
+    """The patch is malformed."""
+
+
+class PatchConflict(Exception):
+    """Some edits do not apply; ``indexes`` are their positions in the patch."""
+
+    def __init__(self, message: str, indexes: List[int]):
+        super().__init__(message)
+        self.indexes = indexes
+
+
+def _line_offsets(lines: List[str]) -> List[int]:
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+    return offsets
+
+
+def range_edits(text: str, operations: Sequence) -> List[Edit]:
+    """
+    Edits for operations with ``start``, ``end``, ``text`` and ``unit``:
+    ``"char"`` offsets or ``"line"`` numbers, 0-based, end excluded. A line
+    range covers the lines' newlines, so replacement lines need their own.
+    """
+    offsets = None
+    edits = []
+    for index, operation in enumerate(operations):
+        start, end = operation.start, operation.end
+        if operation.unit == "line":
+            offsets = offsets or _line_offsets(split_lines(text))
+            if not 0 <= start <= end < len(offsets):
+                raise PatchError(f"Operation {index}: lines {start}-{end} outside the {len(offsets) - 1} lines")
+            start, end = offsets[start], offsets[end]
+        elif not 0 <= start <= end <= len(text):
+            raise PatchError(f"Operation {index}: range {start}-{end} outside the {len(text)} characters")
+        edits.append((start, end, operation.text))
+    _check_order(edits, "Operation")
+    return edits
+
+
+def diff_edits(text: str, diff: str) -> List[Edit]:
+    """
+    Edits for a unified diff of ``text``, one per run of removed and added
+    lines. Context and removed lines must match ``text`` exactly; a hunk
+    that does not raises PatchConflict. File headers are ignored.
+    """
+    lines = split_lines(text)
+    offsets = _line_offsets(lines)
+    diff_lines = split_lines(diff)
+    edits, hunks, mismatched = [], [], []
+    i = 0
+    while i < len(diff_lines):
+        match = _HUNK_RE.match(diff_lines[i])
+        i += 1
+        if not match:
+            continue
+        hunk = len(hunks)
+        old_start, old_count = int(match[1]), int(match[2] or 1)
+        new_count = int(match[4] or 1)
+        # Counted from 1, except that an empty range names the line before it
+        line = old_start - 1 if old_count else old_start
+        old_seen = new_seen = 0
+        run_start, removed, added = line, [], []
+        body = []
+        while i < len(diff_lines) and (old_seen < old_count or new_seen < new_count or
+                                       diff_lines[i].rstrip("\r\n") == NO_NEWLINE_MARKER):
+            raw = diff_lines[i]
+            i += 1
+            if raw.rstrip("\r\n") == NO_NEWLINE_MARKER:
+                if body:
+                    body[-1] = (body[-1][0], body[-1][1].rstrip("\r\n"))
+                continue
+            # Some editors strip the space of empty context lines
+            kind, content = (" ", raw) if raw in ("\n", "\r\n") else (raw[:1], raw[1:])
+            if kind not in (" ", "-", "+"):
+                raise PatchError(f"Hunk {hunk}: unexpected line {raw!r}")
+            body.append((kind, content))
+            if kind != "+":
+                old_seen += 1
+            if kind != "-":
+                new_seen += 1
+        if (old_seen, new_seen) != (old_count, new_count):
+            raise PatchError(f"Hunk {hunk}: truncated")
+        hunks.append(hunk)
+
+        for kind, content in body:
+            if kind == "+":
+                added.append(content)
+                continue
+            if line >= len(lines) or lines[line] != content:
+                mismatched.append(hunk)
+                break
+            if kind == "-":
+                removed.append(content)
+            else:
+                if removed or added:
+                    edits.append((offsets[run_start], offsets[line], "".join(added)))
+                run_start, removed, added = line + 1, [], []
+            line += 1
+        else:
+            if removed or added:
+                edits.append((offsets[run_start], offsets[line], "".join(added)))
+    if mismatched:
+        raise PatchConflict("The diff does not match the base content", mismatched)
+    _check_order(edits, "Hunk")
+    return edits
+
+
+def _check_order(edits: List[Edit], name: str) -> None:
+    for index in range(1, len(edits)):
+        if edits[index][0] < edits[index - 1][1]:
+            raise PatchError(f"{name} {index} overlaps or precedes the one before it")
+
+
+def rebase(base: str, current: str, edits: List[Edit]) -> List[Edit]:
+    """Move edits of ``base`` onto ``current``; see the module docstring."""
+    if base == current:
+        return edits
+    # (base start, base end, current start) of every run of kept text
+    kept_starts, kept = [], []
+    position = 0
+    for op in diff_ops(base, current):
+        if isinstance(op, list):
+            kept_starts.append(op[0])
+            kept.append((op[0], op[1], position))
+            position += op[1] - op[0]
+        else:
+            position += len(op)
+    moved, conflicts = [], []
+    for index, (start, end, text) in enumerate(edits):
+        run = bisect.bisect_right(kept_starts, start) - 1
+        if run < 0 or end > kept[run][1]:
+            conflicts.append(index)
+            continue
+        shift = kept[run][2] - kept[run][0]
+        moved.append((start + shift, end + shift, text))
+    if conflicts:
+        raise PatchConflict("The patch touches text changed since its base", conflicts)
+    return moved
+
+
+def apply_edits(text: str, edits: List[Edit]) -> str:
+    parts, position = [], 0
+    for start, end, replacement in edits:
+        parts.append(text[position:start])
+        parts.append(replacement)
+        position = end
+    parts.append(text[position:])
+    return "".join(parts)
+
+
+def patch_text(base: str, current: str, operations: Optional[Sequence] = None, diff: Optional[str] = None) -> str:
+    """The current content with the patch, made against ``base``, applied."""
+    edits = diff_edits(base, diff) if diff is not None else range_edits(base, operations or ())
+    return apply_edits(current, rebase(base, current, edits))
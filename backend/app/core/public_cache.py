@@ -0,0 +1,168 @@
+import html
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from app.core.cache import CacheStats
+from app.core.compression import compress
+from app.core.config import settings
+from app.core.http_cache import note_etag
+from app.core.serialization import dumps, note_to_dict
+
+try:
+    from markdown_it import MarkdownIt
+except ImportError:  # optional: only needed for ?format=html
+    MarkdownIt = None
+
+# Raw HTML in notes is escaped, never passed through
+_markdown = MarkdownIt("commonmark", {"html": False}) if MarkdownIt is not None else None
+
+HTML_PAGE = (
+    '<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>{title}</title></head>'
+    "<body><article><h1>{title}</h1>\n{body}</article></body></html>"
+)
+
+
+def markdown_available() -> bool:
+    return _markdown is not None
+
+
+def render_json(note) -> bytes:
+    return dumps(note_to_dict(note))
+
+
+def render_html(note) -> bytes:
+    title = html.escape(note.title or "")
+    return HTML_PAGE.format(title=title, body=_markdown.render(note.content or "")).encode()
+
+
+@dataclass
+class PublicNoteEntry:
+    note_id: int
+    etag: str
+    updated_at: Optional[datetime]
+    body: bytes
+    html: Optional[bytes]
+    expires_at: float
+    # (representation, content coding) -> compressed body, filled on demand
+    encoded: Dict[Tuple[str, str], bytes] = field(default_factory=dict)
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + len(self.html or b"") + sum(len(body) for body in self.encoded.values())
+
+
+class PublicNoteCache:
+    """
+    In-process LRU of rendered public notes keyed by public token. Bounded
+    by the total size of the rendered bodies; entries expire after ``ttl``
+    seconds so that writes made by other workers show up eventually, while
+    writes made by this process invalidate immediately.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        # Bumped by every invalidation; see put()
+        self.generation = 0
+        self.stats = CacheStats()
+        self._entries: "OrderedDict[str, PublicNoteEntry]" = OrderedDict()
+        self._tokens: Dict[int, str] = {}
+        # Handlers running on the threadpool invalidate too
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[PublicNoteEntry]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                self._remove(token)
+                entry = None
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.stats.hits += 1
+            return entry
+
+    def put(self, token: str, note, generation: int) -> PublicNoteEntry:
+        """
+        Render ``note`` and cache it under ``token``. ``generation`` is the
+        value read before loading the note; if anything was invalidated
+        since, the note may already be stale and is returned uncached.
+        """
+        entry = PublicNoteEntry(
+            note_id=note.id,
+            etag=note_etag(note.id, note.updated_at),
+            updated_at=note.updated_at,
+            body=render_json(note),
+            html=render_html(note) if settings.PUBLIC_NOTE_HTML and markdown_available() else None,
+            expires_at=time.monotonic() + self.ttl,
+        )
+        if entry.size > self.max_bytes:
+            return entry
+        with self._lock:
+            if generation != self.generation:
+                return entry
+            self._remove(token)
+            stale_token = self._tokens.get(note.id)
+            if stale_token is not None:
+                self._remove(stale_token)
+            self._entries[token] = entry
+            self._tokens[note.id] = token
+            self.size += entry.size
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+        return entry
+
+    def encoded(self, token: str, entry: PublicNoteEntry, representation: str, encoding: str) -> bytes:
+        """
+        The ``representation`` ("json" or "html") of ``entry`` compressed
+        with ``encoding``. Compressed on first use and kept with the entry,
+        and counted in its size, so hot notes are not compressed per hit.
+        """
+        key = (representation, encoding)
+        body = entry.encoded.get(key)
+        if body is not None:
+            return body
+        body = compress(entry.html if representation == "html" else entry.body, encoding)
+        with self._lock:
+            if key in entry.encoded:
+                return entry.encoded[key]
+            entry.encoded[key] = body
+            if self._entries.get(token) is entry:
+                self.size += len(body)
+                while self.size > self.max_bytes:
+                    self._remove(next(iter(self._entries)))
+        return body
+
+    def invalidate_notes(self, note_ids: Iterable[int]) -> None:
+        with self._lock:
+            self.generation += 1
+            for note_id in note_ids:
+                token = self._tokens.get(note_id)
+                if token is not None:
+                    self._remove(token)
+                    self.stats.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tokens.clear()
+            self.size = 0
+
+    def _remove(self, token: str) -> None:
+        entry = self._entries.pop(token, None)
+        if entry is not None:
+            self.size -= entry.size
+            if self._tokens.get(entry.note_id) == token:
+                del self._tokens[entry.note_id]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+public_note_cache = PublicNoteCache(settings.PUBLIC_NOTE_CACHE_MAX_BYTES, settings.PUBLIC_NOTE_CACHE_TTL)
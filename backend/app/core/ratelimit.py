@@ -0,0 +1,177 @@
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from jose import JWTError, jwt
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+from app.core.security import JWT_SECRET, JWT_ALGORITHM
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    limit: int
+    window: int
+    method: Optional[str] = None
+    path_prefix: str = ""
+
+    @property
+    def name(self) -> str:
+        return f"{self.method or '*'} {self.path_prefix or '/'}"
+
+    def matches(self, method: str, path: str) -> bool:
+        return (self.method is None or self.method == method) and path.startswith(self.path_prefix)
+
+
+@dataclass(frozen=True)
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: int
+
+
+def parse_rules(spec: Optional[str]) -> List[RateLimitRule]:
+    """
+    Parse ``"POST /api/auth/login=5/60; /api/notes/bulk=10/60"`` into rules:
+    an optional method, a path prefix and ``limit/window_seconds``.
+    """
+    rules = []
+    for item in (spec or "").split(";"):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            target, quota = item.rsplit("=", 1)
+            limit, window = (int(part) for part in quota.split("/"))
+        except ValueError:
+            logger.warning("Ignoring malformed rate limit rule: %r", item)
+            continue
+        parts = target.split()
+        method, prefix = (parts[0].upper(), parts[1]) if len(parts) == 2 else (None, parts[0])
+        rules.append(RateLimitRule(limit=limit, window=window, method=method, path_prefix=prefix))
+    return rules
+
+
+def _estimate(previous: int, current: int, window: int, now: float) -> Tuple[float, int]:
+    # Sliding window counter: the previous fixed window is weighted by how
+    # much of it still overlaps the sliding window ending now
+    elapsed = now % window
+    reset_after = max(1, math.ceil(window - elapsed))
+    return previous * (1 - elapsed / window) + current, reset_after
+
+
+class MemoryRateLimitBackend:
+    """Per-process sliding window counters; O(1) per hit, at most ``max_keys`` tracked clients."""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        # key -> [window index, count in that window, count in the window before]
+        self._counters: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def hit(self, key: str, rule: RateLimitRule) -> RateLimitResult:
+        now = time.time()
+        index = int(now // rule.window)
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None:
+                counter = [index, 0, 0]
+                self._counters[key] = counter
+                while len(self._counters) > self.max_keys:
+                    self._counters.popitem(last=False)
+            else:
+                self._counters.move_to_end(key)
+                if counter[0] != index:
+                    counter[2] = counter[1] if counter[0] == index - 1 else 0
+                    counter[0], counter[1] = index, 0
+
+            estimate, reset_after = _estimate(counter[2], counter[1], rule.window, now)
+            if estimate >= rule.limit:
+                return RateLimitResult(False, rule.limit, 0, reset_after)
+            counter[1] += 1
+            return RateLimitResult(True, rule.limit, max(0, int(rule.limit - estimate - 1)), reset_after)
+
+
+class RedisRateLimitBackend:
+    """
+    Sliding window counters kept in Redis so every worker enforces the same
+    limit. Two small keys per client and window; they expire on their own.
+    """
+
+    key_prefix = "ratelimit:"
+
+    def __init__(self, client):
+        self.client = client
+
+    async def hit(self, key: str, rule: RateLimitRule) -> RateLimitResult:
+        now = time.time()
+        index = int(now // rule.window)
+        current_key = f"{self.key_prefix}{key}:{index}"
+        current = await self.client.incr(current_key)
+        if current == 1:
+            await self.client.expire(current_key, rule.window * 2)
+        previous = int(await self.client.get(f"{self.key_prefix}{key}:{index - 1}") or 0)
+
+        # The hit is already counted, so compare against the count before it
+        estimate, reset_after = _estimate(previous, current - 1, rule.window, now)
+        if estimate >= rule.limit:
+            # Only allowed hits count, as in MemoryRateLimitBackend: clients
+            # retrying while blocked must not push their limit into the next window
+            await self.client.incr(current_key, -1)
+            return RateLimitResult(False, rule.limit, 0, reset_after)
+        return RateLimitResult(True, rule.limit, max(0, int(rule.limit - estimate - 1)), reset_after)
+
+
+def client_identity(authorization: str, client_host: Optional[str]) -> str:
+    """Rate limit authenticated users by account and everyone else by IP."""
+    if authorization[:7].lower() == "bearer ":
+        try:
+            payload = jwt.decode(authorization[7:], JWT_SECRET, algorithms=[JWT_ALGORITHM])
+            if payload.get("sub") is not None:
+                return f"user:{payload['sub']}"
+        except JWTError:
+            pass
+    return f"ip:{client_host or 'unknown'}"
+
+
+class RateLimiter:
+    def __init__(self, backend, default_rule: RateLimitRule, rules: List[RateLimitRule]):
+        self.backend = backend
+        self.default_rule = default_rule
+        self.rules = rules
+
+    async def check(self, identity: str, method: str, path: str) -> RateLimitResult:
+        """
+        Count the request against the global limit and the first matching
+        route rule; the most restrictive result is reported.
+        """
+        result = await self.backend.hit(f"{identity}:*", self.default_rule)
+        if not result.allowed:
+            return result
+        for rule in self.rules:
+            if rule.matches(method, path):
+                route_result = await self.backend.hit(f"{identity}:{rule.name}", rule)
+                if not route_result.allowed or route_result.remaining < result.remaining:
+                    result = route_result
+                break
+        return result
+
+
+def create_rate_limiter() -> RateLimiter:
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        backend = RedisRateLimitBackend(get_redis())
+    else:
+        backend = MemoryRateLimitBackend(settings.RATE_LIMIT_MAX_KEYS)
+    return RateLimiter(
+        backend,
+        RateLimitRule(limit=settings.RATE_LIMIT, window=settings.RATE_LIMIT_WINDOW),
+        parse_rules(settings.RATE_LIMIT_RULES),
+    )
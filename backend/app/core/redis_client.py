@@ -0,0 +1,81 @@
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+
+
+class LocalRedis:
+    """
+    In-process stand-in for the subset of the redis.asyncio client used by the
+    caches and limiters. Lets the Redis-backed code paths run in tests and
+    single-process deployments without a server.
+    """
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key: str):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return entry
+
+    @staticmethod
+    def _encode(value) -> bytes:
+        if isinstance(value, bytes):
+            return value
+        return str(value).encode()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._live(key)
+            return entry[0] if entry else None
+
+    async def set(self, key: str, value, ex: Optional[float] = None, px: Optional[int] = None, nx: bool = False):
+        with self._lock:
+            if nx and self._live(key):
+                return None
+            ttl = ex if ex is not None else (px / 1000 if px is not None else None)
+            self._data[key] = (self._encode(value), time.monotonic() + ttl if ttl is not None else None)
+            return True
+
+    async def incr(self, key: str, amount: int = 1) -> int:
+        with self._lock:
+            entry = self._live(key)
+            value = int(entry[0]) + amount if entry else amount
+            self._data[key] = (self._encode(value), entry[1] if entry else None)
+            return value
+
+    async def expire(self, key: str, seconds: float) -> bool:
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                return False
+            self._data[key] = (entry[0], time.monotonic() + seconds)
+            return True
+
+    async def delete(self, *keys: str) -> int:
+        with self._lock:
+            return sum(self._data.pop(key, None) is not None for key in keys)
+
+
+_client = None
+
+
+def get_redis():
+    """Shared client for REDIS_URL, or a process-local stand-in when unset."""
+    global _client
+    if _client is None:
+        if settings.REDIS_URL:
+            import redis.asyncio as redis
+
+            _client = redis.from_url(settings.REDIS_URL)
+        else:
+            _client = LocalRedis()
+    return _client
@@ -0,0 +1,259 @@
+import asyncio
+import html
+import math
+import re
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Text, bindparam, func, literal_column, select, text
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.models import Note
+
+TS_CONFIG = "english"
+HIGHLIGHT_START = "<b>"
+HIGHLIGHT_STOP = "</b>"
+SNIPPET_WORDS = 30
+MAX_INDEXED_OWNERS = 256
+
+# Column created by the DDL hooks in app.database.models, set by index_notes
+search_vector = literal_column("notes.search_vector", type_=TSVECTOR)
+
+_INDEX_NOTES = text(
+    "UPDATE notes SET search_vector = "
+    f"setweight(to_tsvector('{TS_CONFIG}', CAST(:title AS text)), 'A') || "
+    f"setweight(to_tsvector('{TS_CONFIG}', CAST(:content AS text)), 'B') "
+    "WHERE id = :note_id"
+)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def is_postgres(db: AsyncSession) -> bool:
+    return db.bind.dialect.name == "postgresql"
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return [token.lower() for token in _TOKEN_RE.findall(text or "")]
+
+
+class _OwnerIndex:
+    """Inverted index over the notes of a single owner."""
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.doc_terms: Dict[int, Counter] = {}
+        self.doc_lengths: Dict[int, int] = {}
+        self.contents: Dict[int, str] = {}
+        self.watermark = None
+
+    def add(self, note_id: int, title: Optional[str], content: Optional[str]) -> None:
+        self.remove(note_id)
+        # Title terms count double, mirroring the A/B weights of the tsvector
+        terms = Counter(tokenize(title) * 2 + tokenize(content))
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[note_id] = tf
+        self.doc_terms[note_id] = terms
+        self.doc_lengths[note_id] = sum(terms.values())
+        self.contents[note_id] = content or ""
+
+    def remove(self, note_id: int) -> None:
+        terms = self.doc_terms.pop(note_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(note_id, None)
+                if not docs:
+                    del self.postings[term]
+        self.doc_lengths.pop(note_id, None)
+        self.contents.pop(note_id, None)
+
+    def search(self, terms: List[str]) -> List[Tuple[int, float]]:
+        if not terms or not self.doc_terms:
+            return []
+        postings = [self.postings.get(term, {}) for term in terms]
+        if not all(postings):
+            return []
+
+        # All terms must match (AND semantics, like websearch_to_tsquery)
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for docs in postings[1:]:
+            candidates &= docs.keys()
+
+        total = len(self.doc_terms)
+        avg_length = sum(self.doc_lengths.values()) / total
+        results = []
+        for note_id in candidates:
+            length = self.doc_lengths[note_id]
+            score = 0.0
+            for docs in postings:
+                tf = docs[note_id]
+                idf = math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+                score += idf * tf * 2.2 / (tf + 1.2 * (0.25 + 0.75 * length / avg_length))
+            results.append((note_id, score))
+        results.sort(key=lambda item: (-item[1], -item[0]))
+        return results
+
+    def snippet(self, note_id: int, terms: List[str]) -> str:
+        words = self.contents.get(note_id, "").split()
+        wanted = set(terms)
+        first = next(
+            (i for i, word in enumerate(words) if wanted.intersection(tokenize(word))),
+            0,
+        )
+        start = max(0, first - SNIPPET_WORDS // 3)
+        fragment = []
+        for word in words[start:start + SNIPPET_WORDS]:
+            if wanted.intersection(tokenize(word)):
+                fragment.append(f"{HIGHLIGHT_START}{html.escape(word)}{HIGHLIGHT_STOP}")
+            else:
+                fragment.append(html.escape(word))
+        return " ".join(fragment)
+
+
+class NoteSearchIndex:
+    """
+    In-process full-text index used when the database is not Postgres.
+
+    Each owner's index is built lazily and kept in sync by comparing the
+    owner's (note count, latest updated_at) against the last indexed state,
+    so writes from any code path (or another process) are picked up on the
+    next search without hooks in the write handlers.
+    """
+
+    def __init__(self, max_owners: int = MAX_INDEXED_OWNERS):
+        self._owners: "OrderedDict[int, _OwnerIndex]" = OrderedDict()
+        self._max_owners = max_owners
+        self._lock = asyncio.Lock()
+
+    async def _sync(self, db: AsyncSession, owner_id: int) -> _OwnerIndex:
+        count, latest = (
+            await db.execute(
+                select(func.count(Note.id), func.max(Note.updated_at)).where(
+                    Note.owner_id == owner_id, Note.deleted_at.is_(None)
+                )
+            )
+        ).one()
+
+        index = self._owners.get(owner_id)
+        if index is not None and index.watermark == latest and len(index.doc_terms) == count:
+            self._owners.move_to_end(owner_id)
+            return index
+
+        documents = select(Note.id, Note.title, Note.content).where(
+            Note.owner_id == owner_id, Note.deleted_at.is_(None)
+        )
+        changed = documents
+        if index is not None and index.watermark is not None:
+            changed = documents.where(Note.updated_at >= index.watermark)
+        else:
+            index = _OwnerIndex()
+        for note_id, title, content in await db.execute(changed):
+            index.add(note_id, title, content)
+
+        if len(index.doc_terms) != count:
+            # Something was deleted; rebuilding is simpler than diffing ids
+            index = _OwnerIndex()
+            for note_id, title, content in await db.execute(documents):
+                index.add(note_id, title, content)
+
+        index.watermark = latest
+        self._owners[owner_id] = index
+        self._owners.move_to_end(owner_id)
+        while len(self._owners) > self._max_owners:
+            self._owners.popitem(last=False)
+        return index
+
+    async def search(self, db: AsyncSession, owner_id: int, query: str) -> List[Tuple[int, float, str]]:
+        terms = tokenize(query)
+        async with self._lock:
+            index = await self._sync(db, owner_id)
+            return [
+                (note_id, score, index.snippet(note_id, terms))
+                for note_id, score in index.search(terms)
+            ]
+
+    def clear(self) -> None:
+        self._owners.clear()
+
+
+note_search_index = NoteSearchIndex()
+
+
+async def index_notes(db: AsyncSession, notes: Iterable[Tuple[int, Optional[str], Optional[str]]]) -> None:
+    """
+    Set the search vector of ``(note_id, title, content)`` notes just
+    written, in the caller's transaction. Postgres only: content may be
+    stored compressed, so the database cannot derive the vector itself.
+    The in-process index picks writes up on its own.
+    """
+    if not is_postgres(db):
+        return
+    params = [{"note_id": note_id, "title": title or "", "content": content or ""} for note_id, title, content in notes]
+    if params:
+        await db.execute(_INDEX_NOTES, params)
+
+
+async def filter_notes(db: AsyncSession, stmt, owner_ids: Iterable[int], text: str):
+    """
+    Restrict a Note select to notes matching ``text``. ``owner_ids`` are the
+    owners whose notes the select can return; only the in-process fallback
+    needs them.
+    """
+    if is_postgres(db):
+        return stmt.where(search_vector.op("@@")(func.websearch_to_tsquery(TS_CONFIG, text)))
+    note_ids = []
+    for owner_id in owner_ids:
+        note_ids.extend(note_id for note_id, _, _ in await note_search_index.search(db, owner_id, text))
+    return stmt.where(Note.id.in_(note_ids))
+
+
+async def search_notes(db: AsyncSession, owner_id: int, text: str, limit: int) -> List[Tuple[Note, float, str]]:
+    """Return ``(note, rank, snippet)`` for the best matches, highest rank first."""
+    if is_postgres(db):
+        tsquery = func.websearch_to_tsquery(TS_CONFIG, text)
+        rank = func.ts_rank(search_vector, tsquery)
+        rows = (
+            await db.execute(
+                select(Note, rank.label("rank"))
+                .where(Note.owner_id == owner_id, Note.deleted_at.is_(None), search_vector.op("@@")(tsquery))
+                .order_by(rank.desc(), Note.id.desc())
+                .limit(limit)
+            )
+        ).all()
+        if not rows:
+            return []
+        # Highlighted from the content already read: the stored one may be compressed
+        documents = (
+            func.unnest(bindparam("contents", [note.content or "" for note, _ in rows], type_=ARRAY(Text)))
+            .table_valued("content", with_ordinality="position")
+            .render_derived()
+        )
+        snippets = await db.scalars(
+            select(
+                func.ts_headline(
+                    TS_CONFIG,
+                    documents.c.content,
+                    tsquery,
+                    f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, MaxWords={SNIPPET_WORDS}",
+                )
+            ).order_by(documents.c.position)
+        )
+        return [(note, float(rank_value), snippet) for (note, rank_value), snippet in zip(rows, snippets)]
+
+    matches = (await note_search_index.search(db, owner_id, text))[:limit]
+    if not matches:
+        return []
+    notes = {
+        note.id: note
+        for note in await db.scalars(select(Note).where(Note.id.in_([note_id for note_id, _, _ in matches])))
+    }
+    return [
+        (notes[note_id], score, snippet_text)
+        for note_id, score, snippet_text in matches
+        if note_id in notes
+    ]
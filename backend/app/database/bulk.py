@@ -0,0 +1,190 @@
+from datetime import datetime, UTC
+from typing import Dict, List, Tuple
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.events import note_event, note_events
+from app.core.public_cache import public_note_cache
+from app.core.search import index_notes
+from .changes import allocate_change_seqs, clear_share_tombstones, deleted_note_values
+from .revisions import NoteEdit, record_revisions
+from .models import Note, User, VisibilityStatus, content_fields, note_sharing
+
+INVALID_VISIBILITY = f"Invalid visibility value. Must be one of: {[v.value for v in VisibilityStatus]}"
+
+
+def _result(index: int, op: str, status: int, note_id: int = None, error: str = None) -> dict:
+    return {"index": index, "op": op, "status": status, "note_id": note_id, "error": error}
+
+
+async def _edits(db: AsyncSession, updates: List[dict]) -> List[NoteEdit]:
+    """Revision edits for updates touching title or content, in order, the rows locked like update_note's."""
+    updates = [values for values in updates if "title" in values or "content" in values]
+    if not updates:
+        return []
+    current = {
+        row.id: (row.title, row.content, row.updated_at)
+        for row in await db.execute(
+            select(Note.id, Note.title, Note.content, Note.updated_at)
+            .where(Note.id.in_({values["id"] for values in updates}))
+            .with_for_update()
+        )
+    }
+    edits = []
+    for values in updates:
+        title, content, updated_at = current[values["id"]]
+        edit = NoteEdit(
+            values["id"], title, content, updated_at, values.get("title", title), values.get("content", content)
+        )
+        edits.append(edit)
+        current[values["id"]] = (edit.title, edit.content, values["updated_at"])
+    return edits
+
+
+async def apply_bulk_operations(db: AsyncSession, owner_id: int, operations: list, atomic: bool) -> Tuple[int, List[dict]]:
+    """
+    Validate every operation with a handful of set-based lookups, then apply
+    the valid ones as one executemany statement per kind in a single
+    transaction: creates, then updates, shares and deletes. Operations on
+    a note deleted earlier in the request fail with 404, so applying them
+    by kind gives the same result as applying them in request order.
+
+    Returns the number of applied operations and one result per operation,
+    in request order.
+    """
+    results: Dict[int, dict] = {}
+    now = datetime.now(UTC)
+
+    # Ownership of every referenced note in one query
+    target_ids = {op.note_id for op in operations if op.op != "create"}
+    owners = {}
+    if target_ids:
+        owners = dict((await db.execute(select(Note.id, Note.owner_id).where(Note.id.in_(target_ids), Note.deleted_at.is_(None)))).all())
+
+    share_ops = [(i, op) for i, op in enumerate(operations) if op.op == "share"]
+    users_by_email = {}
+    existing_shares = set()
+    if share_ops:
+        emails = {op.email for _, op in share_ops}
+        users_by_email = dict((await db.execute(select(User.email, User.id).where(User.email.in_(emails)))).all())
+        existing_shares = set(
+            (
+                await db.execute(
+                    select(note_sharing.c.note_id, note_sharing.c.user_id).where(
+                        note_sharing.c.note_id.in_({op.note_id for _, op in share_ops})
+                    )
+                )
+            ).all()
+        )
+
+    creates, updates, shares, deletes = [], [], [], []
+    deleted_ids = set()
+    for index, op in enumerate(operations):
+        if op.op != "create":
+            if op.note_id not in owners or op.note_id in deleted_ids:
+                results[index] = _result(index, op.op, 404, op.note_id, "Note not found")
+                continue
+            if owners[op.note_id] != owner_id:
+                results[index] = _result(index, op.op, 403, op.note_id, "Not enough permissions")
+                continue
+
+        if op.op in ("create", "update"):
+            values = op.model_dump(exclude={"op", "note_id"}, exclude_unset=op.op == "update")
+            if values.get("visibility") is not None:
+                try:
+                    values["visibility"] = VisibilityStatus(values["visibility"])
+                except ValueError:
+                    results[index] = _result(index, op.op, 400, getattr(op, "note_id", None), INVALID_VISIBILITY)
+                    continue
+            if "content" in values:
+                values.update(content_fields(values["content"]))
+            if op.op == "create":
+                creates.append((index, {**values, "owner_id": owner_id, "created_at": now, "updated_at": now}))
+            else:
+                updates.append((index, {**values, "id": op.note_id, "updated_at": now}))
+
+        elif op.op == "share":
+            user_id = users_by_email.get(op.email)
+            if user_id is None:
+                results[index] = _result(index, op.op, 404, op.note_id, "User not found")
+                continue
+            if (op.note_id, user_id) in existing_shares:
+                results[index] = _result(index, op.op, 400, op.note_id, "Note already shared with this user")
+                continue
+            existing_shares.add((op.note_id, user_id))
+            shares.append((index, {"note_id": op.note_id, "user_id": user_id}))
+
+        else:
+            deleted_ids.add(op.note_id)
+            deletes.append((index, op.note_id))
+
+    if atomic and results:
+        for index, op in enumerate(operations):
+            results.setdefault(
+                index,
+                _result(index, op.op, 424, getattr(op, "note_id", None), "Not applied: another operation failed"),
+            )
+        return 0, [results[index] for index in range(len(operations))]
+
+    applied = len(creates) + len(updates) + len(shares) + len(deletes)
+    events = []
+    # Work that needs no sequence number goes first: from allocate_change_seqs()
+    # to commit, every other write transaction waits
+    if updates:
+        edits = await _edits(db, [values for _, values in updates])
+        await record_revisions(db, edits, owner_id, now)
+        # The last edit of each note holds its final title and content
+        await index_notes(db, {edit.note_id: (edit.note_id, edit.title, edit.content) for edit in edits}.values())
+    if shares:
+        await clear_share_tombstones(db, [(values["note_id"], values["user_id"]) for _, values in shares])
+    if deletes:
+        await index_notes(db, [(note_id, None, None) for _, note_id in deletes])
+    if applied:
+        seq = await allocate_change_seqs(db, applied)
+        for _, values in creates + updates + shares:
+            values["change_seq"] = seq
+            seq += 1
+
+    if creates:
+        created_ids = (
+            await db.execute(
+                insert(Note).returning(Note.id, sort_by_parameter_order=True),
+                [values for _, values in creates],
+            )
+        ).scalars().all()
+        for (index, values), note_id in zip(creates, created_ids):
+            results[index] = _result(index, "create", 201, note_id)
+            events.append(note_event("note_created", note_id, owner_id, values["change_seq"]))
+        # Needs the new ids, so it cannot move before the allocation
+        await index_notes(
+            db, [(note_id, values["title"], values["content"]) for (_, values), note_id in zip(creates, created_ids)]
+        )
+    if updates:
+        await db.execute(update(Note), [values for _, values in updates])
+        for index, values in updates:
+            results[index] = _result(index, "update", 200, values["id"])
+            events.append(note_event("note_updated", values["id"], owner_id, values["change_seq"]))
+    if shares:
+        await db.execute(insert(note_sharing), [values for _, values in shares])
+        for index, values in shares:
+            results[index] = _result(index, "share", 200, values["note_id"])
+            events.append(
+                note_event("share_added", values["note_id"], owner_id, values["change_seq"], values["user_id"])
+            )
+    if deletes:
+        await db.execute(
+            update(Note),
+            [
+                {**deleted_note_values(now), "id": note_id, "change_seq": seq + offset}
+                for offset, (_, note_id) in enumerate(deletes)
+            ],
+        )
+        for offset, (index, note_id) in enumerate(deletes):
+            results[index] = _result(index, "delete", 200, note_id)
+            events.append(note_event("note_deleted", note_id, owner_id, seq + offset))
+    await db.commit()
+    public_note_cache.invalidate_notes([values["id"] for _, values in updates] + [note_id for _, note_id in deletes])
+    await note_events.publish(sorted(events, key=lambda event: event["seq"]))
+
+    return applied, [results[index] for index in range(len(operations))]
@@ -0,0 +1,151 @@
+import heapq
+from typing import List, Tuple
+
+from sqlalchemy import delete, insert, or_, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.serialization import NOTE_COLUMNS, note_to_dict
+from .models import Note, change_counter, content_fields, note_sharing, note_sharing_tombstones
+
+
+class InvalidChangeToken(ValueError):
+    pass
+
+
+async def allocate_change_seqs(db: AsyncSession, count: int = 1) -> int:
+    """
+    Reserve ``count`` consecutive change sequence numbers and return the
+    first. The counter row stays locked until the transaction ends, so
+    sequence numbers become visible in the order they were handed out and
+    a feed reader can never skip past a change that commits later.
+
+    Every write transaction waits for that lock, so call this last: do all
+    other work first and only write the sequence numbers after it.
+    """
+    last = await db.scalar(
+        update(change_counter)
+        .where(change_counter.c.id == 1)
+        .values(value=change_counter.c.value + count)
+        .returning(change_counter.c.value)
+    )
+    return last - count + 1
+
+
+def deleted_note_values(now) -> dict:
+    """
+    Column values that turn a note into a tombstone. Its sharing rows stay,
+    so recipients still see the deletion in their feed.
+    """
+    return {
+        "deleted_at": now, "updated_at": now, "title": None, "content": None, "public_token": None,
+        **content_fields(None),
+    }
+
+
+async def clear_share_tombstones(db: AsyncSession, pairs) -> None:
+    """Forget earlier removals of the ``(note_id, user_id)`` shares being (re)added."""
+    await db.execute(
+        delete(note_sharing_tombstones).where(
+            tuple_(note_sharing_tombstones.c.note_id, note_sharing_tombstones.c.user_id).in_(list(pairs))
+        )
+    )
+
+
+async def remove_share(db: AsyncSession, note_id: int, user_id: int) -> int:
+    """Delete a share and leave a tombstone for the changes feed; returns its sequence number."""
+    await db.execute(
+        delete(note_sharing).where(note_sharing.c.note_id == note_id, note_sharing.c.user_id == user_id)
+    )
+    await clear_share_tombstones(db, [(note_id, user_id)])
+    seq = await allocate_change_seqs(db)
+    await db.execute(
+        insert(note_sharing_tombstones).values(note_id=note_id, user_id=user_id, change_seq=seq)
+    )
+    return seq
+
+
+def encode_change_token(seq: int) -> str:
+    return str(seq)
+
+
+def decode_change_token(token: str) -> int:
+    try:
+        seq = int(token)
+    except ValueError as e:
+        raise InvalidChangeToken(f"Invalid change token: {token}") from e
+    if seq < 0:
+        raise InvalidChangeToken(f"Invalid change token: {token}")
+    return seq
+
+
+async def read_changes(db: AsyncSession, user_id: int, since: int, limit: int) -> Tuple[List[dict], int, bool]:
+    """
+    Changes visible to ``user_id`` with a sequence number above ``since``,
+    oldest first: notes written or deleted (own notes and notes shared with
+    the user) and shares added or removed (on the user's notes, or to the
+    user). ``since=0`` is an initial sync, which leaves out tombstones.
+
+    Returns the changes, the token to resume from and whether more remain.
+    """
+    # Each source below is read by its own statement, which under READ
+    # COMMITTED sees whatever committed meanwhile. A change committed
+    # between two of them could fall below the returned token unseen, so
+    # all three stop at the last sequence number committed before the first.
+    high = await db.scalar(select(change_counter.c.value).where(change_counter.c.id == 1))
+    my_note_ids = select(Note.id).where(Note.owner_id == user_id)
+    shared_with_me = select(note_sharing.c.note_id).where(note_sharing.c.user_id == user_id)
+    initial = since == 0
+
+    notes = select(*NOTE_COLUMNS, Note.change_seq, Note.deleted_at).where(
+        Note.change_seq.between(since + 1, high),
+        or_(Note.owner_id == user_id, Note.id.in_(shared_with_me)),
+    )
+    if initial:
+        notes = notes.where(Note.deleted_at.is_(None))
+    shares = (
+        select(*NOTE_COLUMNS, note_sharing.c.user_id.label("share_user_id"), note_sharing.c.change_seq)
+        .join(note_sharing, note_sharing.c.note_id == Note.id)
+        .where(
+            note_sharing.c.change_seq.between(since + 1, high),
+            Note.deleted_at.is_(None),
+            or_(note_sharing.c.user_id == user_id, Note.owner_id == user_id),
+        )
+    )
+    removed_shares = select(note_sharing_tombstones).where(
+        note_sharing_tombstones.c.change_seq.between(since + 1, high),
+        or_(note_sharing_tombstones.c.user_id == user_id, note_sharing_tombstones.c.note_id.in_(my_note_ids)),
+    )
+
+    sources = []
+    for stmt, seq_column, to_change in (
+        (notes, Note.change_seq, _note_change),
+        (shares, note_sharing.c.change_seq, lambda row: _share_added(row, user_id)),
+        (None if initial else removed_shares, note_sharing_tombstones.c.change_seq, _share_removed),
+    ):
+        if stmt is None:
+            continue
+        rows = (await db.execute(stmt.order_by(seq_column).limit(limit + 1))).all()
+        sources.append([to_change(row) for row in rows])
+
+    merged = list(heapq.merge(*sources, key=lambda change: change["seq"]))
+    changes = merged[:limit]
+    next_seq = changes[-1]["seq"] if changes else since
+    return changes, next_seq, len(merged) > limit
+
+
+def _note_change(row) -> dict:
+    if row.deleted_at is not None:
+        return {"seq": row.change_seq, "type": "note_deleted", "note_id": row.id}
+    return {"seq": row.change_seq, "type": "note", "note_id": row.id, "note": note_to_dict(row)}
+
+
+def _share_added(row, user_id: int) -> dict:
+    change = {"seq": row.change_seq, "type": "share_added", "note_id": row.id, "user_id": row.share_user_id}
+    if row.share_user_id == user_id:
+        # The note may predate the share, so its recipient gets it here
+        change["note"] = note_to_dict(row)
+    return change
+
+
+def _share_removed(row) -> dict:
+    return {"seq": row.change_seq, "type": "share_removed", "note_id": row.note_id, "user_id": row.user_id}
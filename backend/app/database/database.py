@@ -1,18 +1,12 @@
-from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-import os
-from dotenv import load_dotenv
 
-load_dotenv()
+# Engine and sessions come from the single factory in session.py
+from .session import engine, SessionLocal
 
-DATABASE_URL= os.getenv("DATABASE_URL")
-engine= create_engine(DATABASE_URL)
-SessionLocal= sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
@@ -0,0 +1,145 @@
+import json
+import re
+import struct
+import zipfile
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Iterator, Optional, Tuple
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.deps import open_session
+from app.core.serialization import NOTE_COLUMNS, dumps
+from .models import Note
+
+_UNSAFE_FILENAME_RE = re.compile(r"[^\w\- ]+", re.UNICODE)
+
+# Zip record layouts (APPNOTE.TXT 4.3.7, 4.3.12, 4.3.14-16)
+_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+_CENTRAL_HEADER = struct.Struct("<4s4B4HL2L5H2L")
+_END = struct.Struct("<4s4H2LH")
+_END64 = struct.Struct("<4sQ2H2L4Q")
+_END64_LOCATOR = struct.Struct("<4sLQL")
+_UTF8_NAMES = 0x800
+ZIP64_LIMIT = 0xFFFFFFFF
+CHUNK_SIZE = 64 * 1024
+
+
+async def stream_notes(owner_id: int) -> AsyncIterator[list]:
+    """
+    Yield the owner's notes in batches of EXPORT_BATCH_SIZE rows, read
+    through a server-side cursor so memory does not grow with the count.
+    """
+    stmt = (
+        select(*NOTE_COLUMNS)
+        .where(Note.owner_id == owner_id, Note.deleted_at.is_(None))
+        .order_by(Note.id)
+        .execution_options(yield_per=settings.EXPORT_BATCH_SIZE)
+    )
+    # The request's session is closed before a streaming body is sent,
+    # so the export reads through its own
+    async with open_session() as db:
+        result = await db.stream(stmt)
+        try:
+            async for rows in result.partitions():
+                yield rows
+        finally:
+            await result.close()
+
+
+async def export_ndjson(owner_id: int) -> AsyncIterator[bytes]:
+    """One JSON object per line, in the same shape as the note API."""
+    async for rows in stream_notes(owner_id):
+        yield b"".join(dumps(row._asdict()) + b"\n" for row in rows)
+
+
+def markdown_filename(note) -> str:
+    title = _UNSAFE_FILENAME_RE.sub("", note.title or "").strip()[:80]
+    return f"{note.id}-{title}.md" if title else f"{note.id}.md"
+
+
+def markdown_document(note) -> str:
+    # Front matter values are JSON strings, which YAML readers accept too
+    front_matter = "\n".join(
+        f"{key}: {json.dumps(value)}"
+        for key, value in (
+            ("title", note.title or ""),
+            ("visibility", note.visibility.value),
+            ("created_at", note.created_at.isoformat() if note.created_at else None),
+            ("updated_at", note.updated_at.isoformat() if note.updated_at else None),
+        )
+    )
+    return f"---\n{front_matter}\n---\n{note.content or ''}"
+
+
+class StreamingZip:
+    """
+    Minimal zip writer for streaming. Each member is deflated whole, so its
+    header can be written before its data, and the central directory is
+    kept as packed bytes (46 bytes + the name per member) until the end;
+    zipfile.ZipFile would keep a ZipInfo object per member instead.
+    """
+
+    def __init__(self):
+        self.offset = 0
+        self.count = 0
+        self.central_directory = bytearray()
+
+    def add(self, name: str, data: bytes, modified: Optional[datetime]) -> bytes:
+        filename = name.encode()
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        compressed = compressor.compress(data) + compressor.flush()
+        crc = zlib.crc32(data)
+        dos_time, dos_date = _dos_datetime(modified)
+
+        offset, extra, version = self.offset, b"", 20
+        if offset >= ZIP64_LIMIT:
+            offset, extra, version = ZIP64_LIMIT, struct.pack("<2HQ", 1, 8, self.offset), 45
+
+        header = _LOCAL_HEADER.pack(
+            b"PK\x03\x04", 20, 0, _UTF8_NAMES, zipfile.ZIP_DEFLATED, dos_time, dos_date,
+            crc, len(compressed), len(data), len(filename), 0
+        )
+        self.central_directory += _CENTRAL_HEADER.pack(
+            b"PK\x01\x02", version, 0, version, 0, _UTF8_NAMES, zipfile.ZIP_DEFLATED, dos_time, dos_date,
+            crc, len(compressed), len(data), len(filename), len(extra), 0, 0, 0, 0, offset
+        ) + filename + extra
+        self.count += 1
+        chunk = header + filename + compressed
+        self.offset += len(chunk)
+        return chunk
+
+    def finish(self) -> Iterator[bytes]:
+        """The central directory, in chunks so it is never copied whole, then the end records."""
+        size, offset, count = len(self.central_directory), self.offset, self.count
+        for start in range(0, size, CHUNK_SIZE):
+            yield bytes(self.central_directory[start:start + CHUNK_SIZE])
+        self.central_directory = bytearray()
+        tail = b""
+        if count >= 0xFFFF or offset >= ZIP64_LIMIT or size >= ZIP64_LIMIT:
+            tail += _END64.pack(b"PK\x06\x06", 44, 45, 45, 0, 0, count, count, size, offset)
+            tail += _END64_LOCATOR.pack(b"PK\x06\x07", 0, offset + size, 1)
+            count, size, offset = min(count, 0xFFFF), min(size, ZIP64_LIMIT), min(offset, ZIP64_LIMIT)
+        yield tail + _END.pack(b"PK\x05\x06", 0, 0, count, count, size, offset, 0)
+
+
+def _dos_datetime(value: Optional[datetime]) -> Tuple[int, int]:
+    if value is None or value.year < 1980:
+        return 0, (1 << 5) | 1
+    return (
+        (value.hour << 11) | (value.minute << 5) | (value.second // 2),
+        ((value.year - 1980) << 9) | (value.month << 5) | value.day,
+    )
+
+
+async def export_zip(owner_id: int) -> AsyncIterator[bytes]:
+    """A zip of one Markdown file per note, produced as it is streamed."""
+    archive = StreamingZip()
+    async for rows in stream_notes(owner_id):
+        yield b"".join(
+            archive.add(markdown_filename(note), markdown_document(note).encode(), note.updated_at)
+            for note in rows
+        )
+    for chunk in archive.finish():
+        yield chunk
@@ -0,0 +1,277 @@
+import csv
+import io
+import json
+import logging
+import tempfile
+import zipfile
+import zlib
+from datetime import datetime, UTC
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.events import note_event, note_events
+from app.core.search import index_notes, is_postgres
+from app.schemas.note import NoteImportRecord
+from .changes import allocate_change_seqs
+from .models import Note, VisibilityStatus, content_fields
+from .types import encode_content
+
+logger = logging.getLogger(__name__)
+
+COPY_COLUMNS = (
+    "title", "content", "content_length", "excerpt", "visibility", "owner_id", "created_at", "updated_at", "change_seq",
+)
+# Uploads above this size are spooled to disk while a zip is read
+SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+
+
+class NoteImporter:
+    """
+    Validates records one at a time and inserts them in batches of
+    IMPORT_BATCH_SIZE, committing each batch: COPY on Postgres, an
+    executemany INSERT elsewhere.
+    """
+
+    def __init__(self, db: AsyncSession, owner_id: int):
+        self.db = db
+        self.owner_id = owner_id
+        self.imported = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+        self._batch: List[dict] = []
+        self._now = datetime.now(UTC)
+
+    async def add_json(self, raw: bytes, line: int) -> None:
+        try:
+            record = NoteImportRecord.model_validate_json(raw)
+        except ValidationError as e:
+            self.fail(_validation_message(e), line=line)
+            return
+        await self.add(record, line=line)
+
+    async def add(self, record: NoteImportRecord, line: Optional[int] = None, file: Optional[str] = None) -> None:
+        try:
+            visibility = VisibilityStatus(record.visibility)
+        except ValueError:
+            self.fail(f"Invalid visibility value. Must be one of: {[v.value for v in VisibilityStatus]}", line, file)
+            return
+        self._batch.append({
+            "title": record.title,
+            "content": record.content,
+            **content_fields(record.content),
+            "visibility": visibility,
+            "owner_id": self.owner_id,
+            "created_at": record.created_at or self._now,
+            "updated_at": record.updated_at or record.created_at or self._now,
+        })
+        if len(self._batch) >= settings.IMPORT_BATCH_SIZE:
+            await self.flush()
+
+    def fail(self, error: str, line: Optional[int] = None, file: Optional[str] = None) -> None:
+        self.failed += 1
+        if len(self.errors) < settings.IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line, "file": file, "error": error})
+
+    async def flush(self) -> None:
+        if not self._batch:
+            return
+        rows, self._batch = self._batch, []
+        # Placeholders -1, -2, ... until the batch gets its sequence numbers
+        # just before commit (see allocate_change_seqs). Other transactions'
+        # uncommitted placeholders are invisible here, so they find this
+        # batch's rows on ix_notes_owner_change_seq, as COPY returns no ids.
+        for offset, row in enumerate(rows):
+            row["change_seq"] = -1 - offset
+        if is_postgres(self.db):
+            await copy_notes(self.db, rows)
+        else:
+            await self.db.execute(insert(Note), rows)
+        placeholder = Note.owner_id == self.owner_id, Note.change_seq < 0
+        created_ids = (
+            await self.db.scalars(select(Note.id).where(*placeholder).order_by(Note.change_seq.desc()))
+        ).all()
+        await index_notes(
+            self.db, [(note_id, row["title"], row["content"]) for note_id, row in zip(created_ids, rows)]
+        )
+        first_seq = await allocate_change_seqs(self.db, len(rows))
+        await self.db.execute(
+            update(Note)
+            .where(*placeholder)
+            # Keeps the imported updated_at, which onupdate would replace
+            .values(change_seq=first_seq - 1 - Note.change_seq, updated_at=Note.updated_at)
+        )
+        await self.db.commit()
+        self.imported += len(rows)
+        await note_events.publish([
+            note_event("note_created", note_id, self.owner_id, first_seq + offset)
+            for offset, note_id in enumerate(created_ids)
+        ])
+        logger.info("Import for user %s: %s notes imported, %s failed", self.owner_id, self.imported, self.failed)
+
+    def report(self) -> dict:
+        return {"imported": self.imported, "failed": self.failed, "errors": self.errors}
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc']) or 'record'}: {item['msg']}" for item in error.errors()
+    )
+
+
+async def copy_notes(db, rows: List[dict]) -> None:
+    # COPY bypasses the column type, so content is encoded here
+    records = [
+        (
+            row["title"], encode_content(row["content"]), row["content_length"], row["excerpt"],
+            row["visibility"].name, row["owner_id"], row["created_at"], row["updated_at"], row["change_seq"],
+        )
+        for row in rows
+    ]
+    if isinstance(db, AsyncSession):
+        connection = await db.connection()
+        raw = await connection.get_raw_connection()
+        # asyncpg's binary COPY
+        await raw.driver_connection.copy_records_to_table("notes", records=records, columns=COPY_COLUMNS)
+    else:
+        await db.run_sync(_copy_csv, records)
+
+
+def _copy_csv(session, records: List[tuple]) -> None:
+    buffer = io.StringIO()
+    # No value here is ever None, so quoting every string cannot turn a NULL
+    # into ''. bytea goes in its hex text form.
+    csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC).writerows(
+        tuple("\\x" + value.hex() if isinstance(value, bytes) else value for value in record) for record in records
+    )
+    buffer.seek(0)
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY notes ({', '.join(COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """
+    Split a byte stream into numbered lines without holding more than one
+    line. Lines over IMPORT_MAX_RECORD_BYTES are yielded as None.
+    """
+    limit = settings.IMPORT_MAX_RECORD_BYTES
+    number, pending, oversized = 0, bytearray(), False
+    async for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if end < 0:
+                if not oversized:
+                    pending += chunk[start:]
+                    if len(pending) > limit:
+                        pending, oversized = bytearray(), True
+                break
+            number += 1
+            if pending and not oversized:
+                pending += chunk[start:end]
+                line = bytes(pending)
+            else:
+                line = chunk[start:end]
+            yield number, None if oversized or len(line) > limit else line
+            pending, oversized = bytearray(), False
+            start = end + 1
+    if pending or oversized:
+        yield number + 1, None if oversized or len(pending) > limit else bytes(pending)
+
+
+async def import_ndjson(importer: NoteImporter, chunks: AsyncIterator[bytes]) -> None:
+    async for number, line in iter_lines(chunks):
+        if line is None:
+            importer.fail(f"Record exceeds {settings.IMPORT_MAX_RECORD_BYTES} bytes", line=number)
+        elif line.strip():
+            await importer.add_json(line, number)
+    await importer.flush()
+
+
+def parse_markdown(name: str, text: str) -> dict:
+    """
+    Read a Markdown note as written by the zip export: optional front matter
+    of ``key: value`` lines between ``---`` fences (values may be JSON), then
+    the content. Without a title, the first heading or the file name is used.
+    """
+    fields, content = {}, text
+    if text.startswith("---\n"):
+        end = text.find("\n---\n", 3)
+        if end >= 0:
+            for line in text[4:end].splitlines():
+                key, separator, value = line.partition(":")
+                if not separator:
+                    continue
+                value = value.strip()
+                try:
+                    value = json.loads(value)
+                except ValueError:
+                    pass
+                fields[key.strip()] = value
+            content = text[end + 5:]
+
+    if not fields.get("title"):
+        heading = next((line for line in content.splitlines() if line.startswith("# ")), None)
+        stem = name.rsplit("/", 1)[-1].rsplit(".", 1)[0]
+        fields["title"] = heading[2:].strip() if heading else stem
+    fields.setdefault("visibility", VisibilityStatus.PRIVATE.value)
+    fields["content"] = content
+    return fields
+
+
+def _read_members(archive: zipfile.ZipFile, members: Iterable[zipfile.ZipInfo]) -> List[Tuple[str, object]]:
+    documents = []
+    for member in members:
+        if member.file_size > settings.IMPORT_MAX_RECORD_BYTES:
+            documents.append((member.filename, f"Record exceeds {settings.IMPORT_MAX_RECORD_BYTES} bytes"))
+            continue
+        try:
+            text = archive.read(member).decode("utf-8")
+        except (UnicodeDecodeError, zipfile.BadZipFile, zlib.error) as e:
+            documents.append((member.filename, f"Unreadable file: {e}"))
+            continue
+        documents.append((member.filename, parse_markdown(member.filename, text)))
+    return documents
+
+
+async def import_zip(importer: NoteImporter, chunks: AsyncIterator[bytes]) -> None:
+    """
+    A zip can only be read from its end, so the upload is spooled (to disk
+    past SPOOL_MAX_MEMORY) and its Markdown members are then read a batch
+    at a time.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY) as spool:
+        async for chunk in chunks:
+            spool.write(chunk)
+        spool.seek(0)
+        try:
+            archive = zipfile.ZipFile(spool)
+        except zipfile.BadZipFile:
+            importer.fail("Not a valid zip archive")
+            return
+        with archive:
+            members = [
+                member for member in archive.infolist()
+                if not member.is_dir() and member.filename.lower().endswith(".md")
+            ]
+            batch_size = settings.IMPORT_BATCH_SIZE
+            for start in range(0, len(members), batch_size):
+                documents = await run_in_threadpool(_read_members, archive, members[start:start + batch_size])
+                for name, document in documents:
+                    if isinstance(document, str):
+                        importer.fail(document, file=name)
+                        continue
+                    try:
+                        record = NoteImportRecord.model_validate(document)
+                    except ValidationError as e:
+                        importer.fail(_validation_message(e), file=name)
+                        continue
+                    await importer.add(record, file=name)
+    await importer.flush()
@@ -1,8 +1,13 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Boolean, Table, Enum
+from sqlalchemy import Column, Integer, BigInteger, String, Float, ForeignKey, DateTime, Boolean, LargeBinary, Table, Enum, Index, DDL, event
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
+from .types import CompressedText
 import enum
+from typing import Optional
+
+# Characters of content kept in Note.excerpt
+EXCERPT_LENGTH = 200
 
 class VisibilityStatus(str, enum.Enum):
     PRIVATE = "private"
@@ -15,9 +20,32 @@ note_sharing = Table(
     'note_sharing',
     Base.metadata,
     Column('note_id', Integer, ForeignKey('notes.id'), primary_key=True),
-    Column('user_id', Integer, ForeignKey('users.id'), primary_key=True)
+    Column('user_id', Integer, ForeignKey('users.id'), primary_key=True),
+    Column('change_seq', BigInteger, nullable=False, default=0),
+    # The primary key serves lookups by note; this one serves "shared with me"
+    Index('ix_note_sharing_user_note', 'user_id', 'note_id')
 ) 
 
+# Shares that were removed, kept so the changes feed can report them
+note_sharing_tombstones = Table(
+    'note_sharing_tombstones',
+    Base.metadata,
+    Column('note_id', Integer, ForeignKey('notes.id'), primary_key=True),
+    Column('user_id', Integer, ForeignKey('users.id'), primary_key=True),
+    Column('change_seq', BigInteger, nullable=False),
+    Index('ix_note_sharing_tombstones_user_seq', 'user_id', 'change_seq')
+)
+
+# Single-row counter handing out change sequence numbers, see
+# app.database.changes
+change_counter = Table(
+    'change_counter',
+    Base.metadata,
+    Column('id', Integer, primary_key=True),
+    Column('value', BigInteger, nullable=False)
+)
+event.listen(change_counter, "after_create", DDL("INSERT INTO change_counter (id, value) VALUES (1, 0)"))
+
 class User(Base):
     __tablename__ = "users"
 
@@ -28,10 +56,13 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
  
     notes = relationship("Note", back_populates="owner")
+    # Sharing lists can be huge: never lazy-load them implicitly, query
+    # note_sharing or opt in with selectinload() instead
     shared_notes = relationship(
         "Note",
         secondary=note_sharing,
-        back_populates="shared_with"
+        back_populates="shared_with",
+        lazy="raise_on_sql"
     )
 
 class Note(Base):
@@ -39,17 +70,89 @@ class Note(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
-    content = Column(String)  # Markdown content
+    content = Column(CompressedText)  # Markdown content, see app.database.types
+    # Derived from content on every write (see content_fields) so listing
+    # notes never reads or decompresses it
+    content_length = Column(Integer, nullable=True)
+    excerpt = Column(String, nullable=True)
     visibility = Column(Enum(VisibilityStatus), default=VisibilityStatus.PRIVATE)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     owner_id = Column(Integer, ForeignKey("users.id"))
+    public_token = Column(String, unique=True, index=True, nullable=True)
+    # Bumped by every write; deleted notes stay behind as tombstones
+    change_seq = Column(BigInteger, nullable=False, default=0)
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Backs keyset pagination of a user's notes ordered by (updated_at, id)
+        Index("ix_notes_owner_updated_id", "owner_id", "updated_at", "id"),
+        # Backs the changes feed
+        Index("ix_notes_owner_change_seq", "owner_id", "change_seq"),
+    )
 
 
     owner = relationship("User", back_populates="notes")
     shared_with = relationship(
         "User",
         secondary=note_sharing,
-        back_populates="shared_notes"
+        back_populates="shared_notes",
+        lazy="raise_on_sql"
     )
 
+
+def content_fields(content: Optional[str]) -> dict:
+    """Values of the columns derived from ``content``, for Core inserts and updates."""
+    if content is None:
+        return {"content_length": None, "excerpt": None}
+    return {"content_length": len(content), "excerpt": content[:EXCERPT_LENGTH]}
+
+
+@event.listens_for(Note.content, "set")
+def _set_content_fields(note, content, previous, initiator):
+    # ORM writes; Core writes pass content_fields() along with the content
+    for key, value in content_fields(content).items():
+        setattr(note, key, value)
+
+
+class NoteRevision(Base):
+    """
+    One version of a note. Keyframes hold the full content; other revisions
+    hold a delta against the previous one (see app.database.revisions).
+    """
+    __tablename__ = "note_revisions"
+
+    id = Column(Integer, primary_key=True)
+    note_id = Column(Integer, ForeignKey("notes.id"), nullable=False)
+    # 1, 2, ... per note
+    number = Column(Integer, nullable=False)
+    title = Column(String)
+    is_keyframe = Column(Boolean, nullable=False, default=False)
+    # zlib-compressed content (keyframes) or delta (see app.core.delta)
+    data = Column(LargeBinary, nullable=False)
+    content_length = Column(Integer, nullable=False, default=0)
+    author_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_note_revisions_note_number", "note_id", "number", unique=True),
+    )
+
+
+# Full-text search vector over title + content. tsvector columns and GIN
+# indexes are Postgres-only, so they are added with DDL after the table is
+# created instead of being mapped; other dialects use the in-process index
+# in app.core.search. Content may be stored compressed, so the database
+# cannot derive the vector: writers set it with app.core.search.index_notes.
+event.listen(
+    Note.__table__,
+    "after_create",
+    DDL("ALTER TABLE notes ADD COLUMN search_vector tsvector").execute_if(dialect="postgresql"),
+)
+event.listen(
+    Note.__table__,
+    "after_create",
+    DDL(
+        "CREATE INDEX ix_notes_search_vector ON notes USING GIN (search_vector)"
+    ).execute_if(dialect="postgresql"),
+)
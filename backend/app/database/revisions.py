@@ -0,0 +1,153 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import case, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.delta import apply_delta, make_delta, pack_text, unpack_text
+from .models import NoteRevision
+
+REVISION_SUMMARY_COLUMNS = (
+    NoteRevision.number,
+    NoteRevision.title,
+    NoteRevision.is_keyframe,
+    NoteRevision.content_length,
+    NoteRevision.author_id,
+    NoteRevision.created_at,
+)
+
+
+@dataclass
+class NoteEdit:
+    note_id: int
+    old_title: Optional[str]
+    old_content: Optional[str]
+    # When the old state was written, for notes that have no revision yet
+    old_updated_at: Optional[datetime]
+    title: Optional[str]
+    content: Optional[str]
+
+    @property
+    def changed(self) -> bool:
+        return (self.old_title, self.old_content or "") != (self.title, self.content or "")
+
+
+def _revision(note_id: int, number: int, title, content: str, data: bytes, is_keyframe: bool, author_id, created_at) -> dict:
+    return {
+        "note_id": note_id,
+        "number": number,
+        "title": title,
+        "is_keyframe": is_keyframe,
+        "data": data,
+        "content_length": len(content),
+        "author_id": author_id,
+        "created_at": created_at,
+    }
+
+
+def first_revision(note_id: int, title, content: Optional[str], author_id, created_at) -> dict:
+    return _revision(note_id, 1, title, content or "", pack_text(content or ""), True, author_id, created_at)
+
+
+def _build_revisions(
+    edits: List[NoteEdit], state: Dict[int, Tuple[int, int]], author_id: int, now: datetime
+) -> List[dict]:
+    rows = []
+    for edit in edits:
+        last, keyframe = state.get(edit.note_id, (None, None))
+        if last is None:
+            # Written before revisions were kept, or created in bulk or by import
+            rows.append(first_revision(edit.note_id, edit.old_title, edit.old_content, None, edit.old_updated_at))
+            last = keyframe = 1
+
+        number, content = last + 1, edit.content or ""
+        is_keyframe = number - keyframe >= settings.REVISION_KEYFRAME_INTERVAL
+        if is_keyframe:
+            data = pack_text(content)
+        else:
+            data = make_delta(edit.old_content or "", content)
+            if len(data) > len(content) // 4:
+                # Mostly rewritten: a keyframe may be as small and is cheaper to read
+                full = pack_text(content)
+                if len(full) <= len(data):
+                    data, is_keyframe = full, True
+        rows.append(_revision(edit.note_id, number, edit.title, content, data, is_keyframe, author_id, now))
+        state[edit.note_id] = (number, number if is_keyframe else keyframe)
+    return rows
+
+
+async def record_revisions(db: AsyncSession, edits: List[NoteEdit], author_id: int, now: datetime) -> Dict[int, int]:
+    """
+    Store a revision for each edit that changed the title or content, in
+    order, with one INSERT, and return the latest revision number of each
+    note written. Deltas are taken against ``old_content``, so callers must
+    hold the note rows locked for the old content to be the latest
+    revision's.
+    """
+    edits = [edit for edit in edits if edit.changed]
+    if not edits:
+        return {}
+    state = {
+        note_id: (last, keyframe)
+        for note_id, last, keyframe in await db.execute(
+            select(
+                NoteRevision.note_id,
+                func.max(NoteRevision.number),
+                func.max(case((NoteRevision.is_keyframe, NoteRevision.number))),
+            )
+            .where(NoteRevision.note_id.in_({edit.note_id for edit in edits}))
+            .group_by(NoteRevision.note_id)
+        )
+    }
+    # Diffing large notes is CPU work; keep it off the event loop
+    rows = await run_in_threadpool(_build_revisions, edits, state, author_id, now)
+    await db.execute(insert(NoteRevision), rows)
+    return {row["note_id"]: row["number"] for row in rows}
+
+
+async def latest_revision_number(db: AsyncSession, note_id: int) -> int:
+    # A note without revisions gets its current state recorded as 1 when first edited
+    return await db.scalar(select(func.max(NoteRevision.number)).where(NoteRevision.note_id == note_id)) or 1
+
+
+async def list_revisions(db: AsyncSession, note_id: int, limit: int, before: Optional[int] = None) -> list:
+    """Newest first, without touching the stored content."""
+    query = select(*REVISION_SUMMARY_COLUMNS).where(NoteRevision.note_id == note_id)
+    if before is not None:
+        query = query.where(NoteRevision.number < before)
+    return (await db.execute(query.order_by(NoteRevision.number.desc()).limit(limit))).all()
+
+
+async def load_revision(db: AsyncSession, note_id: int, number: int) -> Optional[dict]:
+    """
+    Rebuild revision ``number`` from the closest keyframe at or before it:
+    one query and at most REVISION_KEYFRAME_INTERVAL - 1 deltas.
+    """
+    keyframe = (
+        select(func.max(NoteRevision.number))
+        .where(NoteRevision.note_id == note_id, NoteRevision.is_keyframe, NoteRevision.number <= number)
+        .scalar_subquery()
+    )
+    rows = (
+        await db.execute(
+            select(*REVISION_SUMMARY_COLUMNS, NoteRevision.data)
+            .where(NoteRevision.note_id == note_id, NoteRevision.number.between(keyframe, number))
+            .order_by(NoteRevision.number)
+        )
+    ).all()
+    if not rows or rows[-1].number != number:
+        return None
+    content = await run_in_threadpool(_replay, rows)
+    revision = rows[-1]._asdict()
+    del revision["data"]
+    return {**revision, "content": content}
+
+
+def _replay(rows) -> str:
+    content = unpack_text(rows[0].data)
+    for row in rows[1:]:
+        content = apply_delta(content, row.data)
+    return content
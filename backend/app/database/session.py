@@ -1,14 +1,290 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.declarative import declarative_base
-import os
-from dotenv import load_dotenv
+import logging
+import threading
+import time
 
-load_dotenv()
+from sqlalchemy import create_engine as sa_create_engine, event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+from starlette.concurrency import run_in_threadpool
 
-DATABASE_URL = os.getenv("DATABASE_URL")
+from app.core import metrics
+from app.core.config import settings
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+logger = logging.getLogger(__name__)
 
-Base = declarative_base() 
\ No newline at end of file
+DATABASE_URL = settings.DATABASE_URL
+
+# Async drivers used when DATABASE_ASYNC is enabled
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.acquisitions = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.acquisitions += 1
+            self.timeouts += timed_out
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+
+class _TimedAcquireMixin:
+    # Time spent in connect() covers waiting for a free slot, opening
+    # overflow connections and the pre-ping
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - start)
+        return connection
+
+    @property
+    def stats(self) -> PoolStats:
+        if "_stats" not in self.__dict__:
+            self._stats = PoolStats()
+        return self._stats
+
+
+class InstrumentedQueuePool(_TimedAcquireMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_TimedAcquireMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def async_database_url(database_url: str):
+    url = make_url(database_url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+
+
+def engine_options(url, is_async: bool = False) -> dict:
+    """Pool and connection arguments for ``url`` derived from settings."""
+    if url.get_backend_name() == "sqlite":
+        # The threaded session hops between worker threads between calls
+        return {"connect_args": {"check_same_thread": False}}
+
+    options = {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+    connect_args = {}
+
+    if settings.DB_PGBOUNCER:
+        # PgBouncer does the pooling; prepared statements and startup
+        # parameters do not survive transaction-mode pooling
+        options["poolclass"] = NullPool
+        if is_async:
+            connect_args["statement_cache_size"] = 0
+            connect_args["prepared_statement_cache_size"] = 0
+        if settings.DB_STATEMENT_TIMEOUT_MS:
+            logger.warning(
+                "DB_STATEMENT_TIMEOUT_MS is ignored with DB_PGBOUNCER; "
+                "set statement_timeout on the database role instead"
+            )
+    else:
+        options.update(
+            poolclass=InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+        )
+        if settings.DB_STATEMENT_TIMEOUT_MS:
+            timeout = str(settings.DB_STATEMENT_TIMEOUT_MS)
+            if is_async:
+                connect_args["server_settings"] = {"statement_timeout": timeout}
+            else:
+                connect_args["options"] = f"-c statement_timeout={timeout}"
+
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
+
+def create_engine(database_url: str = DATABASE_URL):
+    return sa_create_engine(database_url, **engine_options(make_url(database_url)))
+
+
+def create_async_database_engine(database_url: str = DATABASE_URL):
+    url = async_database_url(database_url)
+    return create_async_engine(url, **engine_options(url, is_async=True))
+
+
+def pool_status(engine) -> dict:
+    pool = engine.pool
+    status = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=pool._max_overflow,
+        )
+    stats = getattr(pool, "stats", None)
+    if stats is not None:
+        status.update(
+            acquisitions=stats.acquisitions,
+            timeouts=stats.timeouts,
+            wait_seconds_total=round(stats.total_wait, 6),
+            wait_seconds_max=round(stats.max_wait, 6),
+            wait_seconds_avg=round(stats.total_wait / stats.acquisitions, 6) if stats.acquisitions else 0.0,
+        )
+    return status
+
+
+_QUERY_OPERATIONS = frozenset(("SELECT", "INSERT", "UPDATE", "DELETE"))
+
+
+def _query_operation(statement: str) -> str:
+    keyword = statement.lstrip()[:6].upper()
+    return keyword if keyword in _QUERY_OPERATIONS else "OTHER"
+
+
+def instrument_engine(engine) -> None:
+    """Times the statements ``engine`` executes into metrics.QUERY_DURATION."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_query_started", None)
+        if started is not None:
+            metrics.QUERY_DURATION.observe(time.perf_counter() - started, _query_operation(statement))
+
+
+engine = create_engine()
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+async_engine = None
+AsyncSessionLocal = None
+if settings.DATABASE_ASYNC:
+    async_engine = create_async_database_engine()
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+if settings.METRICS_ENABLED:
+    instrument_engine(engine)
+    if async_engine is not None:
+        instrument_engine(async_engine.sync_engine)
+
+
+def _pool_metric(name: str, documentation: str, type: str, key: str) -> None:
+    # Read from pool_status() when /metrics is scraped
+    def collect() -> dict:
+        engines = {"sync": engine}
+        if async_engine is not None:
+            engines["async"] = async_engine.sync_engine
+        values = {}
+        for label, bound in engines.items():
+            status = pool_status(bound)
+            if key in status:
+                values[(label,)] = status[key]
+        return values
+
+    metrics.CallbackMetric(name, documentation, type, ("engine",), collect)
+
+
+for _metric in (
+    ("db_pool_size", "Connections the pool keeps open", "gauge", "size"),
+    ("db_pool_checked_out", "Pooled connections in use", "gauge", "checked_out"),
+    ("db_pool_overflow", "Connections open beyond the pool size", "gauge", "overflow"),
+    ("db_pool_acquisitions_total", "Connections handed out by the pool", "counter", "acquisitions"),
+    ("db_pool_timeouts_total", "Waits for a pooled connection that timed out", "counter", "timeouts"),
+    ("db_pool_wait_seconds_total", "Time spent waiting for pooled connections", "counter", "wait_seconds_total"),
+):
+    _pool_metric(*_metric)
+
+
+class ThreadedSession:
+    """
+    Exposes the awaitable subset of the AsyncSession API over a sync Session,
+    running each database call in the threadpool. Endpoints are written once
+    against this API and work with either DATABASE_ASYNC setting.
+    """
+
+    def __init__(self, session: Session):
+        self.sync_session = session
+
+    @property
+    def bind(self):
+        return self.sync_session.bind
+
+    def add(self, instance) -> None:
+        self.sync_session.add(instance)
+
+    def add_all(self, instances) -> None:
+        self.sync_session.add_all(instances)
+
+    async def execute(self, statement, params=None, **kwargs):
+        return await run_in_threadpool(self.sync_session.execute, statement, params, **kwargs)
+
+    async def scalar(self, statement, params=None, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, statement, params, **kwargs)
+
+    async def stream(self, statement, params=None, **kwargs):
+        statement = statement.execution_options(stream_results=True)
+        result = await run_in_threadpool(self.sync_session.execute, statement, params, **kwargs)
+        return ThreadedResult(result)
+
+    async def scalars(self, statement, params=None, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalars, statement, params, **kwargs)
+
+    async def get(self, entity, ident, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kwargs)
+
+    async def delete(self, instance) -> None:
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def flush(self, objects=None) -> None:
+        await run_in_threadpool(self.sync_session.flush, objects)
+
+    async def refresh(self, instance, attribute_names=None) -> None:
+        await run_in_threadpool(self.sync_session.refresh, instance, attribute_names)
+
+    async def commit(self) -> None:
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self) -> None:
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def close(self) -> None:
+        await run_in_threadpool(self.sync_session.close)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+
+class ThreadedResult:
+    """The ``partitions()`` part of AsyncResult over a streaming sync Result."""
+
+    def __init__(self, result):
+        self.result = result
+
+    async def partitions(self, size=None):
+        partitions = self.result.partitions(size)
+        while True:
+            # One threadpool hop per partition, not per row
+            rows = await run_in_threadpool(next, partitions, None)
+            if rows is None:
+                return
+            yield rows
+
+    async def close(self) -> None:
+        await run_in_threadpool(self.result.close)
@@ -0,0 +1,84 @@
+"""
+Column type for note content, compressed at rest when it is large.
+
+Values under CONTENT_COMPRESSION_MIN_BYTES are stored as plain UTF-8.
+Larger ones are stored as a two-byte header, 0xFF and the format, followed
+by the compressed text. 0xFF never occurs in UTF-8, so plain values,
+including rows written before content was compressed, read back as is.
+"""
+import functools
+import logging
+import zlib
+from typing import Callable, Optional, Tuple
+
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+from app.core.config import settings
+
+try:
+    import zstandard
+except ImportError:  # optional: zlib is used instead
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+MARKER = 0xFF
+ZLIB = 1
+ZSTD = 2
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+@functools.lru_cache(maxsize=None)
+def _compressor(name: str) -> Optional[Tuple[int, Callable[[bytes], bytes]]]:
+    if name == "none":
+        return None
+    if name == "zstd":
+        if zstandard is not None:
+            return ZSTD, zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress
+        logger.warning("zstandard is not installed, compressing note content with zlib")
+    elif name != "zlib":
+        logger.warning("Unknown CONTENT_COMPRESSION %r, using zlib", name)
+    return ZLIB, functools.partial(zlib.compress, level=ZLIB_LEVEL)
+
+
+def encode_content(text: str) -> bytes:
+    raw = text.encode()
+    compressor = _compressor(settings.CONTENT_COMPRESSION)
+    if compressor is None or len(raw) < settings.CONTENT_COMPRESSION_MIN_BYTES:
+        return raw
+    fmt, compress = compressor
+    packed = compress(raw)
+    # Incompressible content is cheaper to read back plain
+    return bytes((MARKER, fmt)) + packed if len(packed) + 2 < len(raw) else raw
+
+
+def decode_content(data) -> str:
+    if isinstance(data, str):
+        # Written to a TEXT column before the type changed (SQLite keeps it)
+        return data
+    data = bytes(data)
+    if not data or data[0] != MARKER:
+        return data.decode()
+    fmt, packed = data[1], data[2:]
+    if fmt == ZLIB:
+        return zlib.decompress(packed).decode()
+    if fmt == ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Note content is zstd-compressed but zstandard is not installed")
+        # Frames written by ZstdCompressor.compress() carry their size
+        return zstandard.ZstdDecompressor().decompress(packed).decode()
+    raise ValueError(f"Unknown note content format {fmt}")
+
+
+class CompressedText(TypeDecorator):
+    """Text in Python, bytes in the database; see the module docstring."""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else encode_content(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else decode_content(value)
@@ -1,10 +1,16 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from app.api.router import api_router
 from app.database.session import engine
 from app.database.models import Base
+from app.core import metrics
+from app.core.config import settings
 from app.core.middleware import setup_middleware
+from app.core.events import note_events
+from app.core.logs import setup_logging
 
 
+setup_logging()
+
 Base.metadata.create_all(bind=engine)
 
 app = FastAPI(
@@ -14,8 +20,16 @@ app = FastAPI(
 
 setup_middleware(app)
 
+# Closes the LISTEN connection of the Postgres event backend
+app.add_event_handler("shutdown", note_events.close)
+
 app.include_router(api_router, prefix="/api")
 
 @app.get("/")
 def read_root():
-    return {"message": "Welcome to the Notes API"} 
\ No newline at end of file
+    return {"message": "Welcome to the Notes API"} 
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    def read_metrics():
+        return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
@@ -1,5 +1,5 @@
-from typing import List, Optional
-from pydantic import BaseModel
+from typing import Annotated, List, Literal, Optional, Union
+from pydantic import BaseModel, Field
 from datetime import datetime
 from app.database.models import VisibilityStatus
 from .user import User
@@ -35,5 +35,130 @@ class NoteInDB(Note):
     owner: User
     shared_with: List[User] = []
 
+class NotePage(BaseModel):
+    items: List[Note]
+    next_cursor: Optional[str] = None
+
+class NoteSummary(BaseModel):
+    # Every field but id and updated_at is only present when selected
+    id: int
+    updated_at: Optional[datetime] = None
+    title: Optional[str] = None
+    content: Optional[str] = None
+    visibility: Optional[str] = None
+    owner_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    public_token: Optional[str] = None
+    excerpt: Optional[str] = None
+    content_length: Optional[int] = None
+
+class NoteSummaryPage(BaseModel):
+    items: List[NoteSummary]
+    next_cursor: Optional[str] = None
+
+class NoteSearchResult(Note):
+    rank: float
+    snippet: Optional[str] = None
+
+class NoteImportRecord(NoteCreate):
+    # Kept when importing an export, so notes keep their history and order
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class NoteImportError(BaseModel):
+    line: Optional[int] = None
+    file: Optional[str] = None
+    error: str
+
+class NoteImportReport(BaseModel):
+    imported: int
+    failed: int
+    # At most IMPORT_MAX_ERRORS; ``failed`` counts them all
+    errors: List[NoteImportError]
+
+class NoteChange(BaseModel):
+    seq: int
+    type: Literal["note", "note_deleted", "share_added", "share_removed"]
+    note_id: int
+    # Share changes only
+    user_id: Optional[int] = None
+    # The note as it is now, for "note" and for a share added to the caller
+    note: Optional[Note] = None
+
+class NoteChanges(BaseModel):
+    changes: List[NoteChange]
+    next_token: str
+    has_more: bool
+
+class NoteRevisionSummary(BaseModel):
+    number: int
+    title: Optional[str] = None
+    is_keyframe: bool
+    content_length: int
+    author_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+
+class NoteRevision(NoteRevisionSummary):
+    content: str
+
+class NoteRevisionDiff(BaseModel):
+    note_id: int
+    from_number: int
+    to_number: int
+    # Unified diff of the content, empty when it did not change
+    diff: str
+
+class NoteTextEdit(BaseModel):
+    # Replaces [start, end) of the base content: 0-based characters, or whole
+    # lines (newlines included) with unit "line"
+    start: int
+    end: int
+    text: str = ""
+    unit: Literal["char", "line"] = "char"
+
+class NotePatch(BaseModel):
+    # Revision the edits were made against; the current content if omitted
+    base_revision: Optional[int] = None
+    title: Optional[str] = None
+    # Range edits, in order and not overlapping, or a unified diff
+    operations: Optional[List[NoteTextEdit]] = None
+    diff: Optional[str] = None
+
 class NoteShare(BaseModel):
-    email: str 
\ No newline at end of file
+    email: str
+
+class BulkCreate(NoteBase):
+    op: Literal["create"]
+
+class BulkUpdate(NoteUpdate):
+    op: Literal["update"]
+    note_id: int
+
+class BulkDelete(BaseModel):
+    op: Literal["delete"]
+    note_id: int
+
+class BulkShare(NoteShare):
+    op: Literal["share"]
+    note_id: int
+
+BulkOperation = Annotated[
+    Union[BulkCreate, BulkUpdate, BulkDelete, BulkShare],
+    Field(discriminator="op")
+]
+
+class NoteBulkRequest(BaseModel):
+    operations: List[BulkOperation]
+    # Apply nothing if any operation fails validation
+    atomic: bool = False
+
+class BulkOperationResult(BaseModel):
+    index: int
+    op: str
+    status: int
+    note_id: Optional[int] = None
+    error: Optional[str] = None
+
+class NoteBulkResponse(BaseModel):
+    applied: int
+    results: List[BulkOperationResult]
@@ -20,6 +20,10 @@ class UserInDBBase(UserBase):
 class User(UserInDBBase):
     pass
 
+class UserPrincipal(UserInDBBase):
+    """The authenticated user as seen by request handlers; cached between requests."""
+    pass
+
 class UserInDB(UserInDBBase):
     hashed_password: str
 
@@ -0,0 +1,147 @@
+"""
+Note content stored plain, zlib- or zstd-compressed (zstd only when the
+zstandard package is installed): bytes on disk, write and read throughput
+of full notes, and the time to list summaries, which read the stored
+excerpt and length and never the content.
+
+Notes are generated Markdown (headings, paragraphs, lists, code) of mixed
+sizes, most of them small and a few of several megabytes, as in the
+accounts of our heaviest users.
+
+    cd backend && python -m benchmarks.content_compression [notes] [megabytes]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, UTC
+
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/benchmark.db"
+os.environ["DATABASE_ASYNC"] = "false"
+os.environ.setdefault("JWT_SECRET", "benchmark")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+
+from sqlalchemy import delete, insert, select, text
+
+from app.core.config import settings
+from app.core.serialization import note_projection
+from app.database import types
+from app.database.database import Base
+from app.database.models import Note, User, VisibilityStatus, content_fields
+from app.database.session import SessionLocal, engine
+
+_words = random.Random(0)
+VOCABULARY = ["".join(_words.choices("abcdefghijklmnopqrstuvwxyz", k=_words.randint(2, 10))) for _ in range(3000)]
+BATCH = 200
+
+
+def markdown(rng: random.Random, size: int) -> str:
+    parts, length = [], 0
+    while length < size:
+        kind = rng.random()
+        if kind < 0.1:
+            block = "## " + " ".join(rng.choices(VOCABULARY, k=rng.randint(2, 6))).capitalize()
+        elif kind < 0.25:
+            items = ("- " + " ".join(rng.choices(VOCABULARY, k=rng.randint(3, 10))) for _ in range(rng.randint(2, 6)))
+            block = "\n".join(items)
+        elif kind < 0.3:
+            lines = (
+                f"    {rng.choice(VOCABULARY)} = {rng.choice(VOCABULARY)}({rng.randint(0, 999)})"
+                for _ in range(rng.randint(3, 12))
+            )
+            block = "```python\n" + "\n".join(lines) + "\n```"
+        else:
+            block = " ".join(rng.choices(VOCABULARY, k=rng.randint(20, 80))).capitalize() + "."
+        parts.append(block)
+        length += len(block) + 2
+    return "\n\n".join(parts)
+
+
+def sizes(rng: random.Random, count: int, total_mb: float) -> list:
+    # Long-tailed: a few huge notes hold most of the bytes
+    weights = [rng.paretovariate(0.8) for _ in range(count)]
+    scale = total_mb * 2 ** 20 / sum(weights)
+    return [max(200, min(8 * 2 ** 20, int(weight * scale))) for weight in weights]
+
+
+def run(mode: str, contents: list) -> None:
+    settings.CONTENT_COMPRESSION = mode
+    with SessionLocal() as db:
+        db.execute(delete(Note))
+        db.commit()
+    with engine.connect() as connection:
+        connection.execute(text("VACUUM"))
+
+    now = datetime.now(UTC)
+    start = time.perf_counter()
+    with SessionLocal() as db:
+        for offset in range(0, len(contents), BATCH):
+            db.execute(
+                insert(Note),
+                [
+                    {
+                        "title": f"Note {offset + i}",
+                        "content": content,
+                        **content_fields(content),
+                        "visibility": VisibilityStatus.PRIVATE,
+                        "owner_id": 1,
+                        "created_at": now,
+                        "updated_at": now,
+                    }
+                    for i, content in enumerate(contents[offset:offset + BATCH])
+                ],
+            )
+        db.commit()
+    written = time.perf_counter() - start
+
+    with engine.connect() as connection:
+        stored = connection.execute(text("SELECT sum(length(content)) FROM notes")).scalar()
+        connection.execute(text("VACUUM"))
+        pages, page_size = (connection.execute(text(f"PRAGMA {name}")).scalar() for name in ("page_count", "page_size"))
+
+    start = time.perf_counter()
+    with SessionLocal() as db:
+        read = sum(len(content) for content in db.scalars(select(Note.content)))
+    elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with SessionLocal() as db:
+        listed = db.execute(select(*note_projection(view="summary"))).all()
+    summaries = time.perf_counter() - start
+
+    raw_mb = sum(len(content.encode()) for content in contents) / 2 ** 20
+    assert read == sum(len(content) for content in contents) and len(listed) == len(contents)
+    print(
+        f"{mode:>5}: content {stored / 2 ** 20:7.1f} MB, file {pages * page_size / 2 ** 20:7.1f} MB, "
+        f"write {raw_mb / written:6.1f} MB/s, read {raw_mb / elapsed:6.1f} MB/s, "
+        f"summaries {summaries * 1000:6.1f} ms"
+    )
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    total_mb = float(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rng = random.Random(7)
+    contents = [markdown(rng, size) for size in sizes(rng, count, total_mb)]
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        db.execute(insert(User).values(id=1, email="bench@example.com", hashed_password="x"))
+        db.commit()
+
+    largest = max(len(content) for content in contents)
+    print(
+        f"{count} notes, {sum(len(content.encode()) for content in contents) / 2 ** 20:.1f} MB of Markdown, "
+        f"largest {largest / 2 ** 20:.1f} MB, compressed from {settings.CONTENT_COMPRESSION_MIN_BYTES} bytes"
+    )
+    for mode in ("none", "zlib", "zstd"):
+        if mode == "zstd" and types.zstandard is None:
+            print(" zstd: skipped, zstandard is not installed")
+            continue
+        run(mode, contents)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Resident memory while streaming an export of N notes (100k by default),
+sampled as the chunks are consumed, next to loading the same notes at once
+the way a non-streaming endpoint would.
+
+Each note carries ~1 KB of content, so holding them all would cost on the
+order of the export size; the streaming exports should stay flat. The zip
+export grows only by its central directory (~60 bytes per note), which the
+format needs at the end of the archive.
+
+    cd backend && python -m benchmarks.export_memory [notes] [ndjson|zip|all]
+"""
+import asyncio
+import gc
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, UTC
+
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/benchmark.db"
+os.environ.setdefault("DATABASE_ASYNC", "false")
+os.environ.setdefault("JWT_SECRET", "benchmark")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+
+from sqlalchemy import insert, select
+
+from app.core.deps import open_session
+from app.database.database import Base
+from app.database.export import export_ndjson, export_zip
+from app.database.models import Note, User, VisibilityStatus
+from app.database.session import SessionLocal, engine
+
+CONTENT = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 18
+SAMPLES = 10
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def seed(count: int) -> None:
+    Base.metadata.create_all(bind=engine)
+    now = datetime.now(UTC)
+    with SessionLocal() as db:
+        db.execute(insert(User).values(id=1, email="bench@example.com", hashed_password="x"))
+        for start in range(0, count, 10000):
+            db.execute(
+                insert(Note),
+                [
+                    {
+                        "title": f"Note {i}",
+                        "content": CONTENT,
+                        "visibility": VisibilityStatus.PRIVATE,
+                        "owner_id": 1,
+                        "created_at": now,
+                        "updated_at": now - timedelta(seconds=i),
+                    }
+                    for i in range(start, min(count, start + 10000))
+                ],
+            )
+        db.commit()
+
+
+async def run_export(name: str, stream, count: int) -> None:
+    gc.collect()
+    baseline = rss_mb()
+    samples, exported, chunks = [], 0, 0
+    start = time.perf_counter()
+    async for chunk in stream:
+        exported += len(chunk)
+        chunks += 1
+        if chunks % max(1, count // 500 // SAMPLES) == 0:
+            samples.append(rss_mb())
+    elapsed = time.perf_counter() - start
+    samples.append(rss_mb())
+    print(
+        f"{name:>7}: {exported / 2 ** 20:7.1f} MB in {elapsed:5.1f}s, "
+        f"RSS +{min(samples) - baseline:5.1f} .. +{max(samples) - baseline:5.1f} MB over {len(samples)} samples"
+    )
+
+
+async def load_all(count: int) -> None:
+    gc.collect()
+    baseline = rss_mb()
+    async with open_session() as db:
+        rows = (await db.execute(select(Note).where(Note.owner_id == 1))).scalars().all()
+        print(f"{'load all':>7}: {len(rows)} ORM objects held, RSS +{rss_mb() - baseline:5.1f} MB")
+
+
+async def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    which = sys.argv[2] if len(sys.argv) > 2 else "all"
+    seed(count)
+    print(f"{count} notes")
+    if which in ("ndjson", "all"):
+        await run_export("ndjson", export_ndjson(1), count)
+    if which in ("zip", "all"):
+        await run_export("zip", export_zip(1), count)
+    if which == "all":
+        await load_all(count)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
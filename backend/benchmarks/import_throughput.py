@@ -0,0 +1,77 @@
+"""
+Notes per second through the NDJSON import path (line splitting, NoteCreate
+validation, batched inserts and commits), fed in 64 KB chunks as an upload
+would arrive. Runs against DATABASE_URL if set, a temporary SQLite file
+otherwise.
+
+    cd backend && python -m benchmarks.import_throughput [notes]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import orjson
+
+_db_dir = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_db_dir}/benchmark.db")
+os.environ.setdefault("DATABASE_ASYNC", "false")
+os.environ.setdefault("JWT_SECRET", "benchmark")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+
+from sqlalchemy import delete, insert
+
+from app.core.config import settings
+from app.core.deps import open_session
+from app.database.database import Base
+from app.database.importer import NoteImporter, import_ndjson
+from app.database.models import Note, User
+from app.database.session import SessionLocal, engine
+
+CHUNK_SIZE = 64 * 1024
+CONTENT = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 4
+
+
+def make_body(count: int) -> bytes:
+    return b"\n".join(
+        orjson.dumps({"title": f"Imported {i}", "content": CONTENT, "visibility": "private"})
+        for i in range(count)
+    )
+
+
+async def chunked(body: bytes):
+    for start in range(0, len(body), CHUNK_SIZE):
+        yield body[start:start + CHUNK_SIZE]
+
+
+async def run(body: bytes) -> NoteImporter:
+    async with open_session() as db:
+        importer = NoteImporter(db, owner_id=1)
+        await import_ndjson(importer, chunked(body))
+        return importer
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        db.execute(delete(Note).where(Note.owner_id == 1))
+        db.execute(delete(User).where(User.id == 1))
+        db.execute(insert(User).values(id=1, email="bench@example.com", hashed_password="x"))
+        db.commit()
+
+    body = make_body(count)
+    start = time.perf_counter()
+    importer = asyncio.run(run(body))
+    elapsed = time.perf_counter() - start
+    print(
+        f"{importer.imported} notes ({len(body) / 2 ** 20:.1f} MB) in {elapsed:.2f}s: "
+        f"{importer.imported / elapsed:,.0f} notes/s "
+        f"[{engine.dialect.name}, batches of {settings.IMPORT_BATCH_SIZE}]"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Per-request overhead of the full middleware stack (CORS, trusted host,
+security headers, request logging, rate limiting) before and after the move
+from BaseHTTPMiddleware to plain ASGI middleware.
+
+Requests are driven straight through the ASGI interface, so the numbers are
+middleware + routing cost only, with no network or server in the way.
+
+    cd backend && python -m benchmarks.middleware_overhead [requests]
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("JWT_SECRET", "benchmark")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ["RATE_LIMIT"] = str(10 ** 9)
+
+from fastapi import FastAPI, Request, Response
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse
+
+from app.core.middleware import setup_middleware
+
+logging.disable(logging.CRITICAL)
+logger = logging.getLogger("benchmark")
+
+
+# Previous implementations, kept here for comparison
+class LegacyRateLimitMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app):
+        super().__init__(app)
+        self.requests = {}
+
+    async def dispatch(self, request: Request, call_next) -> Response:
+        client_ip = request.client.host
+        current_time = time.time()
+        self.requests = {
+            ip: timestamps
+            for ip, timestamps in self.requests.items()
+            if current_time - timestamps[-1] < 60
+        }
+        if client_ip in self.requests:
+            timestamps = self.requests[client_ip]
+            if len(timestamps) >= 10 ** 9:
+                return JSONResponse(status_code=429, content={"detail": "Too many requests"})
+            timestamps.append(current_time)
+        else:
+            self.requests[client_ip] = [current_time]
+        return await call_next(request)
+
+
+class LegacySecurityHeadersMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next) -> Response:
+        response = await call_next(request)
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.headers["X-Frame-Options"] = "DENY"
+        response.headers["X-XSS-Protection"] = "1; mode=block"
+        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
+        response.headers["Content-Security-Policy"] = "default-src 'self'"
+        return response
+
+
+class LegacyRequestLoggingMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next) -> Response:
+        start_time = time.time()
+        logger.info(f"Request started: {request.method} {request.url.path}")
+        response = await call_next(request)
+        process_time = time.time() - start_time
+        logger.info(
+            f"Request completed: {request.method} {request.url.path} "
+            f"Status: {response.status_code} Time: {process_time:.2f}s"
+        )
+        return response
+
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+def legacy_app() -> FastAPI:
+    app = make_app()
+    app.add_middleware(
+        CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"]
+    )
+    app.add_middleware(TrustedHostMiddleware, allowed_hosts=["*"])
+    app.add_middleware(LegacySecurityHeadersMiddleware)
+    app.add_middleware(LegacyRequestLoggingMiddleware)
+    app.add_middleware(LegacyRateLimitMiddleware)
+    return app
+
+
+def current_app() -> FastAPI:
+    app = make_app()
+    setup_middleware(app)
+    return app
+
+
+async def drive(app, requests: int) -> float:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/ping",
+        "raw_path": b"/ping",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"localhost"), (b"origin", b"http://localhost:3000")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("localhost", 8000),
+    }
+
+    disconnected = asyncio.Event()
+
+    def make_receive():
+        messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            # Like a live connection: nothing more until the client goes away
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        return receive
+
+    async def send(message):
+        pass
+
+    for _ in range(200):
+        await app(dict(scope), make_receive(), send)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), make_receive(), send)
+    return (time.perf_counter() - start) / requests
+
+
+def main() -> None:
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    results = {}
+    for name, factory in (("no middleware", make_app), ("BaseHTTPMiddleware", legacy_app), ("pure ASGI", current_app)):
+        results[name] = asyncio.run(drive(factory(), requests))
+
+    baseline = results["no middleware"]
+    print(f"{requests} requests per stack")
+    for name, per_request in results.items():
+        overhead = per_request - baseline
+        print(f"{name:>20}: {per_request * 1e6:8.1f} us/request  (+{overhead * 1e6:6.1f} us middleware)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Revision storage for one note edited N times (10k by default): bytes kept
+as keyframes plus deltas next to storing every version whole, raw or
+compressed, and the latency of rebuilding random revisions.
+
+Each edit changes, inserts or removes a line somewhere in a note of ~200
+lines, which is how notes are usually edited. Rebuilding a revision reads
+its closest keyframe and replays at most REVISION_KEYFRAME_INTERVAL - 1
+deltas, so latency stays flat however long the history grows.
+
+    cd backend && python -m benchmarks.revisions [edits] [keyframe interval]
+"""
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, UTC
+
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/benchmark.db"
+os.environ.setdefault("DATABASE_ASYNC", "false")
+os.environ.setdefault("JWT_SECRET", "benchmark")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+if len(sys.argv) > 2:
+    os.environ["REVISION_KEYFRAME_INTERVAL"] = sys.argv[2]
+
+from sqlalchemy import func, insert, select
+
+from app.core.config import settings
+from app.core.delta import pack_text
+from app.core.deps import open_session
+from app.database.database import Base
+from app.database.models import Note, NoteRevision, User, VisibilityStatus
+from app.database.revisions import NoteEdit, first_revision, load_revision, record_revisions
+from app.database.session import SessionLocal, engine
+
+WORDS = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor".split()
+READS = 1000
+
+
+def sentence(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 14))).capitalize() + ".\n"
+
+
+def edit(rng: random.Random, lines: list) -> list:
+    lines = list(lines)
+    at = rng.randrange(len(lines))
+    roll = rng.random()
+    if roll < 0.6:
+        lines[at] = sentence(rng)
+    elif roll < 0.85 or len(lines) < 50:
+        lines.insert(at, sentence(rng))
+    else:
+        del lines[at]
+    return lines
+
+
+def seed(content: str) -> None:
+    Base.metadata.create_all(bind=engine)
+    now = datetime.now(UTC)
+    with SessionLocal() as db:
+        db.execute(insert(User).values(id=1, email="bench@example.com", hashed_password="x"))
+        db.execute(
+            insert(Note).values(
+                id=1, title="Bench", content=content, visibility=VisibilityStatus.PRIVATE, owner_id=1, created_at=now
+            )
+        )
+        db.execute(insert(NoteRevision), [first_revision(1, "Bench", content, 1, now)])
+        db.commit()
+
+
+async def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    rng = random.Random(42)
+    lines = [sentence(rng) for _ in range(200)]
+    versions = ["".join(lines)]
+    seed(versions[0])
+
+    start = time.perf_counter()
+    for _ in range(count):
+        lines = edit(rng, lines)
+        versions.append("".join(lines))
+        async with open_session() as db:
+            edit_ = NoteEdit(1, "Bench", versions[-2], None, "Bench", versions[-1])
+            await record_revisions(db, [edit_], 1, datetime.now(UTC))
+            await db.commit()
+    written = time.perf_counter() - start
+
+    with SessionLocal() as db:
+        stored, keyframes = db.execute(
+            select(func.sum(func.length(NoteRevision.data)), func.count().filter(NoteRevision.is_keyframe))
+        ).one()
+    raw = sum(len(version.encode()) for version in versions)
+    packed = sum(len(pack_text(version)) for version in versions)
+    print(f"{len(versions)} revisions of ~{len(versions[-1]) / 1024:.1f} KB, keyframe every {settings.REVISION_KEYFRAME_INTERVAL}")
+    print(f"  write: {written / count * 1000:.2f} ms per edit")
+    print(f"  stored: {stored / 2 ** 20:6.2f} MB ({keyframes} keyframes)")
+    print(f"  whole:  {raw / 2 ** 20:6.2f} MB raw, {packed / 2 ** 20:6.2f} MB compressed")
+    print(f"  ratio:  {raw / stored:.1f}x vs raw, {packed / stored:.1f}x vs compressed")
+
+    timings = []
+    for number in (rng.randint(1, len(versions)) for _ in range(READS)):
+        async with open_session() as db:
+            start = time.perf_counter()
+            revision = await load_revision(db, 1, number)
+            timings.append(time.perf_counter() - start)
+        assert revision["content"] == versions[number - 1]
+    timings.sort()
+    print(
+        f"  rebuild: p50 {statistics.median(timings) * 1000:.2f} ms, "
+        f"p99 {timings[int(len(timings) * 0.99)] * 1000:.2f} ms, max {timings[-1] * 1000:.2f} ms over {READS} reads"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+"""
+Cost of producing a list response of N notes, fetch included, with the
+previous path (ORM objects, ``{**note.__dict__}`` copies, validation and
+serialization through the ``Note`` response model as FastAPI does it)
+versus the current one (column rows, plain dicts, orjson).
+
+    cd backend && python -m benchmarks.serialization [repeat]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, UTC
+from typing import List
+
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/benchmark.db"
+os.environ["DATABASE_ASYNC"] = "false"
+os.environ.setdefault("JWT_SECRET", "benchmark")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select
+
+from app.core.serialization import NOTE_COLUMNS, rows_to_dicts
+from app.database.database import Base
+from app.database.models import Note, User, VisibilityStatus
+from app.database.session import SessionLocal, engine
+from app.schemas.note import Note as NoteSchema
+
+SIZES = (10, 100, 1000)
+CONTENT = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 20
+
+notes_adapter = TypeAdapter(List[NoteSchema])
+
+
+def seed() -> None:
+    Base.metadata.create_all(bind=engine)
+    now = datetime.now(UTC)
+    with SessionLocal() as db:
+        db.execute(insert(User).values(id=1, email="bench@example.com", hashed_password="x"))
+        db.execute(
+            insert(Note),
+            [
+                {
+                    "title": f"Note {i}",
+                    "content": CONTENT,
+                    "visibility": VisibilityStatus.PRIVATE,
+                    "owner_id": 1,
+                    "created_at": now,
+                    "updated_at": now - timedelta(seconds=i),
+                }
+                for i in range(max(SIZES))
+            ],
+        )
+        db.commit()
+
+
+def legacy(db, size: int) -> bytes:
+    notes = db.scalars(
+        select(Note).where(Note.owner_id == 1).order_by(Note.updated_at.desc(), Note.id.desc()).limit(size)
+    ).all()
+    notes_list = [{**note.__dict__, "visibility": note.visibility.value} for note in notes]
+    # What FastAPI does with a response_model: validate, dump, json.dumps
+    validated = notes_adapter.validate_python(notes_list)
+    content = notes_adapter.dump_python(validated, mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def current(db, size: int) -> bytes:
+    rows = db.execute(
+        select(*NOTE_COLUMNS).where(Note.owner_id == 1).order_by(Note.updated_at.desc(), Note.id.desc()).limit(size)
+    ).all()
+    return ORJSONResponse(rows_to_dicts(rows)).body
+
+
+def measure(fn, size: int, repeat: int) -> float:
+    with SessionLocal() as db:
+        fn(db, size)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn(db, size)
+            # Like a request: nothing stays in the identity map between calls
+            db.expunge_all()
+        return (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    seed()
+    with SessionLocal() as db:
+        assert json.loads(legacy(db, 10)) == json.loads(current(db, 10))
+
+    print(f"{repeat} responses per size")
+    for size in SIZES:
+        before = measure(legacy, size, repeat)
+        after = measure(current, size, repeat)
+        print(
+            f"{size:>5} notes: legacy {before * 1e3:8.2f} ms  current {after * 1e3:8.2f} ms  "
+            f"({before / after:4.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import os
+import tempfile
+import uuid
+from contextlib import contextmanager
+
+_db_dir = tempfile.mkdtemp()
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{_db_dir}/test.db",
+    DATABASE_ASYNC="false",
+    JWT_SECRET="test-secret",
+    JWT_ALGORITHM="HS256",
+    JWT_ACCESS_TOKEN_EXPIRE_MINUTES="30",
+    RATE_LIMIT="1000000",
+    BCRYPT_ROUNDS="4",
+    METRICS_ENABLED="true",
+)
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.main import app
+from app.database.session import engine
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def make_user(client):
+    def make_user():
+        email = f"{uuid.uuid4().hex}@example.com"
+        client.post("/api/auth/register", json={"email": email, "password": "secret"})
+        token = client.post("/api/auth/login", data={"username": email, "password": "secret"}).json()["access_token"]
+        return email, {"Authorization": f"Bearer {token}"}
+
+    return make_user
+
+
+@pytest.fixture
+def create_note(client):
+    def create_note(headers, title="Note", content="body", visibility="private"):
+        response = client.post(
+            "/api/notes/", json={"title": title, "content": content, "visibility": visibility}, headers=headers
+        )
+        assert response.status_code == 200
+        return response.json()["id"]
+
+    return create_note
+
+
+@pytest.fixture
+def count_queries():
+    """Context manager collecting the SQL statements executed inside it."""
+
+    @contextmanager
+    def count_queries():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    return count_queries
@@ -0,0 +1,40 @@
+from sqlalchemy import func, select
+
+from app.database.models import NoteRevision
+from app.database.session import SessionLocal
+
+
+def bulk(client, headers, *operations, atomic=False):
+    response = client.post("/api/notes/bulk", json={"operations": list(operations), "atomic": atomic}, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_operations_after_a_delete_of_the_same_note_fail(client, make_user, create_note):
+    _, owner = make_user()
+    note_id = create_note(owner)
+    other_id = create_note(owner)
+
+    result = bulk(
+        client, owner,
+        {"op": "update", "note_id": other_id, "title": "Before"},
+        {"op": "delete", "note_id": other_id},
+        {"op": "delete", "note_id": note_id},
+        {"op": "update", "note_id": note_id, "title": "After"},
+        {"op": "delete", "note_id": note_id},
+    )
+    assert result["applied"] == 3
+    assert [item["status"] for item in result["results"]] == [200, 200, 200, 404, 404]
+    # Only the revision written on creation: none for the rejected update
+    with SessionLocal() as db:
+        assert db.scalar(select(func.count()).where(NoteRevision.note_id == note_id)) == 1
+
+    note_id = create_note(owner)
+    result = bulk(
+        client, owner,
+        {"op": "delete", "note_id": note_id}, {"op": "update", "note_id": note_id, "title": "After"},
+        atomic=True,
+    )
+    assert result["applied"] == 0
+    assert [item["status"] for item in result["results"]] == [424, 404]
+    assert client.get(f"/api/notes/{note_id}", headers=owner).status_code == 200
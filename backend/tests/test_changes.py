@@ -0,0 +1,102 @@
+from sqlalchemy import event, insert, select, update
+
+from app.database.models import Note, User, change_counter, note_sharing
+from app.database.session import engine
+
+
+def changes(client, headers, since=None, limit=None):
+    params = {key: value for key, value in (("since", since), ("limit", limit)) if value is not None}
+    response = client.get("/api/notes/changes", params=params, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def summarize(feed):
+    return [(change["type"], change["note_id"]) for change in feed["changes"]]
+
+
+def test_changes_report_writes_deletes_and_shares(client, make_user, create_note):
+    reader_email, reader = make_user()
+    _, owner = make_user()
+    kept = create_note(owner, "Kept")
+    deleted = create_note(owner, "Deleted")
+
+    initial = changes(client, owner)
+    assert summarize(initial) == [("note", kept), ("note", deleted)]
+    assert initial["changes"][0]["note"]["title"] == "Kept"
+    assert initial["has_more"] is False
+    token = initial["next_token"]
+    assert changes(client, owner, token)["changes"] == []
+
+    client.put(f"/api/notes/{kept}", json={"title": "Renamed"}, headers=owner)
+    client.post(f"/api/notes/{kept}/share", json={"email": reader_email}, headers=owner)
+    assert client.delete(f"/api/notes/{deleted}", headers=owner).status_code == 200
+    feed = changes(client, owner, token)
+    assert summarize(feed) == [("note", kept), ("share_added", kept), ("note_deleted", deleted)]
+    assert feed["changes"][0]["note"]["title"] == "Renamed"
+    assert "note" not in feed["changes"][1]
+
+    # The recipient gets the note along with the share
+    reader_feed = changes(client, reader)
+    assert summarize(reader_feed) == [("note", kept), ("share_added", kept)]
+    assert reader_feed["changes"][1]["note"]["title"] == "Renamed"
+
+    response = client.delete(f"/api/notes/{kept}/share", params={"email": reader_email}, headers=owner)
+    assert response.status_code == 200
+    assert summarize(changes(client, reader, reader_feed["next_token"])) == [("share_removed", kept)]
+    assert changes(client, reader)["changes"] == []
+
+    # Tombstones are hidden from every other read
+    assert client.get(f"/api/notes/{deleted}", headers=owner).status_code == 404
+    assert [note["id"] for note in client.get("/api/notes/", headers=owner).json()] == [kept]
+    assert summarize(changes(client, owner)) == [("note", kept)]
+
+
+def test_changes_are_paged_in_order(client, make_user, create_note):
+    _, owner = make_user()
+    note_ids = [create_note(owner, f"Note {i}") for i in range(7)]
+
+    seen, token = [], None
+    while True:
+        feed = changes(client, owner, token, limit=3)
+        seen += [change["note_id"] for change in feed["changes"]]
+        token = feed["next_token"]
+        if not feed["has_more"]:
+            break
+    assert seen == note_ids
+    assert client.get("/api/notes/changes", params={"since": "nope"}, headers=owner).status_code == 400
+
+
+def test_changes_committed_between_source_queries_are_not_skipped(client, make_user, create_note):
+    reader_email, _ = make_user()
+    _, owner = make_user()
+    note_id = create_note(owner, "Before")
+    token = changes(client, owner)["next_token"]
+
+    def next_seq(conn):
+        return conn.execute(
+            update(change_counter).values(value=change_counter.c.value + 1).returning(change_counter.c.value)
+        ).scalar()
+
+    interleaved = []
+
+    def commit_between_queries(conn, cursor, statement, parameters, context, executemany):
+        # Once the notes query has run, a note update then a share commit
+        if interleaved or "JOIN note_sharing" not in statement:
+            return
+        interleaved.append(statement)
+        with engine.begin() as other:
+            other.execute(update(Note).where(Note.id == note_id).values(title="After", change_seq=next_seq(other)))
+            user_id = other.scalar(select(User.id).where(User.email == reader_email))
+            other.execute(insert(note_sharing).values(note_id=note_id, user_id=user_id, change_seq=next_seq(other)))
+
+    event.listen(engine, "before_cursor_execute", commit_between_queries)
+    try:
+        feed = changes(client, owner, token)
+    finally:
+        event.remove(engine, "before_cursor_execute", commit_between_queries)
+    assert interleaved
+
+    # Whatever this read saw, the next one from its token sees the rest
+    seen = summarize(feed) + summarize(changes(client, owner, feed["next_token"]))
+    assert seen == [("note", note_id), ("share_added", note_id)]
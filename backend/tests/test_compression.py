@@ -0,0 +1,111 @@
+import asyncio
+import gzip
+import zlib
+
+from starlette.responses import StreamingResponse
+
+from app.core import public_cache
+from app.core.compression import negotiate
+from app.core.middleware import CompressionMiddleware
+
+GZIP = {"Accept-Encoding": "gzip"}
+BODY = "".join(f"Paragraph {i} of a note long enough to be worth compressing.\n\n" for i in range(100))
+
+
+def test_negotiate_prefers_client_weights_then_server_order(monkeypatch):
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "COMPRESSION_ENCODINGS", "br,gzip")
+    assert negotiate("gzip, deflate") == "gzip"
+    assert negotiate("gzip;q=0.5, *;q=0.1") == "gzip"
+    assert negotiate("gzip;q=0, identity") is None
+    assert negotiate("") is None
+    assert negotiate("*") in ("br", "gzip")
+
+
+def test_responses_are_compressed_from_the_threshold(client, make_user, create_note):
+    _, owner = make_user()
+    small = client.get(f"/api/notes/{create_note(owner, content='Short')}", headers={**owner, **GZIP})
+    assert "content-encoding" not in small.headers
+    assert small.headers["vary"] == "Accept-Encoding"
+
+    note_id = create_note(owner, content=BODY)
+    identity = client.get(f"/api/notes/{note_id}", headers={**owner, "Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers
+
+    response = client.get(f"/api/notes/{note_id}", headers={**owner, **GZIP})
+    assert response.headers["content-encoding"] == "gzip"
+    assert int(response.headers["content-length"]) < len(identity.content)
+    assert response.json() == identity.json()
+    # Its own validator, which still revalidates and guards writes
+    etag = response.headers["etag"]
+    assert etag == identity.headers["etag"][:-1] + '-gzip"'
+    revalidated = client.get(f"/api/notes/{note_id}", headers={**owner, **GZIP, "If-None-Match": etag})
+    assert revalidated.status_code == 304 and revalidated.headers["etag"] == etag
+    update = client.put(f"/api/notes/{note_id}", json={"title": "Edited"}, headers={**owner, "If-Match": etag})
+    assert update.status_code == 200
+    stale = client.put(f"/api/notes/{note_id}", json={"title": "Lost"}, headers={**owner, "If-Match": etag})
+    assert stale.status_code == 412
+
+
+def test_streamed_export_is_compressed(client, make_user, create_note):
+    _, owner = make_user()
+    create_note(owner, content=BODY)
+
+    response = client.get("/api/notes/export", headers={**owner, **GZIP})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.text.count("\n") == 1
+
+
+def test_stream_chunks_are_flushed_and_event_streams_left_alone():
+    async def chunks():
+        for i in range(3):
+            yield f"chunk {i}\n"
+
+    async def run(media_type):
+        messages = []
+
+        async def receive():
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            messages.append(message)
+
+        app = CompressionMiddleware(StreamingResponse(chunks(), media_type=media_type))
+        scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", b"gzip")]}
+        await app(scope, receive, send)
+        return messages
+
+    messages = asyncio.run(run("text/plain"))
+    assert (b"content-encoding", b"gzip") in messages[0]["headers"]
+    decompressor = zlib.decompressobj(31)
+    # Each chunk decodes on arrival, before the stream ends
+    assert [decompressor.decompress(message["body"]) for message in messages[1:4]] == [
+        b"chunk 0\n", b"chunk 1\n", b"chunk 2\n"
+    ]
+
+    messages = asyncio.run(run("text/event-stream"))
+    assert all(name != b"content-encoding" for name, _ in messages[0]["headers"])
+    assert [message["body"] for message in messages[1:4]] == [b"chunk 0\n", b"chunk 1\n", b"chunk 2\n"]
+
+
+def test_public_note_compressed_variant_is_cached(client, make_user, monkeypatch, create_note):
+    compressed = []
+
+    def compress(data, encoding):
+        compressed.append(encoding)
+        return gzip.compress(data)
+
+    monkeypatch.setattr(public_cache, "compress", compress)
+    _, owner = make_user()
+    note_id = create_note(owner, content=BODY)
+    url = client.post(f"/api/notes/{note_id}/public-link", headers=owner).json()["public_url"]
+    path = url[url.index("/api/"):]
+
+    first = client.get(path, headers=GZIP)
+    second = client.get(path, headers=GZIP)
+    assert first.headers["content-encoding"] == "gzip" and first.headers["vary"] == "Accept-Encoding"
+    assert second.content == first.content and second.json()["content"] == BODY
+    assert compressed == ["gzip"]
+    assert client.get(path, headers={**GZIP, "If-None-Match": first.headers["etag"]}).status_code == 304
+    assert "content-encoding" not in client.get(path, headers={"Accept-Encoding": "identity"}).headers
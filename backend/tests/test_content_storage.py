@@ -0,0 +1,82 @@
+import json
+import zlib
+
+import pytest
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.database import types
+from app.database.session import engine
+from app.database.types import ZLIB, decode_content, encode_content
+
+LONG = "".join(f"Line {i}: the quick brown fox jumps over the lazy dog.\n" for i in range(200))
+
+
+def stored(note_id):
+    with engine.connect() as connection:
+        return connection.execute(
+            text("SELECT content, content_length, excerpt FROM notes WHERE id = :id"), {"id": note_id}
+        ).one()
+
+
+def test_content_is_compressed_above_the_threshold(monkeypatch):
+    monkeypatch.setattr(settings, "CONTENT_COMPRESSION", "zlib")
+    assert encode_content("short é") == "short é".encode()
+    packed = encode_content(LONG)
+    assert packed[:2] == bytes((0xFF, ZLIB)) and len(packed) < len(LONG) // 5
+    assert decode_content(packed) == LONG
+
+    monkeypatch.setattr(settings, "CONTENT_COMPRESSION", "none")
+    assert encode_content(LONG) == LONG.encode()
+    # Written before the column held bytes, or under another setting
+    assert decode_content("old row") == "old row"
+    assert decode_content(memoryview(b"\xff\x01" + zlib.compress(b"zlib row"))) == "zlib row"
+
+
+def test_zstd_falls_back_to_zlib_when_missing(monkeypatch):
+    monkeypatch.setattr(types, "zstandard", None)
+    types._compressor.cache_clear()
+    monkeypatch.setattr(settings, "CONTENT_COMPRESSION", "zstd")
+    try:
+        assert encode_content(LONG)[1] == ZLIB
+        with pytest.raises(RuntimeError):
+            decode_content(b"\xff\x02anything")
+    finally:
+        types._compressor.cache_clear()
+
+
+def test_notes_store_length_and_excerpt_on_every_write(client, make_user, monkeypatch):
+    monkeypatch.setattr(settings, "CONTENT_COMPRESSION", "zlib")
+    _, owner = make_user()
+    note_id = client.post(
+        "/api/notes/", json={"title": "Long", "content": LONG, "visibility": "private"}, headers=owner
+    ).json()["id"]
+    content, length, excerpt = stored(note_id)
+    assert content[0] == 0xFF and (length, excerpt) == (len(LONG), LONG[:200])
+    assert client.get(f"/api/notes/{note_id}", headers=owner).json()["content"] == LONG
+
+    assert client.put(f"/api/notes/{note_id}", json={"content": "now short"}, headers=owner).status_code == 200
+    assert stored(note_id) == (b"now short", 9, "now short")
+
+    client.post(
+        "/api/notes/bulk",
+        json={"operations": [
+            {"op": "update", "note_id": note_id, "content": LONG + "more"},
+            {"op": "create", "title": "Bulk", "content": "bulk body", "visibility": "private"},
+        ]},
+        headers=owner,
+    )
+    body = json.dumps({"title": "Imported", "content": LONG, "visibility": "private"}).encode()
+    client.post("/api/notes/import", content=body, headers={**owner, "Content-Type": "application/x-ndjson"})
+
+    summary = client.get("/api/notes/", params={"view": "summary"}, headers=owner).json()
+    assert sorted((note["title"], note["content_length"], note["excerpt"]) for note in summary) == [
+        ("Bulk", 9, "bulk body"),
+        ("Imported", len(LONG), LONG[:200]),
+        ("Long", len(LONG) + 4, LONG[:200]),
+    ]
+    notes = client.get("/api/notes/", headers=owner).json()
+    assert {note["title"]: note["content"] for note in notes}["Imported"] == LONG
+
+    client.delete(f"/api/notes/{note_id}", headers=owner)
+    assert stored(note_id) == (None, None, None)
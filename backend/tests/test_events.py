@@ -0,0 +1,80 @@
+import asyncio
+
+import orjson
+
+from app.core.events import MemoryEventBackend, NoteEventBus, event_stream, note_event, note_events, pack_payloads
+
+
+def user_id(client, headers):
+    return client.get("/api/auth/me", headers=headers).json()["id"]
+
+
+def drain(subscription):
+    return [(event["type"], event["note_id"]) for event in subscription.drain()]
+
+
+def test_handlers_publish_to_owner_and_share_recipients(client, make_user):
+    reader_email, reader = make_user()
+    _, owner = make_user()
+    owner_sub = asyncio.run(note_events.subscribe(user_id(client, owner)))
+    reader_sub = asyncio.run(note_events.subscribe(user_id(client, reader)))
+    try:
+        note_id = client.post(
+            "/api/notes/", json={"title": "T", "content": "c", "visibility": "private"}, headers=owner
+        ).json()["id"]
+        client.post(f"/api/notes/{note_id}/share", json={"email": reader_email}, headers=owner)
+        client.put(f"/api/notes/{note_id}", json={"title": "U"}, headers=owner)
+        client.delete(f"/api/notes/{note_id}/share", params={"email": reader_email}, headers=owner)
+        client.put(f"/api/notes/{note_id}", json={"title": "V"}, headers=owner)
+        client.delete(f"/api/notes/{note_id}", headers=owner)
+
+        assert drain(owner_sub) == [
+            ("note_created", note_id),
+            ("share_added", note_id),
+            ("note_updated", note_id),
+            ("share_removed", note_id),
+            ("note_updated", note_id),
+            ("note_deleted", note_id),
+        ]
+        # Nothing about the note before it was shared, nor after
+        assert drain(reader_sub) == [
+            ("share_added", note_id),
+            ("note_updated", note_id),
+            ("share_removed", note_id),
+        ]
+        assert note_events.stats()["watched_notes"] == 0
+    finally:
+        note_events.unsubscribe(owner_sub)
+        note_events.unsubscribe(reader_sub)
+    assert len(note_events) == 0
+
+
+def test_slow_subscriber_is_told_to_resync():
+    async def run():
+        bus = NoteEventBus(MemoryEventBackend(), max_subscriptions=10, buffer_size=2)
+        subscription = await bus.subscribe(1)
+        stream = event_stream(bus, subscription, heartbeat=0.01)
+        assert await anext(stream) == b"retry: 5000\n\n"
+        assert await anext(stream) == b": keepalive\n\n"
+
+        await bus.publish([note_event("note_updated", 5, 1, seq) for seq in (1, 2)])
+        assert await anext(stream) == (
+            b'id: 1\nevent: note_updated\ndata: {"seq":1,"type":"note_updated","note_id":5,"owner_id":1}\n\n'
+            b'id: 2\nevent: note_updated\ndata: {"seq":2,"type":"note_updated","note_id":5,"owner_id":1}\n\n'
+        )
+
+        await bus.publish([note_event("note_updated", 5, 1, seq) for seq in (3, 4, 5)])
+        assert await anext(stream) == b"event: resync\ndata: {}\n\n"
+        assert [chunk async for chunk in stream] == []
+        assert len(bus) == 0
+        assert bus.overflows == 1
+
+    asyncio.run(run())
+
+
+def test_notify_payloads_stay_under_the_postgres_limit():
+    events = [note_event("share_added", i, 1, i, user_id=2) for i in range(1000)]
+    payloads = list(pack_payloads(events))
+    assert len(payloads) > 1
+    assert all(len(payload.encode()) < 8000 for payload in payloads)
+    assert [event for payload in payloads for event in orjson.loads(payload)] == events
@@ -0,0 +1,46 @@
+import io
+import json
+import zipfile
+
+
+def create_notes(client, headers, count):
+    response = client.post(
+        "/api/notes/bulk",
+        json={"operations": [
+            {"op": "create", "title": f"Note {i}: draft", "content": f"Body {i}\n\n- item", "visibility": "private"}
+            for i in range(count)
+        ]},
+        headers=headers,
+    )
+    assert response.json()["applied"] == count
+
+
+def test_export_ndjson_streams_every_note(client, make_user, monkeypatch):
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "EXPORT_BATCH_SIZE", 7)
+    _, owner = make_user()
+    create_notes(client, owner, 30)
+    _, other = make_user()
+    create_notes(client, other, 3)
+
+    response = client.get("/api/notes/export", headers=owner)
+    assert response.headers["content-type"] == "application/x-ndjson"
+    notes = [json.loads(line) for line in response.text.splitlines()]
+    assert [note["title"] for note in notes] == [f"Note {i}: draft" for i in range(30)]
+    assert notes[0] == client.get(f"/api/notes/{notes[0]['id']}", headers=owner).json()
+
+
+def test_export_zip_contains_markdown_files(client, make_user):
+    _, owner = make_user()
+    create_notes(client, owner, 5)
+
+    response = client.get("/api/notes/export", params={"format": "zip"}, headers=owner)
+    assert response.headers["content-type"] == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert archive.testzip() is None
+        names = archive.namelist()
+        assert len(names) == 5
+        assert names[0].endswith("-Note 0 draft.md")
+        document = archive.read(names[0]).decode()
+    assert document.startswith('---\ntitle: "Note 0: draft"\nvisibility: "private"\n')
+    assert document.endswith("---\nBody 0\n\n- item")
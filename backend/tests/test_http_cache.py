@@ -0,0 +1,67 @@
+def test_read_note_revalidates_with_etag_and_last_modified(client, make_user, create_note):
+    _, owner = make_user()
+    note_id = create_note(owner)
+
+    response = client.get(f"/api/notes/{note_id}", headers=owner)
+    etag, last_modified = response.headers["etag"], response.headers["last-modified"]
+    assert response.headers["cache-control"] == "private, no-cache"
+
+    response = client.get(f"/api/notes/{note_id}", headers={**owner, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+    response = client.get(f"/api/notes/{note_id}", headers={**owner, "If-Modified-Since": last_modified})
+    assert response.status_code == 304
+
+    client.put(f"/api/notes/{note_id}", json={"title": "Changed"}, headers=owner)
+    response = client.get(f"/api/notes/{note_id}", headers={**owner, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_read_notes_list_etag_changes_with_membership(client, make_user, create_note):
+    _, owner = make_user()
+    create_note(owner)
+
+    etag = client.get("/api/notes/", headers=owner).headers["etag"]
+    assert client.get("/api/notes/", headers={**owner, "If-None-Match": etag}).status_code == 304
+
+    note_id = create_note(owner)
+    response = client.get("/api/notes/", headers={**owner, "If-None-Match": etag})
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    client.delete(f"/api/notes/{note_id}", headers=owner)
+    assert client.get("/api/notes/", headers={**owner, "If-None-Match": etag}).status_code == 200
+
+
+def test_read_notes_list_ignores_if_modified_since(client, make_user, create_note):
+    _, owner = make_user()
+    create_note(owner)
+    note_id = create_note(owner)
+    response = client.get("/api/notes/", headers=owner)
+    assert "last-modified" not in response.headers
+
+    # The newest note is unchanged by the delete, yet the list is not
+    client.delete(f"/api/notes/{note_id - 1}", headers=owner)
+    since = {"If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"}
+    response = client.get("/api/notes/", headers={**owner, **since})
+    assert response.status_code == 200 and [note["id"] for note in response.json()] == [note_id]
+
+
+def test_update_note_if_match_prevents_lost_updates(client, make_user, create_note):
+    _, owner = make_user()
+    note_id = create_note(owner)
+    etag = client.get(f"/api/notes/{note_id}", headers=owner).headers["etag"]
+
+    first = client.put(f"/api/notes/{note_id}", json={"title": "First"}, headers={**owner, "If-Match": etag})
+    assert first.status_code == 200
+    assert first.headers["etag"] != etag
+
+    second = client.put(f"/api/notes/{note_id}", json={"title": "Second"}, headers={**owner, "If-Match": etag})
+    assert second.status_code == 412
+    assert second.headers["etag"] == first.headers["etag"]
+    assert client.get(f"/api/notes/{note_id}", headers=owner).json()["title"] == "First"
+
+    assert client.put(f"/api/notes/{note_id}", json={"title": "Any"}, headers={**owner, "If-Match": "*"}).status_code == 200
@@ -0,0 +1,89 @@
+import io
+import json
+import zipfile
+
+from app.core.config import settings
+
+
+def ndjson(*records):
+    return "\n".join(r if isinstance(r, str) else json.dumps(r) for r in records).encode()
+
+
+def test_import_ndjson_reports_per_line_errors(client, make_user, monkeypatch):
+    monkeypatch.setattr(settings, "IMPORT_BATCH_SIZE", 2)
+    _, owner = make_user()
+    body = ndjson(
+        {"title": "One", "content": "1", "visibility": "private"},
+        "{not json",
+        {"title": "Two", "content": "2", "visibility": "public"},
+        "",
+        {"title": "Three", "content": "3", "visibility": "secret"},
+        {"content": "no title", "visibility": "private"},
+        {"title": "Four", "content": "4", "visibility": "shared", "created_at": "2020-01-02T03:04:05+00:00"},
+    )
+
+    response = client.post("/api/notes/import", content=body, headers={**owner, "Content-Type": "application/x-ndjson"})
+    report = response.json()
+    assert report["imported"] == 3
+    assert report["failed"] == 3
+    assert [error["line"] for error in report["errors"]] == [2, 5, 6]
+    assert "visibility" in report["errors"][1]["error"]
+    assert report["errors"][2]["error"].startswith("title:")
+
+    notes = client.get("/api/notes/", headers=owner).json()
+    assert sorted(note["title"] for note in notes) == ["Four", "One", "Two"]
+    assert next(note for note in notes if note["title"] == "Four")["created_at"].startswith("2020-01-02T03:04:05")
+
+
+def test_import_rejects_oversized_records(client, make_user, monkeypatch):
+    monkeypatch.setattr(settings, "IMPORT_MAX_RECORD_BYTES", 100)
+    _, owner = make_user()
+    body = ndjson({"title": "Big", "content": "x" * 200, "visibility": "private"}, {"title": "Small", "content": "", "visibility": "private"})
+
+    report = client.post("/api/notes/import", content=body, headers=owner).json()
+    assert report["imported"] == 1
+    assert report["errors"] == [{"line": 1, "file": None, "error": "Record exceeds 100 bytes"}]
+
+
+def test_export_then_import_round_trips(client, make_user):
+    _, source = make_user()
+    for i in range(3):
+        client.post("/api/notes/", json={"title": f"Note: {i}", "content": f"---\nBody {i}", "visibility": "public"}, headers=source)
+    exported = {
+        fmt: client.get("/api/notes/export", params={"format": fmt}, headers=source).content
+        for fmt in ("ndjson", "zip")
+    }
+    original = sorted(
+        (note["title"], note["content"], note["visibility"], note["created_at"])
+        for note in client.get("/api/notes/", headers=source).json()
+    )
+
+    for fmt, body in exported.items():
+        _, target = make_user()
+        content_type = "application/zip" if fmt == "zip" else "application/x-ndjson"
+        report = client.post("/api/notes/import", content=body, headers={**target, "Content-Type": content_type}).json()
+        assert report == {"imported": 3, "failed": 0, "errors": []}
+        imported = sorted(
+            (note["title"], note["content"], note["visibility"], note["created_at"])
+            for note in client.get("/api/notes/", headers=target).json()
+        )
+        assert imported == original
+
+
+def test_import_zip_of_plain_markdown(client, make_user):
+    _, owner = make_user()
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("notes/shopping.md", "- milk\n- eggs")
+        archive.writestr("notes/ideas.md", "Intro\n\n# Big idea\n\ntext")
+        archive.writestr("notes/binary.md", b"\xff\xfe")
+        archive.writestr("notes/readme.txt", "ignored")
+
+    report = client.post("/api/notes/import", params={"format": "zip"}, content=buffer.getvalue(), headers=owner).json()
+    assert report["imported"] == 2
+    assert report["errors"][0]["file"] == "notes/binary.md"
+    titles = sorted(note["title"] for note in client.get("/api/notes/", headers=owner).json())
+    assert titles == ["Big idea", "shopping"]
+
+    bad = client.post("/api/notes/import", params={"format": "zip"}, content=b"not a zip", headers=owner).json()
+    assert bad["errors"] == [{"line": None, "file": None, "error": "Not a valid zip archive"}]
@@ -0,0 +1,42 @@
+from app.core import metrics
+
+
+def test_requests_are_counted_and_timed_per_route(client, make_user, create_note):
+    _, owner = make_user()
+    note_id = create_note(owner, "Timed")
+    route = "/api/notes/{note_id}"
+    ok, missing = metrics.REQUESTS.value("GET", route, "200"), metrics.REQUESTS.value("GET", route, "404")
+    timed = metrics.REQUEST_DURATION.count("GET", route)
+    queries = metrics.QUERY_DURATION.count("SELECT")
+
+    client.get(f"/api/notes/{note_id}", headers=owner)
+    client.get(f"/api/notes/{note_id + 1000}", headers=owner)
+    client.get("/no/such/path")
+
+    assert metrics.REQUESTS.value("GET", route, "200") == ok + 1
+    assert metrics.REQUESTS.value("GET", route, "404") == missing + 1
+    assert metrics.REQUEST_DURATION.count("GET", route) == timed + 2
+    assert metrics.REQUESTS.value("GET", "unmatched", "404") >= 1
+    assert metrics.REQUESTS_IN_PROGRESS.value("GET") == 0
+    assert metrics.QUERY_DURATION.count("SELECT") > queries
+    assert metrics.PASSWORD_HASH_DURATION.count("verify") >= 1
+
+    response = client.get("/metrics")
+    assert response.headers["content-type"] == metrics.CONTENT_TYPE
+    assert 'http_requests_total{method="GET",route="/api/notes/{note_id}",status="200"}' in response.text
+    assert "# TYPE db_query_duration_seconds histogram" in response.text
+    assert 'db_pool_size{engine="sync"}' in response.text
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = metrics.Registry()
+    histogram = metrics.Histogram("latency_seconds", "Latency", ("route",), (0.1, 1.0), registry=registry)
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, 'a"b')
+    assert registry.render().splitlines()[2:] == [
+        'latency_seconds_bucket{route="a\\"b",le="0.1"} 2',
+        'latency_seconds_bucket{route="a\\"b",le="1"} 3',
+        'latency_seconds_bucket{route="a\\"b",le="+Inf"} 4',
+        'latency_seconds_sum{route="a\\"b"} 3.65',
+        'latency_seconds_count{route="a\\"b"} 4',
+    ]
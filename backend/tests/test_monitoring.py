@@ -0,0 +1,3 @@
+def test_monitoring_endpoints_are_not_mounted_by_default(client):
+    for path in ("/api/monitoring/pool", "/api/monitoring/cache", "/api/monitoring/events"):
+        assert client.get(path).status_code == 404
@@ -0,0 +1,32 @@
+def test_cursor_pages_walk_every_note_once(client, make_user, create_note):
+    _, owner = make_user()
+    created = [create_note(owner, f"Note {i}") for i in range(7)]
+
+    seen, cursor, pages = [], "", 0
+    while cursor is not None:
+        response = client.get("/api/notes/", params={"cursor": cursor, "limit": 3}, headers=owner)
+        assert response.status_code == 200
+        page = response.json()
+        seen += [note["id"] for note in page["items"]]
+        cursor, pages = page["next_cursor"], pages + 1
+    # Newest first, the last page short and without a cursor
+    assert seen == created[::-1]
+    assert pages == 3 and len(page["items"]) == 1
+
+
+def test_exact_last_page_has_no_cursor(client, make_user, create_note):
+    _, owner = make_user()
+    for i in range(3):
+        create_note(owner, f"Note {i}")
+    page = client.get("/api/notes/", params={"cursor": "", "limit": 3}, headers=owner).json()
+    assert len(page["items"]) == 3 and page["next_cursor"] is None
+
+
+def test_invalid_cursor_and_limit_are_rejected(client, make_user, create_note):
+    _, owner = make_user()
+    create_note(owner)
+    assert client.get("/api/notes/", params={"cursor": "not-a-cursor"}, headers=owner).status_code == 400
+    for limit in (0, -1, 501):
+        for path in ("/api/notes/", "/api/notes/shared", "/api/notes/accessible"):
+            response = client.get(path, params={"cursor": "", "limit": limit}, headers=owner)
+            assert response.status_code == 422
@@ -0,0 +1,63 @@
+import threading
+
+from passlib.context import CryptContext
+from sqlalchemy import select
+
+from app.core import security
+from app.core.security import PasswordHasherPool
+from app.database.models import User
+from app.database.session import SessionLocal
+
+
+def stored_hash(email):
+    with SessionLocal() as db:
+        return db.scalar(select(User.hashed_password).where(User.email == email))
+
+
+def test_logins_are_rejected_while_the_hasher_queue_is_full(client, make_user, monkeypatch):
+    email, _ = make_user()
+    monkeypatch.setattr(security, "password_hasher", PasswordHasherPool(workers=1, max_pending=1))
+    started, release = threading.Event(), threading.Event()
+    verify_and_update = security.pwd_context.verify_and_update
+
+    def blocking_verify_and_update(*args):
+        started.set()
+        release.wait(5)
+        return verify_and_update(*args)
+
+    monkeypatch.setattr(security.pwd_context, "verify_and_update", blocking_verify_and_update)
+
+    def login():
+        return client.post("/api/auth/login", data={"username": email, "password": "secret"})
+
+    responses = []
+    first = threading.Thread(target=lambda: responses.append(login()))
+    first.start()
+    try:
+        assert started.wait(5)
+        busy = login()
+        assert busy.status_code == 503
+        assert busy.headers["retry-after"] == "1"
+        assert client.post("/api/auth/register", json={"email": "x" + email, "password": "secret"}).status_code == 503
+    finally:
+        release.set()
+        first.join(5)
+    assert responses[0].status_code == 200
+    assert security.password_hasher.pending == 0
+    assert login().status_code == 200
+
+
+def test_login_upgrades_hashes_made_with_a_lower_cost(client, make_user, monkeypatch):
+    # Registered at the suite's BCRYPT_ROUNDS=4, bcrypt's minimum; the
+    # configured cost is then raised instead
+    email, _ = make_user()
+    assert stored_hash(email).startswith("$2b$04$")
+    monkeypatch.setattr(security, "pwd_context", CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=5))
+
+    response = client.post("/api/auth/login", data={"username": email, "password": "secret"})
+    assert response.status_code == 200
+    upgraded = stored_hash(email)
+    assert upgraded.startswith("$2b$05$")
+    assert security.pwd_context.verify("secret", upgraded)
+    assert client.post("/api/auth/login", data={"username": email, "password": "secret"}).status_code == 200
+    assert stored_hash(email) == upgraded
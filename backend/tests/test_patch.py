@@ -0,0 +1,82 @@
+import difflib
+
+BODY = "".join(f"Line {i} of a long note.\n" for i in range(20))
+
+
+def patch(client, headers, note_id, **body):
+    return client.patch(f"/api/notes/{note_id}", json=body, headers=headers)
+
+
+def test_patch_applies_range_edits_and_diffs(client, make_user):
+    _, owner = make_user()
+    created = client.post(
+        "/api/notes/", json={"title": "Draft", "content": BODY, "visibility": "private"}, headers=owner
+    )
+    assert created.headers["X-Note-Revision"] == "1"
+    note_id = created.json()["id"]
+
+    response = patch(client, owner, note_id, base_revision=1, operations=[
+        {"start": 0, "end": 4, "text": "LINE"},
+        {"start": 2, "end": 4, "text": "Two lines\nreplaced\n", "unit": "line"},
+    ])
+    assert response.status_code == 200
+    assert response.headers["X-Note-Revision"] == "2"
+    lines = response.json()["content"].splitlines()
+    assert lines[:5] == [
+        "LINE 0 of a long note.", "Line 1 of a long note.", "Two lines", "replaced", "Line 4 of a long note."
+    ]
+
+    content = response.json()["content"]
+    wanted = content.replace("Line 10 of", "Line ten of") + "The end.\n"
+    diff = "".join(difflib.unified_diff(content.splitlines(True), wanted.splitlines(True), "a", "b"))
+    response = patch(client, owner, note_id, base_revision=2, diff=diff, title="Final")
+    assert response.status_code == 200
+    assert response.json()["content"] == wanted and response.json()["title"] == "Final"
+    assert client.get(f"/api/notes/{note_id}/revisions/3", headers=owner).json()["content"] == wanted
+
+    # Title alone, no base needed
+    assert patch(client, owner, note_id, title="Renamed").json()["content"] == wanted
+
+
+def test_patch_rebases_stale_edits_or_reports_conflicts(client, make_user, create_note):
+    _, owner = make_user()
+    note_id = create_note(owner, content=BODY)
+    # Another editor changes line 10 after revision 1 was read
+    client.put(f"/api/notes/{note_id}", json={"content": BODY.replace("Line 10", "Line ten")}, headers=owner)
+
+    first_line = {"start": 0, "end": 1, "text": "First\n", "unit": "line"}
+    response = patch(client, owner, note_id, base_revision=1, operations=[first_line])
+    assert response.status_code == 200
+    assert response.json()["content"] == "First\n" + BODY.replace("Line 10", "Line ten").split("\n", 1)[1]
+    assert response.headers["X-Note-Revision"] == "3"
+
+    response = patch(client, owner, note_id, base_revision=1, operations=[
+        {"start": 5, "end": 5, "text": "fine\n", "unit": "line"},
+        {"start": 10, "end": 11, "text": "Line 10 edited\n", "unit": "line"},
+    ])
+    assert response.status_code == 409
+    assert response.json()["detail"]["conflicts"] == [1]
+    assert response.json()["detail"]["revision"] == 3 and response.headers["X-Note-Revision"] == "3"
+
+    # A diff whose context is not in the base conflicts whatever the base
+    diff = "@@ -1,2 +1,2 @@\n Line 0 of a long note.\n-Not there\n+Added\n"
+    assert patch(client, owner, note_id, diff=diff).json()["detail"]["conflicts"] == [0]
+    assert client.get(f"/api/notes/{note_id}/revisions", headers=owner).json()[0]["number"] == 3
+
+
+def test_patch_rejects_invalid_patches(client, make_user, create_note):
+    _, owner = make_user()
+    _, other = make_user()
+    note_id = create_note(owner, content=BODY)
+    overlapping = [{"start": 0, "end": 10, "text": ""}, {"start": 5, "end": 12, "text": ""}]
+    assert patch(client, owner, note_id, operations=overlapping).status_code == 400
+    out_of_range = [{"start": 0, "end": 99, "text": "", "unit": "line"}]
+    assert patch(client, owner, note_id, operations=out_of_range).status_code == 400
+    assert patch(client, owner, note_id, operations=[], diff="").status_code == 400
+    assert patch(client, owner, note_id, base_revision=7, operations=[]).status_code == 404
+    assert patch(client, other, note_id, operations=[]).status_code == 403
+
+    stale = client.patch(
+        f"/api/notes/{note_id}", json={"title": "x"}, headers={**owner, "If-Match": '"stale"'}
+    )
+    assert stale.status_code == 412
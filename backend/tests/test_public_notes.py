@@ -0,0 +1,90 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.public_cache import PublicNoteCache, markdown_available
+
+
+def create_public_note(client, headers, content="# Title\n\nSome *markdown* <script>alert(1)</script>"):
+    note_id = client.post(
+        "/api/notes/", json={"title": "Public", "content": content, "visibility": "private"}, headers=headers
+    ).json()["id"]
+    url = client.post(f"/api/notes/{note_id}/public-link", headers=headers).json()["public_url"]
+    return note_id, url[url.index("/api/"):]
+
+
+def test_public_note_is_served_from_cache(client, make_user, count_queries):
+    _, owner = make_user()
+    note_id, path = create_public_note(client, owner)
+
+    with count_queries() as statements:
+        first = client.get(path)
+    assert first.status_code == 200
+    assert first.json()["id"] == note_id
+    assert first.headers["cache-control"].startswith("public, max-age=")
+    assert len(statements) == 1
+
+    with count_queries() as statements:
+        second = client.get(path)
+    assert statements == []
+    assert second.content == first.content
+
+    assert client.get(path, headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+
+
+def test_public_note_cache_is_invalidated_by_writes(client, make_user):
+    _, owner = make_user()
+    note_id, path = create_public_note(client, owner)
+    client.get(path)
+
+    client.put(f"/api/notes/{note_id}", json={"title": "Renamed"}, headers=owner)
+    assert client.get(path).json()["title"] == "Renamed"
+
+    client.put(f"/api/notes/{note_id}", json={"visibility": "private"}, headers=owner)
+    assert client.get(path).status_code == 403
+
+    note_id, old_path = create_public_note(client, owner)
+    client.get(old_path)
+    client.post(f"/api/notes/{note_id}/public-link", headers=owner)
+    assert client.get(old_path).status_code == 404
+
+    _, path = create_public_note(client, owner)
+    deleted_id = client.get(path).json()["id"]
+    client.post("/api/notes/bulk", json={"operations": [{"op": "delete", "note_id": deleted_id}]}, headers=owner)
+    assert client.get(path).status_code == 404
+
+
+@pytest.mark.skipif(not markdown_available(), reason="markdown-it-py is not installed")
+def test_public_note_html_escapes_raw_html(client, make_user):
+    _, owner = make_user()
+    _, path = create_public_note(client, owner)
+
+    response = client.get(path, params={"format": "html"})
+    assert response.headers["content-type"].startswith("text/html")
+    assert "<em>markdown</em>" in response.text
+    assert "<script>" not in response.text
+    assert response.headers["etag"] != client.get(path).headers["etag"]
+
+
+def test_public_note_cache_is_bounded_by_size():
+    def note(note_id):
+        return SimpleNamespace(
+            id=note_id, title="t", content="x" * 100, visibility="public", owner_id=1,
+            created_at=datetime(2024, 1, 1), updated_at=datetime(2024, 1, 1), public_token=f"token-{note_id}"
+        )
+
+    cache = PublicNoteCache(max_bytes=10 ** 6, ttl=60)
+    cache.max_bytes = cache.put("token-1", note(1), cache.generation).size * 2
+    for note_id in range(2, 5):
+        cache.put(f"token-{note_id}", note(note_id), cache.generation)
+    assert len(cache) == 2
+    assert cache.size <= cache.max_bytes
+    assert cache.get("token-1") is None
+    assert cache.get("token-4") is not None
+
+    # A note loaded before an invalidation is not cached
+    stale_generation = cache.generation
+    cache.invalidate_notes([4])
+    cache.put("token-4", note(4), stale_generation)
+    assert cache.get("token-4") is None
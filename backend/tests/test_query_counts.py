@@ -0,0 +1,131 @@
+import re
+
+
+def share(client, headers, note_id, email):
+    return client.post(f"/api/notes/{note_id}/share", json={"email": email}, headers=headers)
+
+
+def warm_user_cache(client, *headers):
+    for h in headers:
+        client.get("/api/auth/me", headers=h)
+
+
+def test_read_shared_note_checks_membership_in_one_query(client, make_user, count_queries, create_note):
+    _, owner = make_user()
+    note_id = create_note(owner)
+    for _ in range(20):
+        email, _ = make_user()
+        assert share(client, owner, note_id, email).status_code == 200
+    reader_email, reader = make_user()
+    assert share(client, owner, note_id, reader_email).status_code == 200
+    _, stranger = make_user()
+    warm_user_cache(client, owner, reader, stranger)
+
+    with count_queries() as statements:
+        assert client.get(f"/api/notes/{note_id}", headers=reader).status_code == 200
+    assert len(statements) == 1
+    assert "EXISTS" in statements[0]
+
+    with count_queries() as statements:
+        assert client.get(f"/api/notes/{note_id}", headers=stranger).status_code == 403
+    assert len(statements) == 1
+
+
+def test_share_note_does_not_load_sharing_list(client, make_user, count_queries, create_note):
+    _, owner = make_user()
+    note_id = create_note(owner)
+    emails = [make_user()[0] for _ in range(10)]
+    for email in emails[:-1]:
+        share(client, owner, note_id, email)
+    warm_user_cache(client, owner)
+
+    with count_queries() as statements:
+        assert share(client, owner, note_id, emails[-1]).status_code == 200
+    # note lookup, user + membership lookup, change seq, insert, tombstone cleanup
+    assert len(statements) == 5
+
+    with count_queries() as statements:
+        assert share(client, owner, note_id, emails[0]).status_code == 400
+    assert len(statements) == 2
+
+
+def test_read_notes_query_count_is_independent_of_page_size(client, make_user, count_queries, create_note):
+    _, owner = make_user()
+    for i in range(30):
+        create_note(owner, f"Note {i}")
+    warm_user_cache(client, owner)
+
+    with count_queries() as statements:
+        response = client.get("/api/notes/", params={"limit": 30}, headers=owner)
+    assert len(response.json()) == 30
+    assert len(statements) == 1
+
+
+def test_delete_note_uses_set_based_deletes(client, make_user, count_queries, create_note):
+    _, owner = make_user()
+    note_id = create_note(owner)
+    for _ in range(5):
+        share(client, owner, note_id, make_user()[0])
+    warm_user_cache(client, owner)
+
+    with count_queries() as statements:
+        assert client.delete(f"/api/notes/{note_id}", headers=owner).status_code == 200
+    # note lookup, change seq, tombstone update
+    assert len(statements) == 3
+
+
+def test_shared_and_accessible_listings_page_in_one_query(client, make_user, count_queries, create_note):
+    reader_email, reader = make_user()
+    own_ids = [create_note(reader, f"Mine {i}") for i in range(3)]
+    shared_ids = []
+    for _ in range(3):
+        _, owner = make_user()
+        for i in range(2):
+            note_id = create_note(owner, f"Theirs {i}")
+            assert share(client, owner, note_id, reader_email).status_code == 200
+            shared_ids.append(note_id)
+        create_note(owner, "Not shared")
+    warm_user_cache(client, reader)
+
+    with count_queries() as statements:
+        page = client.get("/api/notes/shared", params={"limit": 4}, headers=reader).json()
+    assert len(statements) == 1
+    rest = client.get("/api/notes/shared", params={"cursor": page["next_cursor"]}, headers=reader).json()
+    assert rest["next_cursor"] is None
+    assert [note["id"] for note in page["items"] + rest["items"]] == sorted(shared_ids, reverse=True)
+
+    with count_queries() as statements:
+        page = client.get("/api/notes/accessible", params={"limit": 100}, headers=reader).json()
+    assert len(statements) == 1
+    assert [note["id"] for note in page["items"]] == sorted(own_ids + shared_ids, reverse=True)
+
+    found = client.get("/api/notes/shared", params={"search": "theirs"}, headers=reader).json()
+    assert {note["id"] for note in found["items"]} == set(shared_ids)
+    assert client.get("/api/notes/shared", params={"status": "bogus"}, headers=reader).status_code == 400
+
+
+def test_summary_view_does_not_select_content(client, make_user, count_queries):
+    _, owner = make_user()
+    note_id = client.post(
+        "/api/notes/", json={"title": "Long", "content": "word " * 1000, "visibility": "private"}, headers=owner
+    ).json()["id"]
+    warm_user_cache(client, owner)
+
+    with count_queries() as statements:
+        summary = client.get("/api/notes/", params={"view": "summary"}, headers=owner).json()
+    assert len(statements) == 1
+    # The stored excerpt and length are read instead of the content
+    assert not re.search(r"notes\.content\b", statements[0])
+    assert summary == [{
+        "id": note_id,
+        "updated_at": summary[0]["updated_at"],
+        "title": "Long",
+        "visibility": "private",
+        "created_at": summary[0]["created_at"],
+        "excerpt": ("word " * 1000)[:200],
+        "content_length": 5000,
+    }]
+
+    page = client.get("/api/notes/", params={"fields": "title", "cursor": ""}, headers=owner).json()
+    assert page["items"] == [{"id": note_id, "updated_at": summary[0]["updated_at"], "title": "Long"}]
+    assert client.get("/api/notes/", params={"fields": "title,password"}, headers=owner).status_code == 400
@@ -0,0 +1,37 @@
+import pytest
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app.core import ratelimit
+from app.core.middleware import RateLimitMiddleware
+from app.core.ratelimit import MemoryRateLimitBackend, RateLimiter, RateLimitRule, RedisRateLimitBackend
+from app.core.redis_client import LocalRedis
+
+
+@pytest.mark.parametrize("backend", [MemoryRateLimitBackend(1000), RedisRateLimitBackend(LocalRedis())])
+def test_blocked_retries_do_not_count_into_the_next_window(backend, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, "time", lambda: now[0])
+    limiter = RateLimiter(backend, RateLimitRule(limit=10, window=10), [])
+    app = Starlette(routes=[Route("/", lambda request: PlainTextResponse("ok"))])
+    app.add_middleware(RateLimitMiddleware, limiter=limiter)
+    client = TestClient(app)
+
+    responses = [client.get("/") for _ in range(100)]
+    assert [response.status_code for response in responses].count(200) == 10
+    assert responses[0].headers["x-ratelimit-limit"] == "10"
+    assert responses[0].headers["x-ratelimit-remaining"] == "9"
+    assert responses[0].headers["x-ratelimit-reset"] == "10"
+    blocked = responses[-1]
+    assert blocked.status_code == 429
+    assert blocked.headers["x-ratelimit-remaining"] == "0"
+    assert blocked.headers["retry-after"] == "10"
+
+    # Halfway into the next window, half of the previous window still weighs
+    now[0] = 1015.0
+    responses = [client.get("/") for _ in range(10)]
+    assert [response.status_code for response in responses] == [200] * 5 + [429] * 5
+    assert [response.headers["x-ratelimit-remaining"] for response in responses[:5]] == ["4", "3", "2", "1", "0"]
+    assert responses[-1].headers["retry-after"] == "5"
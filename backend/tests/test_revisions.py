@@ -0,0 +1,86 @@
+# Long enough for deltas to beat full copies
+BODY = "".join(f"Paragraph {i}: lorem ipsum dolor sit amet.\n" for i in range(50))
+
+
+def revisions(client, headers, note_id, **params):
+    response = client.get(f"/api/notes/{note_id}/revisions", params=params, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def content_of(client, headers, note_id, number):
+    return client.get(f"/api/notes/{note_id}/revisions/{number}", headers=headers).json()["content"]
+
+
+def test_revisions_list_fetch_diff_and_restore(client, make_user, create_note):
+    reader_email, reader = make_user()
+    _, owner = make_user()
+    _, stranger = make_user()
+    versions = [BODY + "line one\nline two\n", BODY + "line one\nline 2\n", BODY + "line one\nline 2\nline three\n"]
+    note_id = create_note(owner, content=versions[0])
+    for content in versions[1:]:
+        client.put(f"/api/notes/{note_id}", json={"content": content}, headers=owner)
+    # Visibility alone does not make a revision
+    client.put(f"/api/notes/{note_id}", json={"visibility": "shared"}, headers=owner)
+    client.post(f"/api/notes/{note_id}/share", json={"email": reader_email}, headers=owner)
+
+    listed = revisions(client, reader, note_id)
+    assert [revision["number"] for revision in listed] == [3, 2, 1]
+    assert listed[-1]["is_keyframe"] and not listed[0]["is_keyframe"]
+    assert listed[0]["content_length"] == len(versions[2])
+    assert [r["number"] for r in revisions(client, owner, note_id, limit=1, before=3)] == [2]
+    assert [content_of(client, reader, note_id, number) for number in (1, 2, 3)] == versions
+    assert client.get(f"/api/notes/{note_id}/revisions", headers=stranger).status_code == 403
+    assert client.get(f"/api/notes/{note_id}/revisions/9", headers=owner).status_code == 404
+
+    diff = client.get(f"/api/notes/{note_id}/revisions/3/diff", params={"against": 1}, headers=owner).json()
+    assert diff["diff"].splitlines()[-3:] == ["-line two", "+line 2", "+line three"]
+
+    assert client.post(f"/api/notes/{note_id}/revisions/1/restore", headers=reader).status_code == 403
+    restored = client.post(f"/api/notes/{note_id}/revisions/1/restore", headers=owner)
+    assert restored.status_code == 200
+    assert restored.json()["content"] == versions[0]
+    assert revisions(client, owner, note_id)[0]["number"] == 4
+    assert content_of(client, owner, note_id, 4) == versions[0]
+
+
+def test_revisions_are_rebuilt_across_keyframes(client, make_user, monkeypatch):
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "REVISION_KEYFRAME_INTERVAL", 4)
+    _, owner = make_user()
+    # Created in bulk: no revision until the first edit records the base
+    client.post(
+        "/api/notes/bulk",
+        json={"operations": [{"op": "create", "title": "Bulk", "content": BODY, "visibility": "private"}]},
+        headers=owner,
+    )
+    note_id = client.get("/api/notes/", headers=owner).json()[0]["id"]
+    assert revisions(client, owner, note_id) == []
+
+    contents = [BODY] + [BODY + "".join(f"edit {i}\n" for i in range(n)) for n in range(1, 10)]
+    for content in contents[1:5]:
+        client.put(f"/api/notes/{note_id}", json={"content": content}, headers=owner)
+    client.post(
+        "/api/notes/bulk",
+        json={"operations": [{"op": "update", "note_id": note_id, "content": content} for content in contents[5:]]},
+        headers=owner,
+    )
+
+    listed = revisions(client, owner, note_id)
+    assert [r["number"] for r in listed if r["is_keyframe"]] == [9, 5, 1]
+    assert [content_of(client, owner, note_id, number) for number in range(1, 11)] == contents
+
+
+def test_revision_diff_applies_as_a_patch(client, make_user, create_note):
+    _, owner = make_user()
+    # No trailing newline, and a \r that is not a line end
+    old, new = "hello\nsame\ntail", "hello world\nsame\ntail\rand more"
+    note_id = create_note(owner, content=old)
+    client.put(f"/api/notes/{note_id}", json={"content": new}, headers=owner)
+    diff = client.get(f"/api/notes/{note_id}/revisions/2/diff", headers=owner).json()["diff"]
+    assert diff.count("\\ No newline at end of file") == 2
+
+    copy_id = create_note(owner, content=old)
+    response = client.patch(f"/api/notes/{copy_id}", json={"base_revision": 1, "diff": diff}, headers=owner)
+    assert response.status_code == 200
+    assert response.json()["content"] == new
@@ -0,0 +1,59 @@
+from app.core.search import note_search_index
+
+
+def search(client, headers, q, **params):
+    response = client.get("/api/notes/search", params={"q": q, **params}, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_search_ranks_matches_of_all_terms(client, make_user, create_note):
+    _, owner = make_user()
+    _, other = make_user()
+    in_title = create_note(owner, "Gardening", "Notes about the garden shed")
+    in_content = create_note(owner, "Weekend", "Tidy the gardening tools, then paint the fence")
+    both_terms = create_note(owner, "Fence", "Paint the fence before gardening season")
+    create_note(owner, "Groceries", "Milk and bread")
+    create_note(other, "Gardening", "Someone else's gardening")
+
+    results = search(client, owner, "gardening")
+    # Title terms weigh double
+    assert [result["id"] for result in results] == [in_title, both_terms, in_content]
+    assert all(result["rank"] > 0 for result in results)
+    assert "<b>gardening</b>" in results[1]["snippet"]
+
+    assert [result["id"] for result in search(client, owner, "Gardening FENCE")] == [both_terms, in_content]
+    assert [result["id"] for result in search(client, owner, "gardening", limit=1)] == [in_title]
+    assert search(client, owner, "gardening tractor") == []
+    assert client.get("/api/notes/search", params={"q": ""}, headers=owner).status_code == 422
+
+
+def test_index_follows_creates_updates_and_deletes(client, make_user, create_note):
+    _, owner = make_user()
+    note_id = create_note(owner, "Recipe", "Lemon tart")
+    assert [result["id"] for result in search(client, owner, "lemon")] == [note_id]
+
+    added = create_note(owner, "Drinks", "Lemon water")
+    assert {result["id"] for result in search(client, owner, "lemon")} == {note_id, added}
+
+    response = client.put(f"/api/notes/{note_id}", json={"content": "Apple tart"}, headers=owner)
+    assert response.status_code == 200
+    assert [result["id"] for result in search(client, owner, "lemon")] == [added]
+    assert [result["id"] for result in search(client, owner, "apple")] == [note_id]
+
+    assert client.delete(f"/api/notes/{added}", headers=owner).status_code == 200
+    assert search(client, owner, "lemon") == []
+    # The list filter uses the same index
+    response = client.get("/api/notes/", params={"search": "apple"}, headers=owner)
+    assert [note["id"] for note in response.json()] == [note_id]
+
+
+def test_index_is_rebuilt_from_the_database(client, make_user, create_note):
+    _, owner = make_user()
+    note_id = create_note(owner, "Travel", "Train tickets to Lyon")
+    assert search(client, owner, "lyon")
+
+    # A fresh process starts with an empty index
+    note_search_index.clear()
+    assert [result["id"] for result in search(client, owner, "lyon")] == [note_id]
+    assert len(note_search_index._owners) == 1
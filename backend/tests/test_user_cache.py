@@ -0,0 +1,68 @@
+import asyncio
+from datetime import datetime, UTC
+
+import pytest
+
+from app.core import cache, deps
+from app.core.cache import TTLCache, UserCache, create_user_cache
+from app.core.redis_client import LocalRedis
+from app.database.models import User
+from app.database.session import SessionLocal
+from app.schemas.user import UserPrincipal
+
+
+@pytest.fixture(params=["memory", "redis"])
+def user_cache(request, monkeypatch):
+    from app.core import redis_client
+    monkeypatch.setattr(cache.settings, "USER_CACHE_BACKEND", request.param)
+    monkeypatch.setattr(redis_client, "_client", LocalRedis())
+    user_cache = create_user_cache()
+    # deps reads the principal, the commit hook invalidates it
+    monkeypatch.setattr(deps, "user_cache", user_cache)
+    monkeypatch.setattr(cache, "user_cache", user_cache)
+    return user_cache
+
+
+def test_principal_is_cached_until_the_user_row_changes(client, make_user, count_queries, user_cache):
+    _, headers = make_user()
+    user_id = client.get("/api/auth/me", headers=headers).json()["id"]
+    assert user_cache.stats.misses == 1
+
+    with count_queries() as statements:
+        assert client.get("/api/auth/me", headers=headers).status_code == 200
+    assert not any("FROM users" in statement for statement in statements)
+    assert user_cache.stats.hits == 1
+
+    # An ORM update fires after_update; the entry goes once the commit lands
+    with SessionLocal() as db:
+        db.get(User, user_id).is_active = False
+        db.commit()
+    assert user_cache.stats.invalidations == 1
+    response = client.get("/api/auth/me", headers=headers)
+    assert response.status_code == 400
+    assert user_cache.stats.misses == 2
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    principal = UserPrincipal(id=1, email="ttl@example.com", is_active=True, created_at=datetime.now(UTC))
+    caches = [
+        UserCache(TTLCache(10, ttl=60)),
+        UserCache(
+            cache.RedisCache(
+                LocalRedis(), 60, dumps=lambda value: value.model_dump_json(), loads=UserPrincipal.model_validate_json
+            )
+        ),
+    ]
+
+    async def run():
+        for user_cache in caches:
+            await user_cache.set(principal)
+            now[0] += 59
+            assert await user_cache.get(1) == principal
+            now[0] += 1
+            assert await user_cache.get(1) is None
+            now[0] = 1000.0
+
+    asyncio.run(run())